@@ -0,0 +1,86 @@
+import csv
+import datetime
+import io
+import random
+
+from database.bulk import IMPORT_FIELDS
+
+STATUSES = (("Not Started", 0.45), ("In Progress", 0.25), ("Completed", 0.30))
+PRIORITIES = (("Low", 0.4), ("Medium", 0.4), ("High", 0.2))
+
+VERBS = ["Write", "Review", "Fix", "Plan", "Call", "Email", "Update", "Prepare", "Test", "Deploy",
+         "Draft", "Schedule", "Clean", "Refactor", "Book", "Order", "Design", "Migrate", "Archive", "Audit"]
+NOUNS = ["report", "invoice", "meeting", "release", "budget", "roadmap", "backlog", "dentist", "groceries",
+         "presentation", "contract", "newsletter", "database", "login page", "sprint", "taxes", "garden",
+         "onboarding", "dashboard", "vendor"]
+WORDS = ["quarterly", "urgent", "follow up", "with the team", "before friday", "notes", "draft", "client",
+         "numbers", "feedback", "details", "checklist", "approval", "summary", "pending", "blocked", "review"]
+
+
+def user_task_counts(total_tasks, users, skew=1.1):
+    # Zipf-like split so a few heavy users own most of the tasks, as in production
+    weights = [1 / (rank ** skew) for rank in range(1, users + 1)]
+    scale = total_tasks / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    counts[0] += total_tasks - sum(counts)
+    return counts
+
+
+def generate_user_tasks(user_index, count, seed=0, today=None):
+    # Deterministic (title, description, due_date, priority, status, progress) rows for one user
+    rng = random.Random(f"{seed}:{user_index}")
+    today = today or datetime.date.today()
+    statuses, status_weights = zip(*STATUSES)
+    priorities, priority_weights = zip(*PRIORITIES)
+    for number in range(count):
+        status = rng.choices(statuses, status_weights)[0]
+        # Due dates cluster around today; a tail of far-future and long-overdue tasks
+        offset = int(rng.gauss(7, 30))
+        due_date = today + datetime.timedelta(days=offset)
+        if status == "Completed":
+            progress = 100
+        elif status == "In Progress":
+            progress = rng.randrange(5, 100, 5)
+        else:
+            progress = 0
+        title = f"{rng.choice(VERBS)} {rng.choice(NOUNS)} #{number}"
+        description = " ".join(rng.choices(WORDS, k=rng.randint(0, 12)))
+        yield title, description, due_date, rng.choices(priorities, priority_weights)[0], status, progress
+
+
+def generate_rows(total_tasks, users, seed=0, today=None):
+    # (user_index, row) pairs across all users
+    for user_index, count in enumerate(user_task_counts(total_tasks, users)):
+        for row in generate_user_tasks(user_index, count, seed, today):
+            yield user_index, row
+
+
+def as_task_tuples(rows, first_id=1):
+    # Rows shaped like get_user_tasks results, for benchmarks that skip the database
+    return [(first_id + offset, *row) for offset, row in enumerate(rows)]
+
+
+def csv_lines(rows):
+    # A lazily generated CSV document that Database.import_tasks can stream
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(IMPORT_FIELDS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() > 65536:
+            yield from buffer.getvalue().splitlines(keepends=True)
+            buffer.seek(0)
+            buffer.truncate()
+    yield from buffer.getvalue().splitlines(keepends=True)
+
+
+def seed_database(db, total_tasks, users, seed=0, prefix="bench"):
+    # Creates the synthetic users and bulk-loads their tasks; returns user ids, heaviest first
+    user_ids = []
+    for user_index, count in enumerate(user_task_counts(total_tasks, users)):
+        username = f"{prefix}_{seed}_{total_tasks}_{user_index}"
+        user_id = db.verify_user(username, username) or db.register_user(username, username)
+        if not db.query_tasks(user_id, limit=1)[0]:
+            db.import_tasks(user_id, csv_lines(generate_user_tasks(user_index, count, seed)))
+        user_ids.append(user_id)
+    return user_ids
@@ -0,0 +1,419 @@
+"""Multi-client load and soak test against the task database.
+
+Simulated users run as threads in worker processes, each with its own client,
+and replay a mix of task list loads, reminder scans and single-task writes at a
+target rate (Poisson arrivals per user):
+
+    python -m benchmarks.load --clients 50 --rate 2 --duration 60
+    python -m benchmarks.load --clients 200 --mode pooled --pool-size 20
+    python -m benchmarks.load --clients 50 --mode batched --flush-ms 1000
+    python -m benchmarks.load --clients 50 --mode service --service-url http://127.0.0.1:8765
+    python -m benchmarks.load --clients 20 --duration 3600 --report-every 60   # soak
+
+Modes:
+    direct   one Database (and connection pool) per client, a commit per edit,
+             as the desktop app does today
+    pooled   the clients of a worker process share one Database of --pool-size
+             connections, like a middle tier holding the only pool
+    batched  as direct, but edits are queued and written with apply_edits every
+             --flush-ms, as the write-behind queue does
+    service  clients go through the HTTP task service (service/server.py), which
+             pools connections and serves task lists from its ETag cache
+
+The report gives throughput and latency percentiles per operation, how far
+clients fell behind their schedule, and (on Postgres) connection counts and
+lock waits sampled from pg_stat_activity. It is written to
+benchmarks/results/load-<mode>.json; compare modes by running each with the
+same --seed, --clients, --tasks and --rate.
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+from benchmarks import generator
+from benchmarks.run import percentile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "results")
+MODES = ("direct", "pooled", "batched", "service")
+# Relative weight of each operation in the default mix
+DEFAULT_MIX = "load=10,remind=20,add=15,update=45,delete=10"
+OPEN_STATUSES = ["Not Started", "In Progress"]
+STATUSES = ("Not Started", "In Progress", "Completed")
+PRIORITIES = ("Low", "Medium", "High")
+# Seconds between every client being ready and the first scheduled operation
+START_DELAY = 0.5
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("load", "remind", "add", "update", "delete"):
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+
+def open_client(args, shared=None):
+    # A fresh storage client for one simulated user, or the process's shared one
+    if shared is not None:
+        return shared
+    from database.factory import open_database
+    if args.mode == "service":
+        return open_database("http", url=args.service_url)
+    if args.backend == "sqlite":
+        return open_database("sqlite", path=args.sqlite_path)
+    if args.mode == "pooled":
+        return open_database("postgres", pool_max=args.pool_size)
+    return open_database("postgres")
+
+
+class SimulatedClient:
+    # One user's session: loads the task list, then runs operations drawn from the mix
+    # at Poisson-distributed times until the deadline
+    def __init__(self, args, db, username, user_id, index):
+        self.args = args
+        self.db = db
+        self.user_id = user_id
+        self.rng = random.Random(f"{args.seed}:load:{index}")
+        if args.mode == "service":
+            # The service scopes every call to the signed-in user
+            self.user_id = db.verify_user(username, username)
+        self.task_ids = []
+        self.pending = {}  # batched mode: task_id -> {field: value}
+        self.next_flush = 0
+        self.latencies = {}
+        self.errors = {}
+        self.lag = []
+        self.operations, weights = zip(*args.mix.items())
+        self.cumulative = [sum(weights[:i + 1]) for i in range(len(weights))]
+
+    def timed(self, name, fn, *args):
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        self.latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        return result
+
+    def run(self, start_at, stop_at):
+        rows = self.timed("load", self.db.get_user_tasks, self.user_id) or []
+        self.task_ids = [row[0] for row in rows]
+        due = start_at
+        while True:
+            due += self.rng.expovariate(self.args.rate)
+            if due >= stop_at:
+                break
+            wait = due - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                self.lag.append(-wait * 1000)
+            self.step()
+        if self.pending:
+            self.flush()
+
+    def step(self):
+        operation = self.rng.choices(self.operations, cum_weights=self.cumulative)[0]
+        getattr(self, operation)()
+        if self.pending and time.time() >= self.next_flush:
+            self.flush()
+
+    def load(self):
+        rows = self.timed("load", self.db.get_user_tasks, self.user_id)
+        if rows is not None:
+            self.task_ids = [row[0] for row in rows]
+
+    def remind(self):
+        # What a reminder scan asks the database: open tasks due today or tomorrow
+        today = datetime.date.today()
+        self.timed("remind", self.db.query_tasks, self.user_id, OPEN_STATUSES, today,
+                   today + datetime.timedelta(days=1))
+
+    def add(self):
+        row = next(generator.generate_user_tasks(self.rng.randrange(1 << 30), 1, self.args.seed))
+        task = self.timed("add", self.db.add_task, self.user_id, *row)
+        if task is not None:
+            self.task_ids.append(task[0])
+
+    def update(self):
+        if not self.task_ids:
+            return self.add()
+        task_id = self.rng.choice(self.task_ids)
+        status = self.rng.choice(STATUSES)
+        progress = 100 if status == "Completed" else self.rng.randrange(0, 100, 5)
+        if self.args.mode == "batched":
+            if not self.pending:
+                self.next_flush = time.time() + self.args.flush_ms / 1000
+            self.pending.setdefault(task_id, {}).update(status=status, progress=progress)
+            return
+        due = datetime.date.today() + datetime.timedelta(days=self.rng.randint(-5, 30))
+        self.timed("update", self.db.update_task, task_id, f"Load test task {task_id}", None, due,
+                   self.rng.choice(PRIORITIES), status, progress)
+
+    def delete(self):
+        if not self.task_ids:
+            return
+        task_id = self.task_ids.pop(self.rng.randrange(len(self.task_ids)))
+        self.pending.pop(task_id, None)
+        self.timed("delete", self.db.delete_task, task_id)
+
+    def flush(self):
+        edits, self.pending = self.pending, {}
+        self.timed("apply_edits", self.db.apply_edits, edits)
+
+
+def run_worker(args, users, barrier, results):
+    # One worker process: a thread per simulated user, results sent back as one dict
+    from instrumentation.metrics import metrics
+    shared = open_client(args) if args.mode == "pooled" else None
+    clients = [SimulatedClient(args, open_client(args, shared), username, user_id, index)
+               for index, username, user_id in users]
+    barrier.wait()
+    start = time.time() + START_DELAY
+    stop = start + args.duration
+    threads = [threading.Thread(target=client.run, args=(start, stop)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = {}
+    errors = {}
+    for client in clients:
+        for name, samples in client.latencies.items():
+            latencies.setdefault(name, []).extend(samples)
+        for name, count in client.errors.items():
+            errors[name] = errors.get(name, 0) + count
+    pool_wait = metrics.snapshot()["histograms"].get("db.pool.wait_ms")
+    results.put({
+        "latencies": latencies,
+        "errors": errors,
+        "lag": [sample for client in clients for sample in client.lag],
+        "pool_wait": pool_wait,
+    })
+    for db in {id(client.db): client.db for client in clients}.values():
+        db.close()
+
+
+class ServerMonitor:
+    # Samples pg_stat_activity on its own connection while the load runs: connections
+    # by state, backends waiting on a lock and the longest such wait
+    ACTIVITY = """
+        SELECT count(*),
+               count(*) FILTER (WHERE state = 'active'),
+               count(*) FILTER (WHERE state LIKE 'idle in transaction%'),
+               count(*) FILTER (WHERE wait_event_type = 'Lock'),
+               coalesce(extract(epoch FROM max(now() - query_start)
+                                FILTER (WHERE wait_event_type = 'Lock')) * 1000, 0)
+        FROM pg_stat_activity
+        WHERE datname = current_database() AND pid <> pg_backend_pid()
+    """
+    DATABASE = """
+        SELECT xact_commit, xact_rollback, deadlocks FROM pg_stat_database WHERE datname = current_database()
+    """
+
+    def __init__(self, interval):
+        from database.db import Database
+        self.db = Database(pool_max=1)
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.max_connections = int(self._query("SHOW max_connections")[0])
+        self._start = self._query(self.DATABASE)
+
+    def _query(self, sql):
+        with self.db.connection() as conn, conn.cursor() as cur:
+            cur.execute(sql)
+            row = cur.fetchone()
+            conn.rollback()
+            return row
+
+    def start(self):
+        self.started = time.time()
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            total, active, idle_in_transaction, lock_waits, longest_wait = self._query(self.ACTIVITY)
+            self.samples.append({"at": time.time() - self.started, "connections": total, "active": active,
+                                 "idle_in_transaction": idle_in_transaction, "lock_waits": lock_waits,
+                                 "longest_lock_wait_ms": float(longest_wait)})
+
+    def latest(self):
+        return self.samples[-1] if self.samples else None
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        commits, rollbacks, deadlocks = (end - start for start, end in zip(self._start, self._query(self.DATABASE)))
+        elapsed = time.time() - self.started
+        self.db.close()
+
+        def series(name):
+            return [sample[name] for sample in self.samples] or [0]
+
+        return {
+            "max_connections": self.max_connections,
+            "connections_mean": sum(series("connections")) / len(series("connections")),
+            "connections_max": max(series("connections")),
+            "active_max": max(series("active")),
+            "idle_in_transaction_max": max(series("idle_in_transaction")),
+            "lock_waits_mean": sum(series("lock_waits")) / len(series("lock_waits")),
+            "lock_waits_max": max(series("lock_waits")),
+            "longest_lock_wait_ms": max(series("longest_lock_wait_ms")),
+            "commits_per_s": commits / elapsed,
+            "rollbacks": rollbacks,
+            "deadlocks": deadlocks,
+            "samples": self.samples,
+        }
+
+
+def summarize(samples, duration):
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "per_s": len(samples) / duration,
+        "p50_ms": percentile(samples, 0.5),
+        "p90_ms": percentile(samples, 0.9),
+        "p99_ms": percentile(samples, 0.99),
+        "max_ms": samples[-1],
+    }
+
+
+def seed(args):
+    from database.factory import open_database
+    if args.backend == "sqlite":
+        db = open_database("sqlite", path=args.sqlite_path)
+    else:
+        db = open_database("postgres")
+    try:
+        user_ids = generator.seed_database(db, args.tasks, args.clients, args.seed, prefix="load")
+    finally:
+        db.close()
+    return [(index, f"load_{args.seed}_{args.tasks}_{index}", user_id) for index, user_id in enumerate(user_ids)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Task Note multi-client load test")
+    parser.add_argument("--mode", choices=MODES, default="direct")
+    parser.add_argument("--backend", choices=["postgres", "sqlite"], default="postgres",
+                        help="database the clients (or, in service mode, the seeding) use")
+    parser.add_argument("--clients", type=int, default=20, help="simulated users")
+    parser.add_argument("--processes", type=int, default=min(os.cpu_count() or 1, 8))
+    parser.add_argument("--rate", type=float, default=1.0, help="operations per second per client")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load")
+    parser.add_argument("--tasks", type=int, default=20000, help="tasks seeded across all clients")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--pool-size", type=int, default=10, help="connections per process in pooled mode")
+    parser.add_argument("--flush-ms", type=int, default=1000, help="edit batching window in batched mode")
+    parser.add_argument("--service-url", default="http://127.0.0.1:8765")
+    parser.add_argument("--sqlite-path", default="load_test.db")
+    parser.add_argument("--sample-ms", type=int, default=1000, help="pg_stat_activity sampling interval")
+    parser.add_argument("--report-every", type=float, default=10, help="seconds between progress lines")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="defaults to benchmarks/results/load-<mode>.json")
+    args = parser.parse_args(argv)
+
+    users = seed(args)
+    processes = max(1, min(args.processes, args.clients))
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes + 1)
+    results = context.Queue()
+    workers = [context.Process(target=run_worker, args=(args, users[index::processes], barrier, results))
+               for index in range(processes)]
+    for worker in workers:
+        worker.start()
+    print(f"{args.mode}: {args.clients} clients in {processes} processes, {args.rate:g} ops/s each, "
+          f"{args.duration:g} s")
+
+    monitor = ServerMonitor(args.sample_ms / 1000) if args.backend == "postgres" else None
+    # Every client is connected before the clock starts
+    barrier.wait()
+    start_at = time.time() + START_DELAY
+    if monitor is not None:
+        monitor.start()
+    stop_at = start_at + args.duration
+    while time.time() < stop_at:
+        time.sleep(min(args.report_every, max(stop_at - time.time(), 0)))
+        latest = monitor.latest() if monitor is not None else None
+        if latest:
+            print(f"  {time.time() - start_at:6.0f}s connections={latest['connections']} "
+                  f"active={latest['active']} lock_waits={latest['lock_waits']}")
+
+    parts = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    server = monitor.stop() if monitor is not None else None
+
+    latencies = {}
+    errors = {}
+    for part in parts:
+        for name, samples in part["latencies"].items():
+            latencies.setdefault(name, []).extend(samples)
+        for name, count in part["errors"].items():
+            errors[name] = errors.get(name, 0) + count
+    lag = sorted(sample for part in parts for sample in part["lag"])
+    pool_waits = [part["pool_wait"] for part in parts if part["pool_wait"]]
+    operations = {name: summarize(samples, args.duration) for name, samples in sorted(latencies.items())}
+    total = sum(len(samples) for samples in latencies.values())
+
+    print(f"{'operation':<12} {'count':>8} {'ops/s':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} errors")
+    for name, result in operations.items():
+        print(f"{name:<12} {result['count']:>8} {result['per_s']:>8.1f} {result['p50_ms']:>7.1f}ms "
+              f"{result['p90_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms {result['max_ms']:>7.1f}ms {errors.get(name, 0)}")
+    print(f"throughput {total / args.duration:.1f} ops/s; "
+          f"{len(lag)} operations started late, p99 lag {percentile(lag, 0.99) if lag else 0:.1f}ms")
+    if pool_waits:
+        print(f"client pool waits: max {max(wait['max'] for wait in pool_waits):.1f}ms")
+    if server:
+        print(f"connections mean {server['connections_mean']:.1f} max {server['connections_max']} "
+              f"of {server['max_connections']}; idle in transaction max {server['idle_in_transaction_max']}")
+        print(f"lock waits mean {server['lock_waits_mean']:.2f} max {server['lock_waits_max']}, "
+              f"longest {server['longest_lock_wait_ms']:.0f}ms; {server['commits_per_s']:.0f} commits/s, "
+              f"{server['deadlocks']} deadlocks")
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "backend": args.backend,
+            "clients": args.clients,
+            "processes": processes,
+            "rate": args.rate,
+            "duration": args.duration,
+            "tasks": args.tasks,
+            "mix": args.mix,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "throughput_per_s": total / args.duration,
+        "operations": operations,
+        "errors": errors,
+        "lag_ms": summarize(lag, args.duration) if lag else None,
+        "client_pool_wait": pool_waits,
+        "server": server,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{args.mode}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as out:
+        json.dump(report, out, indent=2)
+    print(f"Wrote {output}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
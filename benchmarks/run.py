@@ -0,0 +1,214 @@
+"""Benchmarks for the task list, search, reminder and database hot paths.
+
+Run headless from the repository root:
+
+    python -m benchmarks.run --sizes 1000,10000,100000
+    python -m benchmarks.run --backend sqlite --sizes 10000
+    python -m benchmarks.run --backend postgres --sizes 10000 --save-baseline
+
+Results are written to benchmarks/results/latest.json and compared with
+benchmarks/baseline.json when it exists; a slower p50 beyond the tolerance
+exits with status 1.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from benchmarks import generator
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(HERE, "results", "latest.json")
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+SEARCH_QUERIES = ["r", "re", "rep", "report", "review the", "zzz"]
+# Differences smaller than this are treated as timer noise
+NOISE_FLOOR_MS = 1.0
+# Held for the whole run: widgets are destroyed along with the application object
+_app = None
+
+
+def percentile(sorted_samples, fraction):
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    gc.collect()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    # Tracing slows allocation-heavy code several times over, so memory gets a run of its own
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "mean_ms": sum(samples) / len(samples),
+        "p50_ms": percentile(samples, 0.5),
+        "p90_ms": percentile(samples, 0.9),
+        "p99_ms": percentile(samples, 0.99),
+        "max_ms": samples[-1],
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def ui_scenarios(size, users, seed):
+    # Views and the reminder scheduler over a store filled with synthetic rows, no database needed
+    from PyQt6.QtWidgets import QApplication
+    from database.worker import DbWorker
+    from database.task_store import TaskStore
+    from database.task_columns import TaskColumns
+    from ui.task_list_form import TaskListForm
+    from ui.crud_task_form import CrudTaskForm
+    from ui.reminder_scheduler import ReminderScheduler
+
+    global _app
+    _app = app = QApplication.instance() or QApplication(sys.argv[:1])
+    # The heaviest user's share is what a single client has to render
+    count = generator.user_task_counts(size, users)[0]
+    tasks = generator.as_task_tuples(generator.generate_user_tasks(0, count, seed))
+
+    worker = DbWorker()
+    store = TaskStore(1, None, worker)
+    store.load(tasks)
+    worker.wait_for_done()
+    app.processEvents()
+
+    task_list = TaskListForm(store)
+    task_list.resize(1024, 768)
+    crud = CrudTaskForm(store)
+    crud.resize(1024, 768)
+    scheduler = ReminderScheduler(store)
+    queries = iter(SEARCH_QUERIES * 1000)
+    today = datetime.date.today()
+
+    def refresh_task_list():
+        task_list.load_tasks()
+        task_list.grab()
+
+    def search():
+        crud.search_input.blockSignals(True)
+        crud.search_input.setText(next(queries))
+        crud.search_input.blockSignals(False)
+        crud.filter_tasks()
+        crud.grab()
+
+    return count, {
+        "store.refresh_diff": lambda: store.load(tasks),
+        "store.columns.build": lambda: TaskColumns(tasks),
+        "store.columns.classify": lambda: store.columns.classify(today),
+        "ui.task_list.refresh": refresh_task_list,
+        "ui.crud.search": search,
+        "reminders.rebuild": scheduler.rebuild,
+    }
+
+
+def db_scenarios(db, size, users, seed):
+    user_ids = generator.seed_database(db, size, users, seed)
+    heaviest = user_ids[0]
+    today = datetime.date.today()
+    return {
+        "db.get_user_tasks": lambda: db.get_user_tasks(heaviest),
+        "db.query_tasks.page": lambda: db.query_tasks(heaviest, status=["Not Started", "In Progress"],
+                                                      due_from=today, limit=100),
+        "db.search_tasks": lambda: db.search_tasks(heaviest, "report"),
+    }
+
+
+def open_backend(name):
+    if name == "memory":
+        return None
+    from database.factory import open_database
+    # A throwaway in-memory SQLite database keeps runs independent of each other
+    return open_database(name, path=":memory:") if name == "sqlite" else open_database(name)
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        limit = previous["p50_ms"] * (1 + tolerance)
+        if result["p50_ms"] > limit and result["p50_ms"] - previous["p50_ms"] > NOISE_FLOOR_MS:
+            regressions.append((key, previous["p50_ms"], result["p50_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Task Note benchmark suite")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated total task counts (up to 1000000)")
+    parser.add_argument("--users", type=int, default=50, help="number of synthetic users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--backend", choices=["memory", "sqlite", "postgres"], default="memory",
+                        help="memory runs only the client-side scenarios")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="also write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown before failing")
+    args = parser.parse_args(argv)
+
+    db = open_backend(args.backend)
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        count, scenarios = ui_scenarios(size, args.users, args.seed)
+        if db is not None:
+            scenarios.update(db_scenarios(db, size, args.users, args.seed))
+        for name, fn in scenarios.items():
+            key = f"{name}@{size}"
+            results[key] = measure(fn, args.repeat)
+            r = results[key]
+            print(f"{key:<32} tasks={count:<8} p50={r['p50_ms']:9.2f}ms p90={r['p90_ms']:9.2f}ms "
+                  f"p99={r['p99_ms']:9.2f}ms peak={r['peak_mb']:8.1f}MB")
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "users": args.users,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as out:
+        json.dump(report, out, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: p50 {before:.2f}ms -> {after:.2f}ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
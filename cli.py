@@ -0,0 +1,381 @@
+"""Command-line access to tasks, without Qt, for scripts and bulk jobs.
+
+    python cli.py --user alice list --status "In Progress" --format jsonl
+    python cli.py --user alice due --days 3
+    python cli.py --user alice list --priority High --ids-only | python cli.py --user alice update - --status Completed
+    python cli.py --user alice import tasks.csv
+    python cli.py --user alice export --format jsonl --output tasks.jsonl
+
+The password is read from TASK_NOTE_PASSWORD, or prompted for. Listings are
+streamed a page at a time as CSV, JSON lines or a JSON array; counts and
+errors go to stderr so stdout stays machine-readable.
+"""
+import argparse
+import datetime
+import logging
+import os
+import sys
+from database.bulk import PRIORITIES, STATUSES, BulkRowError, format_for_path, validate_record
+from database.base import RESTORED_STATUS
+from database.factory import open_database, BACKENDS
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ["id", "title", "description", "due_date", "priority", "status", "progress"]
+OUTPUT_FORMATS = ("csv", "jsonl", "json")
+OPEN_STATUSES = ["Not Started", "In Progress"]
+PAGE_SIZE = 500
+BATCH_SIZE = 1000
+
+
+class RowWriter:
+    # Writes rows to out as they arrive; "json" streams one array without holding it,
+    # and "ids" writes just the task ids, one per line, for piping into update or delete
+    def __init__(self, out, fmt, fields):
+        self.out = out
+        self.fmt = fmt
+        self.fields = fields
+        self.count = 0
+        if fmt == "ids":
+            pass
+        elif fmt == "csv":
+            import csv
+            self._csv = csv.writer(out, lineterminator="\n")
+            self._csv.writerow(fields)
+        else:
+            import json
+            self._json = json
+            if fmt == "json":
+                out.write("[")
+
+    def write(self, row):
+        if self.fmt == "ids":
+            self.out.write(f"{row[0]}\n")
+            self.count += 1
+            return
+        values = ["" if value is None and self.fmt == "csv" else _plain(value) for value in row]
+        if self.fmt == "csv":
+            self._csv.writerow(values)
+        else:
+            line = self._json.dumps(dict(zip(self.fields, values)), ensure_ascii=False)
+            if self.fmt == "json":
+                line = ("," if self.count else "") + "\n" + line
+            else:
+                line += "\n"
+            self.out.write(line)
+        self.count += 1
+
+    def close(self):
+        if self.fmt == "json":
+            self.out.write("\n]\n" if self.count else "]\n")
+        self.out.flush()
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def _date(text):
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {text!r}, expected YYYY-MM-DD")
+
+
+def _progress(text):
+    try:
+        value = int(text)
+    except ValueError:
+        value = -1
+    if not 0 <= value <= 100:
+        raise argparse.ArgumentTypeError("progress must be an integer between 0 and 100")
+    return value
+
+
+def _values(items):
+    # --status "Not Started,In Progress" and repeated --status both select several values
+    return [value.strip() for item in items or () for value in item.split(",") if value.strip()] or None
+
+
+def _ids(items):
+    # Task ids from the command line; "-" reads whitespace-separated ids from stdin lazily
+    for item in items:
+        if item == "-":
+            for line in sys.stdin:
+                yield from (int(token) for token in line.split())
+        else:
+            yield int(item)
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _owned(db, user_id, task_ids):
+    # Keeps only the user's own tasks; the batch mutations do not check ownership
+    owned = {row[0] for row in db.get_tasks_by_ids(user_id, task_ids)}
+    for task_id in task_ids:
+        if task_id not in owned:
+            print(f"task {task_id} not found", file=sys.stderr)
+    return [task_id for task_id in task_ids if task_id in owned]
+
+
+def _stream(db, user_id, writer, limit=None, archived=False, **filters):
+    # Pages through query_tasks (or the archive) so memory stays flat however many tasks match
+    cursor = None
+    while True:
+        page = PAGE_SIZE if limit is None else min(PAGE_SIZE, limit - writer.count)
+        if page <= 0:
+            break
+        if archived:
+            rows, cursor = db.archived_tasks(user_id, cursor=cursor, limit=page)
+        else:
+            rows, cursor = db.query_tasks(user_id, cursor=cursor, limit=page, **filters)
+        for row in rows:
+            writer.write(row)
+        writer.out.flush()
+        if cursor is None:
+            break
+    return writer.count
+
+
+def cmd_list(db, user_id, args):
+    writer = RowWriter(sys.stdout, "ids" if args.ids_only else args.format, FIELDS)
+    if args.archived:
+        _stream(db, user_id, writer, limit=args.limit, archived=True)
+        writer.close()
+        return 0
+    _stream(db, user_id, writer, limit=args.limit, status=_values(args.status),
+            priority=_values(args.priority), due_from=args.due_from, due_to=args.due_to,
+            search=args.search, sort=args.sort, descending=args.descending)
+    writer.close()
+    return 0
+
+
+class _DueWriter(RowWriter):
+    # Adds days_left (negative when overdue) to each row
+    def __init__(self, out, fmt, today):
+        super().__init__(out, fmt, FIELDS + ["days_left"])
+        self.today = today
+
+    def write(self, row):
+        due_date = row[3].date() if isinstance(row[3], datetime.datetime) else row[3]
+        super().write((*row, (due_date - self.today).days))
+
+
+def cmd_due(db, user_id, args):
+    today = args.today or datetime.date.today()
+    writer = _DueWriter(sys.stdout, args.format, today)
+    _stream(db, user_id, writer, status=OPEN_STATUSES, due_from=None if args.overdue else today,
+            due_to=today + datetime.timedelta(days=args.days))
+    writer.close()
+    print(f"{writer.count} open tasks due by {today + datetime.timedelta(days=args.days)}", file=sys.stderr)
+    return 0
+
+
+def cmd_add(db, user_id, args):
+    try:
+        task = validate_record({"title": args.title, "description": args.description, "due_date": args.due,
+                                "priority": args.priority, "status": args.status, "progress": args.progress})
+    except BulkRowError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    row = db.add_task(user_id, *task)
+    print(row[0])
+    return 0
+
+
+def cmd_update(db, user_id, args):
+    fields = {name: value for name, value in (
+        ("title", args.title), ("description", args.description), ("due_date", args.due),
+        ("priority", args.priority), ("status", args.status), ("progress", args.progress)
+    ) if value is not None}
+    if args.clear_due:
+        fields["due_date"] = None
+    if not fields:
+        print("error: nothing to update; pass at least one field option", file=sys.stderr)
+        return 1
+    updated = 0
+    for batch in _batches(_ids(args.ids), BATCH_SIZE):
+        batch = _owned(db, user_id, batch)
+        if batch:
+            updated += len(db.update_tasks(batch, **fields))
+    print(f"updated {updated} tasks", file=sys.stderr)
+    return 0
+
+
+def cmd_delete(db, user_id, args):
+    deleted = 0
+    for batch in _batches(_ids(args.ids), BATCH_SIZE):
+        batch = _owned(db, user_id, batch)
+        if batch:
+            deleted += len(db.delete_tasks(batch))
+    print(f"deleted {deleted} tasks", file=sys.stderr)
+    return 0
+
+
+def cmd_archive(db, user_id, args):
+    days = args.days if args.days is not None else db.archive_after_days
+    if days is None:
+        print("error: pass --days or set ARCHIVE_AFTER_DAYS in config.py", file=sys.stderr)
+        return 1
+    moved = db.archive_completed(user_id, days)
+    print(f"archived {len(moved)} tasks completed more than {days} days ago", file=sys.stderr)
+    return 0
+
+
+def cmd_restore(db, user_id, args):
+    restored = 0
+    for batch in _batches(_ids(args.ids), BATCH_SIZE):
+        restored += len(db.restore_tasks(user_id, batch))
+    print(f"restored {restored} tasks", file=sys.stderr)
+    return 0
+
+
+def cmd_import(db, user_id, args):
+    fmt = args.format or format_for_path(args.file)
+    if args.file == "-":
+        imported, errors = db.import_tasks(user_id, sys.stdin, fmt, chunk_size=args.chunk_size)
+    else:
+        with open(args.file, encoding="utf-8", newline="") as source:
+            imported, errors = db.import_tasks(user_id, source, fmt, chunk_size=args.chunk_size)
+    for line_number, message in errors:
+        print(f"{args.file}:{line_number}: {message}", file=sys.stderr)
+    print(f"imported {imported} tasks, {len(errors)} rows skipped", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def cmd_export(db, user_id, args):
+    if args.output in (None, "-"):
+        count = db.export_tasks(user_id, sys.stdout, args.format or "csv")
+        sys.stdout.flush()
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            count = db.export_tasks(user_id, out, args.format or format_for_path(args.output))
+    print(f"exported {count} tasks", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Task Note command-line tool")
+    parser.add_argument("--backend", choices=BACKENDS, help="storage backend (default: config.DB_BACKEND)")
+    parser.add_argument("--user", default=os.environ.get("TASK_NOTE_USER"),
+                        help="account to act as (default: $TASK_NOTE_USER)")
+    parser.add_argument("--log-level", default="WARNING", help="logging level (DEBUG, INFO, WARNING, ...)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def output_option(command):
+        command.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="output format (default: csv)")
+
+    def field_options(command, defaults):
+        command.add_argument("--description", default=defaults.get("description"))
+        command.add_argument("--due", type=_date, help="due date, YYYY-MM-DD")
+        command.add_argument("--priority", choices=PRIORITIES, default=defaults.get("priority"))
+        command.add_argument("--status", choices=STATUSES, default=defaults.get("status"))
+        command.add_argument("--progress", type=_progress, default=defaults.get("progress"))
+
+    command = commands.add_parser("list", help="list tasks matching filters")
+    command.add_argument("--status", action="append", help="status to include; repeat or comma-separate")
+    command.add_argument("--priority", action="append", help="priority to include; repeat or comma-separate")
+    command.add_argument("--due-from", type=_date)
+    command.add_argument("--due-to", type=_date)
+    command.add_argument("--search", help="text in the title or description")
+    command.add_argument("--sort", choices=("due_date", "created_date", "title", "id"), default="due_date")
+    command.add_argument("--descending", action="store_true")
+    command.add_argument("--limit", type=int, help="stop after this many tasks")
+    command.add_argument("--ids-only", action="store_true", help="print only task ids, one per line")
+    command.add_argument("--archived", action="store_true",
+                         help="list archived tasks instead, most recently completed first (filters do not apply)")
+    output_option(command)
+    command.set_defaults(run=cmd_list)
+
+    command = commands.add_parser("due", help="report open tasks that are overdue or due soon")
+    command.add_argument("--days", type=int, default=1, help="include tasks due within this many days (default: 1)")
+    command.add_argument("--no-overdue", dest="overdue", action="store_false", help="leave out overdue tasks")
+    command.add_argument("--today", type=_date, help="report as of this date (default: today)")
+    output_option(command)
+    command.set_defaults(run=cmd_due)
+
+    command = commands.add_parser("add", help="add one task and print its id")
+    command.add_argument("title")
+    field_options(command, {"description": "", "priority": "Low", "status": "Not Started", "progress": 0})
+    command.set_defaults(run=cmd_add)
+
+    command = commands.add_parser("update", help="set fields on tasks, in batches")
+    command.add_argument("ids", nargs="+", help='task ids; "-" reads ids from stdin')
+    command.add_argument("--title")
+    field_options(command, {})
+    command.add_argument("--clear-due", action="store_true", help="remove the due date")
+    command.set_defaults(run=cmd_update)
+
+    command = commands.add_parser("delete", help="delete tasks, in batches")
+    command.add_argument("ids", nargs="+", help='task ids; "-" reads ids from stdin')
+    command.set_defaults(run=cmd_delete)
+
+    command = commands.add_parser("archive", help="move old completed tasks to the archive")
+    command.add_argument("--days", type=int, help="completed more than this many days ago (default: ARCHIVE_AFTER_DAYS)")
+    command.set_defaults(run=cmd_archive)
+
+    command = commands.add_parser("restore", help=f"move archived tasks back, as {RESTORED_STATUS}")
+    command.add_argument("ids", nargs="+", help='task ids; "-" reads ids from stdin')
+    command.set_defaults(run=cmd_restore)
+
+    command = commands.add_parser("import", help="import tasks from a CSV or JSON lines file")
+    command.add_argument("file", help='file to read; "-" reads stdin')
+    command.add_argument("--format", choices=("csv", "jsonl"), help="file format (default: from the extension)")
+    command.add_argument("--chunk-size", type=int, default=5000, help="rows written per transaction")
+    command.set_defaults(run=cmd_import)
+
+    command = commands.add_parser("export", help="export every task as CSV or JSON lines")
+    command.add_argument("--output", help="file to write (default: stdout)")
+    command.add_argument("--format", choices=("csv", "jsonl"), help="file format (default: from the extension, else csv)")
+    command.set_defaults(run=cmd_export)
+    return parser
+
+
+def sign_in(db, username):
+    password = os.environ.get("TASK_NOTE_PASSWORD")
+    if password is None:
+        import getpass
+        password = getpass.getpass(f"Password for {username}: ")
+    return db.verify_user(username, password)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if not args.user:
+        parser.error("--user is required (or set TASK_NOTE_USER)")
+
+    db = open_database(args.backend)
+    try:
+        user_id = sign_in(db, args.user)
+        if user_id is None:
+            print("error: invalid username or password", file=sys.stderr)
+            return 2
+        return args.run(db, user_id, args)
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); stop quietly
+        sys.stdout = open(os.devnull, "w")
+        return 0
+    except (ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+import abc
+import datetime
+import hashlib
+
+from instrumentation.metrics import instrumented
+
+# Column order of every task row handed to the UI
+TASK_COLUMNS = "id, title, description, due_date, priority, status, progress"
+
+# Task rows as exchanged with a replica: the UI columns plus what sync needs to keep them current
+SYNC_COLUMNS = f"{TASK_COLUMNS}, created_date, completed_at, row_version"
+
+# Columns moved between tasks and tasks_archive; the archive adds only archived_at
+ARCHIVE_COLUMNS = "id, user_id, title, description, due_date, priority, status, progress, created_date, completed_at"
+# Tasks moved to the archive per transaction, so locks on tasks stay short
+ARCHIVE_BATCH = 1000
+# Restored tasks come back reopened, so the next archive run does not move them again
+RESTORED_STATUS = "In Progress"
+
+# Columns a batch update may set
+UPDATABLE_FIELDS = ("title", "description", "due_date", "priority", "status", "progress")
+
+# Sort keys accepted by query_tasks; each is backed by a (user_id, column, id) index
+SORT_COLUMNS = {
+    "due_date": "due_date",
+    "created_date": "created_date",
+    "title": "title",
+    "id": "id",
+}
+
+# Indexes shared by every backend, matching the filters and keyset orderings of query_tasks
+TASK_INDEXES = {
+    "idx_tasks_user_status_due": "tasks (user_id, status, due_date, id)",
+    "idx_tasks_user_due": "tasks (user_id, due_date, id)",
+    "idx_tasks_user_created": "tasks (user_id, created_date, id)",
+    "idx_tasks_user_title": "tasks (user_id, title, id)",
+}
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def group_edits(edits):
+    # {task_id: {field: value}} -> [(fields, [(task_id, *values)])], one group per set of
+    # fields so each group can be written with a single statement
+    groups = {}
+    for task_id, fields in edits.items():
+        names = tuple(sorted(fields))
+        groups.setdefault(names, []).append((task_id, *(fields[name] for name in names)))
+    return list(groups.items())
+
+
+def check_fields(fields):
+    unknown = set(fields) - set(UPDATABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot update fields: {', '.join(sorted(unknown))}")
+
+
+class TaskStorage(abc.ABC):
+    # The operations the app, CLI and services need from a task database. Backends
+    # provide the SQL dialect hooks and mutations; shared reads are built here.
+    PLACEHOLDER = "%s"
+    LIKE = "ILIKE"
+    # Whether NULLs sort after every value in ascending order (Postgres) or before it (SQLite)
+    NULLS_SORT_HIGH = True
+
+    # Accounts with more tasks than this search on the server instead of the local index
+    server_search_threshold = None
+    # Whether open_listener/read_notifications deliver change notifications
+    supports_notifications = False
+    # Whether reads come from a local replica that sync() keeps current
+    replicated = False
+    # Completed tasks older than this many days are moved to the archive; None keeps them
+    archive_after_days = None
+    # Ordered (version, migrate) pairs; create_tables applies those not yet recorded
+    MIGRATIONS = []
+    # Names the database the tasks come from, to key on-disk task snapshots; None for
+    # one that does not outlive the process
+    source = None
+
+    @abc.abstractmethod
+    def close(self):
+        pass
+
+    @abc.abstractmethod
+    def create_tables(self):
+        pass
+
+    @abc.abstractmethod
+    def _fetchall(self, sql, params=()):
+        # Runs a read-only query and returns all rows as tuples
+        pass
+
+    @abc.abstractmethod
+    def register_user(self, username, password):
+        pass
+
+    @abc.abstractmethod
+    def search_tasks(self, user_id, text, limit=200):
+        pass
+
+    @abc.abstractmethod
+    def add_task(self, user_id, title, desc, due_date, priority, status, progress=0):
+        pass
+
+    @abc.abstractmethod
+    def update_task(self, task_id, title, desc, due_date, priority, status, progress):
+        pass
+
+    @abc.abstractmethod
+    def delete_task(self, task_id):
+        pass
+
+    @abc.abstractmethod
+    def add_tasks(self, user_id, tasks):
+        pass
+
+    @abc.abstractmethod
+    def _update_rows(self, groups):
+        # Applies group_edits() output in one transaction; returns the updated rows
+        pass
+
+    @abc.abstractmethod
+    def delete_tasks(self, task_ids):
+        pass
+
+    @abc.abstractmethod
+    def archive_completed(self, user_id, older_than_days, batch_size=ARCHIVE_BATCH):
+        # Moves tasks completed more than older_than_days ago from tasks to tasks_archive, a
+        # batch per transaction; user_id None covers every account. Returns the moved ids.
+        pass
+
+    @abc.abstractmethod
+    def restore_tasks(self, user_id, task_ids):
+        # Moves archived tasks back to tasks as RESTORED_STATUS; returns the restored rows
+        pass
+
+    @abc.abstractmethod
+    def export_tasks(self, user_id, out, fmt="csv", progress=None):
+        pass
+
+    @abc.abstractmethod
+    def import_tasks(self, user_id, source, fmt="csv", chunk_size=5000, progress=None):
+        pass
+
+    def pending_migrations(self, applied):
+        return [(version, migrate) for version, migrate in self.MIGRATIONS if version not in applied]
+
+    def channel_for(self, user_id):
+        return f"tasks_user_{int(user_id)}"
+
+    def open_listener(self, user_id):
+        raise NotImplementedError(f"{type(self).__name__} does not publish change notifications")
+
+    def read_notifications(self, conn):
+        raise NotImplementedError(f"{type(self).__name__} does not publish change notifications")
+
+    @instrumented("verify_user")
+    def verify_user(self, username, password):
+        p = self.PLACEHOLDER
+        rows = self._fetchall(f"SELECT id FROM users WHERE username = {p} AND password = {p}",
+                              (username, hash_password(password)))
+        return rows[0][0] if rows else None
+
+    @instrumented("get_user_tasks")
+    def get_user_tasks(self, user_id):
+        return self._fetchall(f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = {self.PLACEHOLDER}", (user_id,))
+
+    @instrumented("get_task")
+    def get_task(self, task_id):
+        rows = self._fetchall(f"SELECT {TASK_COLUMNS} FROM tasks WHERE id = {self.PLACEHOLDER}", (task_id,))
+        return rows[0] if rows else None
+
+    @instrumented("get_task_status")
+    def get_task_status(self, task_id):
+        rows = self._fetchall(f"SELECT status FROM tasks WHERE id = {self.PLACEHOLDER}", (task_id,))
+        return rows[0][0] == "Completed" if rows else False
+
+    @instrumented("get_tasks_by_ids")
+    def get_tasks_by_ids(self, user_id, task_ids):
+        clause, params = self._in_clause("id", task_ids)
+        return self._fetchall(f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = {self.PLACEHOLDER} AND {clause}",
+                              (user_id, *params))
+
+    @instrumented("archived_tasks", rows=lambda result: len(result[0]))
+    def archived_tasks(self, user_id, cursor=None, limit=100):
+        # A page of archived tasks, most recently completed first; returns (rows, next_cursor)
+        p = self.PLACEHOLDER
+        clause, params = "", [user_id]
+        if cursor is not None:
+            clause = f"AND (completed_at, id) < ({p}, {p})"
+            params.extend(cursor)
+        rows = self._fetchall(f"""
+            SELECT {TASK_COLUMNS}, completed_at FROM tasks_archive
+            WHERE user_id = {p} {clause}
+            ORDER BY completed_at DESC, id DESC
+            LIMIT {p}
+        """, (*params, limit))
+        next_cursor = (rows[-1][-1], rows[-1][0]) if len(rows) == limit else None
+        return [tuple(row[:-1]) for row in rows], next_cursor
+
+    @instrumented("archived_count")
+    def archived_count(self, user_id):
+        return self._fetchall(f"SELECT count(*) FROM tasks_archive WHERE user_id = {self.PLACEHOLDER}",
+                              (user_id,))[0][0]
+
+    @instrumented("update_tasks")
+    def update_tasks(self, task_ids, **fields):
+        # Sets the same field values on every task in task_ids
+        check_fields(fields)
+        if not fields or not task_ids:
+            return []
+        return self._update_rows(group_edits(dict.fromkeys(task_ids, fields)))
+
+    @instrumented("apply_edits")
+    def apply_edits(self, edits):
+        # Writes {task_id: {field: value}} in one transaction, touching only the given fields
+        for fields in edits.values():
+            check_fields(fields)
+        edits = {task_id: fields for task_id, fields in edits.items() if fields}
+        return self._update_rows(group_edits(edits)) if edits else []
+
+    def set_tasks_status(self, task_ids, status, progress=None):
+        fields = {"status": status}
+        if progress is not None:
+            fields["progress"] = progress
+        return self.update_tasks(task_ids, **fields)
+
+    @instrumented("query_tasks", rows=lambda result: len(result[0]))
+    def query_tasks(self, user_id, status=None, due_from=None, due_to=None, priority=None,
+                    search=None, sort="due_date", descending=False, cursor=None, limit=100):
+        # Returns (rows, next_cursor); pass next_cursor back to get the following page.
+        # status and priority accept a single value or a list of values.
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        column = SORT_COLUMNS[sort]
+        p = self.PLACEHOLDER
+
+        clauses = [f"user_id = {p}"]
+        params = [user_id]
+        for name, value in (("status", status), ("priority", priority)):
+            if value:
+                clause, clause_params = self._in_clause(name, [value] if isinstance(value, str) else value)
+                clauses.append(clause)
+                params.extend(clause_params)
+        if due_from is not None:
+            clauses.append(f"due_date >= {p}")
+            params.append(due_from)
+        if due_to is not None:
+            clauses.append(f"due_date <= {p}")
+            params.append(due_to)
+        if search:
+            clauses.append(f"(title {self.LIKE} {p} ESCAPE '\\' OR description {self.LIKE} {p} ESCAPE '\\')")
+            params.extend([self._like_pattern(search)] * 2)
+        if cursor is not None:
+            clause, cursor_params = self._keyset_clause(column, cursor, descending)
+            clauses.append(clause)
+            params.extend(cursor_params)
+
+        direction = "DESC" if descending else "ASC"
+        order = f"{column} {direction}" if column == "id" else f"{column} {direction}, id {direction}"
+        sql = (f"SELECT {TASK_COLUMNS}, {column} FROM tasks WHERE {' AND '.join(clauses)} "
+               f"ORDER BY {order} LIMIT {p}")
+        params.append(limit)
+        rows = self._fetchall(sql, params)
+
+        # The trailing column is the sort key, used only to build the cursor
+        next_cursor = (rows[-1][-1], rows[-1][0]) if len(rows) == limit else None
+        return [tuple(row[:-1]) for row in rows], next_cursor
+
+    @instrumented("dashboard_stats", rows=lambda result: len(result["weeks"]))
+    def dashboard_stats(self, user_id, today, weeks=12):
+        # Everything the dashboard shows, from three aggregate queries: counts by status and
+        # priority, and tasks created and completed in each of the last `weeks` weeks
+        # (Monday to Sunday, the current one last) plus the totals from before them.
+        # task_history covers archived tasks too, so the counts do not drop as tasks age out.
+        p = self.PLACEHOLDER
+        since = today - datetime.timedelta(days=today.weekday(), weeks=weeks - 1)
+        breakdown = self._fetchall(f"""
+            SELECT status, priority, count(*),
+                   sum(CASE WHEN due_date < {p} AND status <> 'Completed' THEN 1 ELSE 0 END),
+                   sum(CASE WHEN created_date < {p} THEN 1 ELSE 0 END),
+                   sum(CASE WHEN completed_at < {p} THEN 1 ELSE 0 END)
+            FROM task_history WHERE user_id = {p}
+            GROUP BY status, priority
+        """, (today, since, since, user_id))
+        activity = self._fetchall(f"""
+            SELECT week, sum(created), sum(completed) FROM (
+                SELECT {self._week_start("created_date")} AS week, 1 AS created, 0 AS completed
+                FROM task_history WHERE user_id = {p} AND created_date >= {p}
+                UNION ALL
+                SELECT {self._week_start("completed_at")}, 0, 1
+                FROM task_history WHERE user_id = {p} AND completed_at >= {p}
+            ) activity
+            GROUP BY week
+        """, (user_id, since, user_id, since))
+
+        stats = {"total": 0, "overdue": 0, "by_status": {}, "by_priority": {}}
+        created_before = completed_before = 0
+        for status, priority, count, overdue, created, completed in breakdown:
+            stats["total"] += count
+            stats["overdue"] += overdue or 0
+            stats["by_status"][status] = stats["by_status"].get(status, 0) + count
+            stats["by_priority"][priority] = stats["by_priority"].get(priority, 0) + count
+            created_before += created or 0
+            completed_before += completed or 0
+
+        by_week = {datetime.date.fromisoformat(str(week)[:10]): (created, completed)
+                   for week, created, completed in activity}
+        starts = [since + datetime.timedelta(weeks=index) for index in range(weeks)]
+        stats.update(weeks=starts, created=[], completed=[], open=[], completion_rate=[])
+        # Open at the end of each week, and the share of the week's workload completed in it
+        open_count = created_before - completed_before
+        for start in starts:
+            created, completed = by_week.get(start, (0, 0))
+            workload = open_count + created
+            open_count = workload - completed
+            stats["created"].append(created)
+            stats["completed"].append(completed)
+            stats["open"].append(open_count)
+            stats["completion_rate"].append(completed / workload if workload else 0.0)
+        return stats
+
+    def _week_start(self, column):
+        # SQL for the Monday of the week a timestamp falls in
+        return f"date_trunc('week', {column})::date"
+
+    def _in_clause(self, column, values):
+        return f"{column} = ANY({self.PLACEHOLDER})", [list(values)]
+
+    @staticmethod
+    def _like_pattern(text):
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    def _keyset_clause(self, column, cursor, descending):
+        # Continue after (value, id) in ORDER BY column, id. Where NULLs fall depends on
+        # the backend and direction, so the NULL group needs its own branch.
+        value, last_id = cursor
+        p = self.PLACEHOLDER
+        op = "<" if descending else ">"
+        if column == "id":
+            return f"id {op} {p}", [last_id]
+        nulls_after = self.NULLS_SORT_HIGH != descending
+        if value is None:
+            if nulls_after:
+                return f"({column} IS NULL AND id {op} {p})", [last_id]
+            return f"({column} IS NOT NULL OR id {op} {p})", [last_id]
+        if nulls_after:
+            return f"(({column}, id) {op} ({p}, {p}) OR {column} IS NULL)", [value, last_id]
+        return f"({column}, id) {op} ({p}, {p})", [value, last_id]
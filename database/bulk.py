@@ -0,0 +1,148 @@
+import csv
+import datetime
+import io
+import json
+
+# Columns written by export and accepted by import; id and created_date are
+# exported for reference but ignored on import
+EXPORT_FIELDS = ["id", "title", "description", "due_date", "priority", "status", "progress", "created_date"]
+IMPORT_FIELDS = ["title", "description", "due_date", "priority", "status", "progress"]
+
+PRIORITIES = ("Low", "Medium", "High")
+STATUSES = ("Not Started", "In Progress", "Completed")
+FORMATS = ("csv", "jsonl")
+
+
+class BulkRowError(ValueError):
+    pass
+
+
+def format_for_path(path):
+    return "jsonl" if str(path).lower().endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+
+def read_records(source, fmt):
+    # Yields (line_number, dict) from a text stream without loading it whole
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(source, 1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, BulkRowError(f"invalid JSON: {e}")
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def validate_record(record):
+    # Returns a tuple in IMPORT_FIELDS order or raises BulkRowError
+    if isinstance(record, Exception):
+        raise record
+    # JSON Lines can hold any JSON value, not only objects of strings
+    if not isinstance(record, dict):
+        raise BulkRowError(f"expected an object, got {type(record).__name__}")
+    for field in ("title", "description"):
+        if not isinstance(record.get(field) or "", str):
+            raise BulkRowError(f"{field} must be text, got {record[field]!r}")
+    title = (record.get("title") or "").strip()
+    if not title:
+        raise BulkRowError("title is required")
+    if len(title) > 100:
+        raise BulkRowError("title is longer than 100 characters")
+
+    due_date = record.get("due_date") or None
+    if due_date is not None and not isinstance(due_date, datetime.date):
+        try:
+            due_date = datetime.date.fromisoformat(str(due_date)[:10])
+        except ValueError:
+            raise BulkRowError(f"invalid due_date {due_date!r}")
+
+    priority = record.get("priority") or "Low"
+    if priority not in PRIORITIES:
+        raise BulkRowError(f"invalid priority {priority!r}")
+    status = record.get("status") or "Not Started"
+    if status not in STATUSES:
+        raise BulkRowError(f"invalid status {status!r}")
+
+    try:
+        progress = int(record.get("progress") or 0)
+    except (TypeError, ValueError):
+        raise BulkRowError(f"invalid progress {record.get('progress')!r}")
+    if not 0 <= progress <= 100:
+        raise BulkRowError("progress must be between 0 and 100")
+
+    return title, record.get("description") or "", due_date, priority, status, progress
+
+
+def validated_chunks(source, fmt, chunk_size, errors):
+    # Groups valid rows into lists of at most chunk_size; bad rows are recorded in errors
+    chunk = []
+    for line_number, record in read_records(source, fmt):
+        try:
+            chunk.append(validate_record(record))
+        except BulkRowError as e:
+            errors.append((line_number, str(e)))
+            continue
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_buffer(rows, prefix=()):
+    # Serializes rows as CSV for COPY FROM STDIN; None becomes an empty unquoted field (NULL)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for row in rows:
+        writer.writerow([*prefix, *("" if value is None else value for value in row)])
+    buffer.seek(0)
+    return buffer
+
+
+class RecordCounter:
+    # Counts the records in exported text fed to it in arbitrary pieces. CSV fields may
+    # hold quoted line breaks, so only newlines outside quotes end a record; an escaped
+    # quote ("") toggles twice and leaves the state as it was.
+    def __init__(self, fmt):
+        self.csv = fmt == "csv"
+        self.records = 0
+        self._quoted = False
+
+    def feed(self, text):
+        if not self.csv:
+            self.records += text.count("\n")
+            return
+        for index, part in enumerate(text.split('"')):
+            if index:
+                self._quoted = not self._quoted
+            if not self._quoted:
+                self.records += part.count("\n")
+
+
+class ProgressWriter(io.TextIOBase):
+    # Text sink for COPY TO STDOUT that forwards data and reports rows written
+    REPORT_EVERY = 5000
+
+    def __init__(self, out, total=None, progress=None):
+        super().__init__()
+        self.out = out
+        self.total = total
+        self.progress = progress
+        self.rows = 0
+        self._reported = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.out.write(data)
+        self.rows += data.count("\n")
+        if self.progress and self.rows - self._reported >= self.REPORT_EVERY:
+            self._reported = self.rows
+            self.progress((self.rows, self.total))
+        return len(data)
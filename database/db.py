@@ -1,24 +1,289 @@
 import psycopg2
-import hashlib
+from psycopg2 import pool
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2.extras import execute_values
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from database import bulk
+from database.base import (TaskStorage, TASK_COLUMNS, SYNC_COLUMNS, UPDATABLE_FIELDS, TASK_INDEXES, ARCHIVE_COLUMNS,
+                           ARCHIVE_BATCH, RESTORED_STATUS, hash_password)
+from instrumentation.metrics import instrumented, metrics
+
+logger = logging.getLogger(__name__)
 
 try:
     import config
 except ImportError:
-    print("config.py not found. Please create it based on config.example.py with your database credentials.")
+    logging.getLogger(__name__).error(
+        "config.py not found. Please create it based on config.example.py with your database credentials.")
     raise
 
 
-class Database:
-    def __init__(self):
+# Schema changes in the order they were introduced. Each runs once and is recorded in
+# schema_version; the early ones are idempotent because databases created before
+# versioning already have some of their objects.
+def _create_base_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password VARCHAR(64) NOT NULL
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            title VARCHAR(100) NOT NULL,
+            description TEXT,
+            due_date DATE,
+            priority VARCHAR(20),
+            status VARCHAR(20),
+            progress INTEGER DEFAULT 0,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Tables from before the progress column was introduced
+    cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS progress INTEGER DEFAULT 0")
+
+
+def _create_task_indexes(cur):
+    # Indexes matching the filters and keyset orderings used by query_tasks
+    for name, definition in TASK_INDEXES.items():
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+def _create_trigram_indexes(cur):
+    # Trigram indexes for substring search; pg_trgm needs privileges we may not have
+    cur.execute("SAVEPOINT trgm")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_title_trgm ON tasks USING gin (title gin_trgm_ops)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_description_trgm "
+                    "ON tasks USING gin (description gin_trgm_ops)")
+        cur.execute("RELEASE SAVEPOINT trgm")
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT trgm")
+        logger.warning("pg_trgm unavailable, server search will not be indexed: %s", e)
+
+
+def _create_change_notifications(cur):
+    # Publish every task change on a per-user channel as "<op>:<task id>"
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION notify_task_change() RETURNS trigger AS $$
+        BEGIN
+            -- Bulk loads set tasks.bulk and send a single RELOAD notification instead
+            IF current_setting('tasks.bulk', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('tasks_user_' || OLD.user_id, 'DELETE:' || OLD.id);
+                RETURN OLD;
+            END IF;
+            IF TG_OP = 'UPDATE' AND OLD.user_id IS DISTINCT FROM NEW.user_id THEN
+                PERFORM pg_notify('tasks_user_' || OLD.user_id, 'DELETE:' || OLD.id);
+            END IF;
+            PERFORM pg_notify('tasks_user_' || NEW.user_id, TG_OP || ':' || NEW.id);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS tasks_notify_change ON tasks")
+    cur.execute("""
+        CREATE TRIGGER tasks_notify_change
+        AFTER INSERT OR UPDATE OR DELETE ON tasks
+        FOR EACH ROW EXECUTE FUNCTION notify_task_change()
+    """)
+
+
+def _create_row_versions(cur):
+    # Row versions and tombstones let replicas pull only what changed since their last sync
+    cur.execute("CREATE SEQUENCE IF NOT EXISTS tasks_row_version_seq")
+    # The volatile default gives every existing row its own version
+    cur.execute("""
+        ALTER TABLE tasks
+        ADD COLUMN IF NOT EXISTS row_version BIGINT NOT NULL DEFAULT nextval('tasks_row_version_seq'),
+        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS task_tombstones (
+            task_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            row_version BIGINT NOT NULL,
+            deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_version ON tasks (user_id, row_version)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tombstones_user_version ON task_tombstones (user_id, row_version)")
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION track_task_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO task_tombstones (task_id, user_id, row_version)
+                VALUES (OLD.id, OLD.user_id, nextval('tasks_row_version_seq'))
+                ON CONFLICT (task_id) DO UPDATE
+                SET user_id = EXCLUDED.user_id, row_version = EXCLUDED.row_version,
+                    deleted_at = CURRENT_TIMESTAMP;
+                RETURN OLD;
+            END IF;
+            NEW.row_version := nextval('tasks_row_version_seq');
+            NEW.updated_at := CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Inserts take the column defaults, so COPY imports skip the trigger entirely
+    cur.execute("DROP TRIGGER IF EXISTS tasks_version_update ON tasks")
+    cur.execute("""
+        CREATE TRIGGER tasks_version_update
+        BEFORE UPDATE ON tasks
+        FOR EACH ROW EXECUTE FUNCTION track_task_version()
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS tasks_version_delete ON tasks")
+    cur.execute("""
+        CREATE TRIGGER tasks_version_delete
+        AFTER DELETE ON tasks
+        FOR EACH ROW EXECUTE FUNCTION track_task_version()
+    """)
+
+
+def _create_completed_at(cur):
+    # When each task was completed, for the dashboard's burndown and completion rate
+    cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS completed_at TIMESTAMP")
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION track_task_completion() RETURNS trigger AS $$
+        BEGIN
+            NEW.completed_at := CASE WHEN NEW.status = 'Completed' THEN CURRENT_TIMESTAMP END;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # The WHEN clauses keep the function off the path of ordinary edits and imports
+    cur.execute("DROP TRIGGER IF EXISTS tasks_completed_insert ON tasks")
+    cur.execute("""
+        CREATE TRIGGER tasks_completed_insert
+        BEFORE INSERT ON tasks
+        FOR EACH ROW WHEN (NEW.status = 'Completed' AND NEW.completed_at IS NULL)
+        EXECUTE FUNCTION track_task_completion()
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS tasks_completed_update ON tasks")
+    cur.execute("""
+        CREATE TRIGGER tasks_completed_update
+        BEFORE UPDATE OF status ON tasks
+        FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+        EXECUTE FUNCTION track_task_completion()
+    """)
+    # Best guess for tasks completed before the column existed; no notification per row
+    cur.execute("SELECT set_config('tasks.bulk', 'on', true)")
+    cur.execute("UPDATE tasks SET completed_at = updated_at WHERE status = 'Completed' AND completed_at IS NULL")
+    cur.execute("SELECT set_config('tasks.bulk', 'off', true)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_completed ON tasks (user_id, completed_at)")
+
+
+def _create_commit_order(cur):
+    # row_version is taken when a row is written, not when it commits, so a transaction
+    # that commits late (a long COPY import) can leave rows below versions a replica has
+    # already pulled past. Rows and tombstones also record the transaction that wrote
+    # them, and replicas resume from the oldest transaction that was still running at
+    # their last pull (see pull_changes).
+    cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS txid BIGINT NOT NULL DEFAULT txid_current()")
+    cur.execute("ALTER TABLE task_tombstones ADD COLUMN IF NOT EXISTS txid BIGINT NOT NULL DEFAULT txid_current()")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_txid ON tasks (user_id, txid)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tombstones_user_txid ON task_tombstones (user_id, txid)")
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION track_task_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO task_tombstones (task_id, user_id, row_version, txid)
+                VALUES (OLD.id, OLD.user_id, nextval('tasks_row_version_seq'), txid_current())
+                ON CONFLICT (task_id) DO UPDATE
+                SET user_id = EXCLUDED.user_id, row_version = EXCLUDED.row_version,
+                    txid = EXCLUDED.txid, deleted_at = CURRENT_TIMESTAMP;
+                RETURN OLD;
+            END IF;
+            NEW.row_version := nextval('tasks_row_version_seq');
+            NEW.txid := txid_current();
+            NEW.updated_at := CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def _create_archive(cur):
+    # Completed tasks past the archive age live here, out of the way of active queries
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            title VARCHAR(100) NOT NULL,
+            description TEXT,
+            due_date DATE,
+            priority VARCHAR(20),
+            status VARCHAR(20),
+            progress INTEGER DEFAULT 0,
+            created_date TIMESTAMP,
+            completed_at TIMESTAMP NOT NULL,
+            archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_user_completed "
+                "ON tasks_archive (user_id, completed_at, id)")
+    # Every task ever created, for the dashboard's history
+    cur.execute("""
+        CREATE OR REPLACE VIEW task_history AS
+        SELECT user_id, status, priority, due_date, created_date, completed_at FROM tasks
+        UNION ALL
+        SELECT user_id, status, priority, due_date, created_date, completed_at FROM tasks_archive
+    """)
+
+
+MIGRATIONS = [
+    (1, _create_base_tables),
+    (2, _create_task_indexes),
+    (3, _create_trigram_indexes),
+    (4, _create_change_notifications),
+    (5, _create_row_versions),
+    (6, _create_completed_at),
+    (7, _create_archive),
+    (8, _create_commit_order),
+]
+
+# Placeholders for VALUES lists whose column types Postgres cannot infer from the text
+VALUE_CASTS = {"due_date": "%s::date", "progress": "%s::integer"}
+
+# Key of the advisory lock that keeps clients starting together from migrating twice
+MIGRATION_LOCK = 7206113
+
+
+class Database(TaskStorage):
+    supports_notifications = True
+    MIGRATIONS = MIGRATIONS
+
+    def __init__(self, pool_min=None, pool_max=None):
         # Retrieve credentials from config.py
         self.db_name = config.DB_NAME
         self.db_user = config.DB_USER
         self.db_password = config.DB_PASSWORD
         self.db_host = config.DB_HOST
         self.db_port = config.DB_PORT
+        self.source = f"postgres://{self.db_host}:{self.db_port}/{self.db_name}"
+
+        # Pool sizing and health checks are optional settings in config.py; the load
+        # harness passes its own pool size
+        self.pool_min = pool_min or getattr(config, "DB_POOL_MIN", 1)
+        self.pool_max = pool_max or getattr(config, "DB_POOL_MAX", 5)
+        self.health_check_interval = getattr(config, "DB_HEALTH_CHECK_INTERVAL", 30)
+        self.server_search_threshold = getattr(config, "SERVER_SEARCH_THRESHOLD", None)
+        self.archive_after_days = getattr(config, "ARCHIVE_AFTER_DAYS", 90)
+        self.has_trgm = None  # whether pg_trgm is installed, looked up on first search
 
         try:
-            self.conn = psycopg2.connect(
+            self.pool = pool.ThreadedConnectionPool(
+                self.pool_min,
+                self.pool_max,
                 dbname=self.db_name,
                 user=self.db_user,
                 password=self.db_password,
@@ -26,106 +291,397 @@ class Database:
                 port=self.db_port
             )
         except psycopg2.Error as e:
-            print(f"Database connection failed: {e}")
+            logger.error("Database connection failed: %s", e)
             raise
 
+        # ThreadedConnectionPool raises when exhausted, so callers queue here instead
+        self._slots = threading.BoundedSemaphore(self.pool_max)
+        self._last_used = {}
+
         self.create_tables()
 
+    @contextmanager
+    def connection(self):
+        # Borrow a healthy connection from the pool; the caller commits, errors roll back
+        with metrics.timer("db.pool.wait_ms"):
+            self._slots.acquire()
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self._last_used[id(conn)] = time.monotonic()
+            self.pool.putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    def _checkout(self):
+        for _ in range(self.pool_max + 1):
+            conn = self.pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            self._last_used.pop(id(conn), None)
+            self.pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("No healthy database connection available")
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        # Only ping connections that sat idle long enough for the server to drop them
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def close(self):
+        self.pool.closeall()
+
+    def _fetchall(self, sql, params=()):
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            conn.rollback()
+            return rows
+
+    @instrumented("create_tables")
     def create_tables(self):
-        with self.conn.cursor() as cur:
-            # Create users table if it doesn't exist
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id SERIAL PRIMARY KEY,
-                    username VARCHAR(50) UNIQUE NOT NULL,
-                    password VARCHAR(64) NOT NULL
-                )
-            """)
-
-            # Create tasks table if it doesn't exist
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id),
-                    title VARCHAR(100) NOT NULL,
-                    description TEXT,
-                    due_date DATE,
-                    priority VARCHAR(20),
-                    status VARCHAR(20),
-                    progress INTEGER DEFAULT 0,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Check if the progress column exists in the tasks table
-            cur.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'tasks' AND column_name = 'progress'
-            """)
-            if not cur.fetchone():
-                # Add the progress column if it doesn't exist
-                cur.execute("""
-                    ALTER TABLE tasks 
-                    ADD COLUMN progress INTEGER DEFAULT 0
-                """)
-                print("Added 'progress' column to tasks table.")
-
-            self.conn.commit()
-
-    def verify_user(self, username, password):
-        hashed_pw = hashlib.sha256(password.encode()).hexdigest()
-        with self.conn.cursor() as cur:
-            cur.execute("SELECT id FROM users WHERE username = %s AND password = %s",
-                       (username, hashed_pw))
-            result = cur.fetchone()
-            return result[0] if result else None
+        # Brings the schema up to date; when it already is, this is a single query
+        with self.connection() as conn, conn.cursor() as cur:
+            if not self.pending_migrations(self._applied_migrations(cur)):
+                conn.rollback()
+                return
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK,))
+            cur.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY)")
+            # Another client may have migrated while we waited for the lock
+            for version, migrate in self.pending_migrations(self._applied_migrations(cur)):
+                logger.info("Applying schema migration %d (%s)", version, migrate.__name__.strip("_"))
+                migrate(cur)
+                cur.execute("INSERT INTO schema_version (version) VALUES (%s)", (version,))
+            conn.commit()
 
+    @staticmethod
+    def _applied_migrations(cur):
+        try:
+            cur.execute("SELECT version FROM schema_version")
+        except psycopg2.ProgrammingError:
+            # A database from before schema versioning
+            cur.connection.rollback()
+            return set()
+        return {row[0] for row in cur.fetchall()}
+
+    @instrumented("register_user")
     def register_user(self, username, password):
-        hashed_pw = hashlib.sha256(password.encode()).hexdigest()
+        hashed_pw = hash_password(password)
         try:
-            with self.conn.cursor() as cur:
+            with self.connection() as conn, conn.cursor() as cur:
                 cur.execute("INSERT INTO users (username, password) VALUES (%s, %s) RETURNING id",
                           (username, hashed_pw))
-                self.conn.commit()
-                return cur.fetchone()[0]
+                user_id = cur.fetchone()[0]
+                conn.commit()
+                return user_id
         except psycopg2.IntegrityError:
-            self.conn.rollback()
             return None
 
-    def get_user_tasks(self, user_id):
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, title, description, due_date, priority, status, progress
-                FROM tasks WHERE user_id = %s
-            """, (user_id,))
-            return cur.fetchall()
+    @instrumented("search_tasks")
+    def search_tasks(self, user_id, text, limit=200):
+        # Title matches rank above description-only matches, closest titles first
+        if self.has_trgm is None:
+            self.has_trgm = bool(self._fetchall("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+        pattern = self._like_pattern(text)
+        order = "(title ILIKE %s) DESC"
+        params = [user_id, pattern, pattern, pattern]
+        if self.has_trgm:
+            order += ", similarity(title, %s) DESC"
+            params.append(text)
+        params.append(limit)
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT {TASK_COLUMNS} FROM tasks
+                WHERE user_id = %s AND (title ILIKE %s OR description ILIKE %s)
+                ORDER BY {order}, id
+                LIMIT %s
+            """, params)
+            rows = cur.fetchall()
+            conn.rollback()
+            return rows
+
+    def open_listener(self, user_id):
+        # A dedicated autocommit connection outside the pool, subscribed to the user's channel
+        conn = psycopg2.connect(
+            dbname=self.db_name,
+            user=self.db_user,
+            password=self.db_password,
+            host=self.db_host,
+            port=self.db_port
+        )
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel_for(user_id)}")
+        return conn
 
+    @staticmethod
+    def read_notifications(conn):
+        # Drain pending notifications as (op, task_id) pairs; op is INSERT, UPDATE, DELETE,
+        # or RELOAD after a bulk change (task_id is then 0)
+        conn.poll()
+        changes = []
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            op, _, task_id = notify.payload.partition(":")
+            changes.append((op, int(task_id)))
+        return changes
+
+    # Mutations return the affected row so callers can patch their copy without refetching
+    @instrumented("add_task")
     def add_task(self, user_id, title, desc, due_date, priority, status, progress=0):
-        with self.conn.cursor() as cur:
-            cur.execute("""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(f"""
                 INSERT INTO tasks (user_id, title, description, due_date, priority, status, progress)
                 VALUES (%s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
+                RETURNING {TASK_COLUMNS}
             """, (user_id, title, desc, due_date, priority, status, progress))
-            self.conn.commit()
+            task = cur.fetchone()
+            conn.commit()
+            return task
 
+    @instrumented("update_task")
     def update_task(self, task_id, title, desc, due_date, priority, status, progress):
-        with self.conn.cursor() as cur:
-            cur.execute("""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(f"""
                 UPDATE tasks
                 SET title = %s, description = %s, due_date = %s, priority = %s, status = %s, progress = %s
                 WHERE id = %s
+                RETURNING {TASK_COLUMNS}
             """, (title, desc, due_date, priority, status, progress, task_id))
-            self.conn.commit()
+            task = cur.fetchone()
+            conn.commit()
+            return task
 
+    @instrumented("delete_task")
     def delete_task(self, task_id):
-        with self.conn.cursor() as cur:
-            cur.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
-            self.conn.commit()
-
-    def get_task_status(self, task_id):
-        with self.conn.cursor() as cur:
-            cur.execute("SELECT status FROM tasks WHERE id = %s", (task_id,))
-            status = cur.fetchone()
-            return status[0] == "Completed" if status else False
\ No newline at end of file
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM tasks WHERE id = %s RETURNING id", (task_id,))
+            deleted = cur.fetchone()
+            conn.commit()
+            return deleted[0] if deleted else None
+
+    # Batch variants: one statement and one commit however many tasks are involved
+    @instrumented("add_tasks")
+    def add_tasks(self, user_id, tasks):
+        # tasks are (title, desc, due_date, priority, status, progress) tuples
+        with self.connection() as conn, conn.cursor() as cur:
+            rows = execute_values(cur, f"""
+                INSERT INTO tasks (user_id, title, description, due_date, priority, status, progress)
+                VALUES %s
+                RETURNING {TASK_COLUMNS}
+            """, [(user_id, *task) for task in tasks], fetch=True)
+            conn.commit()
+            return rows
+
+    def _update_rows(self, groups):
+        # One UPDATE ... FROM (VALUES ...) per set of fields, however many tasks it covers
+        rows = []
+        with self.connection() as conn, conn.cursor() as cur:
+            for fields, values in groups:
+                assignments = ", ".join(f"{field} = v.{field}" for field in fields)
+                template = "(%s, " + ", ".join(VALUE_CASTS.get(field, "%s") for field in fields) + ")"
+                rows.extend(execute_values(cur, f"""
+                    UPDATE tasks SET {assignments}
+                    FROM (VALUES %s) AS v (id, {', '.join(fields)})
+                    WHERE tasks.id = v.id
+                    RETURNING {', '.join(f"tasks.{column}" for column in TASK_COLUMNS.split(', '))}
+                """, values, template=template, page_size=1000, fetch=True))
+            conn.commit()
+        return rows
+
+    @instrumented("delete_tasks")
+    def delete_tasks(self, task_ids):
+        if not task_ids:
+            return []
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM tasks WHERE id = ANY(%s) RETURNING id", (list(task_ids),))
+            deleted = [row[0] for row in cur.fetchall()]
+            conn.commit()
+            return deleted
+
+    @instrumented("archive_completed", rows=len)
+    def archive_completed(self, user_id, older_than_days, batch_size=ARCHIVE_BATCH):
+        # Each batch is one DELETE ... RETURNING feeding an INSERT, committed on its own.
+        # SKIP LOCKED passes over tasks another transaction is editing; they go next time.
+        user_clause = "" if user_id is None else "AND user_id = %s"
+        params = [older_than_days, *([] if user_id is None else [user_id]), batch_size]
+        moved = []
+        while True:
+            with self.connection() as conn, conn.cursor() as cur:
+                cur.execute(f"""
+                    WITH moved AS (
+                        DELETE FROM tasks WHERE id IN (
+                            SELECT id FROM tasks
+                            WHERE status = 'Completed'
+                              AND completed_at < CURRENT_TIMESTAMP - make_interval(days => %s) {user_clause}
+                            ORDER BY completed_at
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING {ARCHIVE_COLUMNS}
+                    )
+                    INSERT INTO tasks_archive ({ARCHIVE_COLUMNS})
+                    SELECT {ARCHIVE_COLUMNS} FROM moved
+                    RETURNING id
+                """, params)
+                batch = [row[0] for row in cur.fetchall()]
+                conn.commit()
+            moved.extend(batch)
+            if len(batch) < batch_size:
+                return moved
+
+    @instrumented("restore_tasks")
+    def restore_tasks(self, user_id, task_ids):
+        if not task_ids:
+            return []
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(f"""
+                WITH restored AS (
+                    DELETE FROM tasks_archive WHERE user_id = %s AND id = ANY(%s)
+                    RETURNING id, user_id, title, description, due_date, priority, progress, created_date
+                )
+                INSERT INTO tasks (id, user_id, title, description, due_date, priority, status, progress, created_date)
+                SELECT id, user_id, title, description, due_date, priority, %s, progress, created_date FROM restored
+                RETURNING {TASK_COLUMNS}
+            """, (user_id, list(task_ids), RESTORED_STATUS))
+            rows = cur.fetchall()
+            conn.commit()
+            return rows
+
+    @instrumented("pull_changes")
+    def pull_changes(self, user_id, since, after=0, limit=5000):
+        # Changes to user_id's tasks written by transaction since or later, oldest version
+        # first and past version after when paging: live rows as SYNC_COLUMNS followed by
+        # deleted=False, tombstones as the id and version with deleted=True. A full page
+        # means there may be more after its last version. Returns (rows, horizon), horizon
+        # being the oldest transaction still running before the rows were read: everything
+        # that commits from then on was written at or after it, so it is the next since.
+        # Rows of transactions that were running then are pulled again next time.
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            horizon = cur.fetchone()[0]
+            cur.execute(f"""
+                SELECT * FROM (
+                    SELECT {SYNC_COLUMNS}, false AS deleted
+                    FROM tasks WHERE user_id = %s AND txid >= %s AND row_version > %s
+                    UNION ALL
+                    SELECT task_id, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, row_version, true
+                    FROM task_tombstones WHERE user_id = %s AND txid >= %s AND row_version > %s
+                ) changes
+                ORDER BY row_version
+                LIMIT %s
+            """, (user_id, since, after, user_id, since, after, limit))
+            rows = cur.fetchall()
+            conn.rollback()
+            return rows, horizon
+
+    @instrumented("push_changes", rows=lambda result: sum(len(part) for part in result))
+    def push_changes(self, user_id, inserts, updates, deletes):
+        # Applies a replica's queued writes in one transaction and a fixed number of round
+        # trips. inserts are (local_id, *UPDATABLE_FIELDS), updates are (task_id, base_version,
+        # *UPDATABLE_FIELDS) and deletes are (task_id, base_version). Updates and deletes only
+        # apply to rows still at base_version; otherwise the server copy wins. Returns
+        # (inserted, applied, conflicts): {local_id: row}, {task_id: row or None} and
+        # {task_id: current row or None}, rows as SYNC_COLUMNS.
+        fields = ", ".join(UPDATABLE_FIELDS)
+        inserted, applied, conflicts = {}, {}, {}
+        with self.connection() as conn, conn.cursor() as cur:
+            if inserts:
+                # Reserve ids first so each new row can be matched to the replica's local id
+                cur.execute("SELECT nextval(pg_get_serial_sequence('tasks', 'id')) FROM generate_series(1, %s)",
+                            (len(inserts),))
+                ids = [row[0] for row in cur.fetchall()]
+                rows = execute_values(cur, f"""
+                    INSERT INTO tasks (id, user_id, {fields}) VALUES %s
+                    RETURNING {SYNC_COLUMNS}
+                """, [(task_id, user_id, *insert[1:]) for task_id, insert in zip(ids, inserts)],
+                    template="(%s, %s, %s, %s, %s::date, %s, %s, %s)", page_size=len(inserts), fetch=True)
+                by_id = {row[0]: row for row in rows}
+                inserted = {insert[0]: by_id[task_id] for task_id, insert in zip(ids, inserts)}
+            if updates:
+                assignments = ", ".join(f"{field} = v.{field}" for field in UPDATABLE_FIELDS)
+                rows = execute_values(cur, f"""
+                    UPDATE tasks SET {assignments}
+                    FROM (VALUES %s) AS v (id, base_version, {fields})
+                    WHERE tasks.id = v.id AND tasks.user_id = {int(user_id)} AND tasks.row_version = v.base_version
+                    RETURNING {', '.join(f"tasks.{column}" for column in SYNC_COLUMNS.split(', '))}
+                """, updates, template="(%s, %s::bigint, %s, %s, %s::date, %s, %s, %s::integer)",
+                    page_size=len(updates), fetch=True)
+                applied.update((row[0], row) for row in rows)
+            if deletes:
+                rows = execute_values(cur, f"""
+                    DELETE FROM tasks USING (VALUES %s) AS v (id, base_version)
+                    WHERE tasks.id = v.id AND tasks.user_id = {int(user_id)} AND tasks.row_version = v.base_version
+                    RETURNING tasks.id
+                """, deletes, template="(%s, %s::bigint)", page_size=len(deletes), fetch=True)
+                applied.update((row[0], None) for row in rows)
+            # Whatever did not apply was changed or deleted by someone else since the replica saw it
+            lost = [op[0] for op in (*updates, *deletes) if op[0] not in applied]
+            if lost:
+                conflicts = dict.fromkeys(lost)
+                cur.execute(f"SELECT {SYNC_COLUMNS} FROM tasks WHERE user_id = %s AND id = ANY(%s)",
+                            (user_id, lost))
+                conflicts.update((row[0], row) for row in cur.fetchall())
+            conn.commit()
+        return inserted, applied, conflicts
+
+    @instrumented("export_tasks", rows=lambda result: result)
+    def export_tasks(self, user_id, out, fmt="csv", progress=None):
+        # Streams the user's tasks to a text file object with COPY TO STDOUT
+        columns = ", ".join(bulk.EXPORT_FIELDS)
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM tasks WHERE user_id = %s", (user_id,))
+            total = cur.fetchone()[0]
+            query = cur.mogrify(f"SELECT {columns} FROM tasks WHERE user_id = %s ORDER BY id", (user_id,)).decode()
+            if fmt == "csv":
+                sql = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)"
+            elif fmt == "jsonl":
+                # One JSON object per line; control-character quote/delimiter keep COPY from escaping it
+                sql = (f"COPY (SELECT row_to_json(t) FROM ({query}) t) TO STDOUT "
+                       f"WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')")
+            else:
+                raise ValueError(f"Unsupported format: {fmt}")
+            writer = bulk.ProgressWriter(out, total, progress)
+            cur.copy_expert(sql, writer)
+            conn.rollback()
+        if progress:
+            progress((total, total))
+        return total
+
+    @instrumented("import_tasks", rows=lambda result: result[0])
+    def import_tasks(self, user_id, source, fmt="csv", chunk_size=5000, progress=None):
+        # Streams rows from a text file object into tasks with COPY FROM STDIN, validating a
+        # chunk at a time. Invalid rows are skipped and reported; valid rows commit together.
+        # Returns (imported_count, [(line_number, error), ...]).
+        errors = []
+        imported = 0
+        copy_sql = ("COPY tasks (user_id, title, description, due_date, priority, status, progress) "
+                    "FROM STDIN WITH (FORMAT csv)")
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("SET LOCAL tasks.bulk = 'on'")
+            for chunk in bulk.validated_chunks(source, fmt, chunk_size, errors):
+                cur.copy_expert(copy_sql, bulk.csv_buffer(chunk, prefix=(user_id,)))
+                imported += len(chunk)
+                if progress:
+                    progress((imported, None))
+            if imported:
+                cur.execute("SELECT pg_notify(%s, 'RELOAD:0')", (self.channel_for(user_id),))
+            conn.commit()
+        return imported, errors
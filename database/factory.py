@@ -0,0 +1,37 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("postgres", "sqlite", "replica", "http")
+
+
+def open_database(backend=None, **options):
+    # Picks the storage backend from config.DB_BACKEND (default "postgres"); the driver
+    # module is imported only for the backend in use, so SQLite installs need no psycopg2.
+    # "replica" serves reads from a local SQLite copy kept in sync with Postgres, and
+    # "http" goes through a shared task service (service/server.py) at config.SERVICE_URL.
+    try:
+        import config
+    except ImportError:
+        config = None
+    backend = backend or getattr(config, "DB_BACKEND", "postgres")
+    if backend != "postgres":
+        # The Postgres backend reads its settings from config itself
+        options.setdefault("archive_after_days", getattr(config, "ARCHIVE_AFTER_DAYS", 90))
+    if backend == "postgres":
+        from database.db import Database
+        return Database(**options)
+    if backend == "sqlite":
+        from database.sqlite_db import SQLiteDatabase
+        options.setdefault("path", getattr(config, "SQLITE_PATH", "tasks.db"))
+        return SQLiteDatabase(**options)
+    if backend == "replica":
+        from database.replica import ReplicatedDatabase
+        options.setdefault("path", getattr(config, "REPLICA_PATH", "tasks_replica.db"))
+        options.setdefault("sync_interval", getattr(config, "SYNC_INTERVAL", 30))
+        return ReplicatedDatabase(**options)
+    if backend == "http":
+        from database.http_db import HttpDatabase
+        options.setdefault("url", getattr(config, "SERVICE_URL", "http://127.0.0.1:8765"))
+        return HttpDatabase(**options)
+    raise ValueError(f"Unknown database backend {backend!r}; expected one of {', '.join(BACKENDS)}")
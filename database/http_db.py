@@ -0,0 +1,344 @@
+import codecs
+import datetime
+import http.client
+import json
+import logging
+import tempfile
+import threading
+import urllib.parse
+from database import bulk
+from database.base import TaskStorage, ARCHIVE_BATCH
+from instrumentation.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Seconds the change feed's long poll is held open by the service
+FEED_WAIT = 25
+TRANSFER_CHUNK_BYTES = 64 * 1024
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"Task service error {status}: {message}")
+        self.status = status
+
+
+def _task(row):
+    # A task row from JSON, with the due date back as a date
+    row = list(row)
+    if row[3] is not None:
+        row[3] = datetime.date.fromisoformat(row[3][:10])
+    return tuple(row)
+
+
+def _encode(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+class HttpDatabase(TaskStorage):
+    # Tasks through the HTTP service (service/server.py) instead of a database connection.
+    # Each worker thread keeps one keep-alive connection; task lists are revalidated
+    # with their ETag so an unchanged list costs a 304 and no query.
+    supports_notifications = True
+
+    def __init__(self, url="http://127.0.0.1:8765", timeout=30, archive_after_days=None):
+        self.archive_after_days = archive_after_days
+        self.source = url.rstrip("/")
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.timeout = timeout
+        self.token = None
+        self._credentials = None
+        self._local = threading.local()
+        self._lists = {}  # path -> (etag, rows) of the last task list fetched
+
+    def close(self):
+        connection = getattr(self._local, "conn", None)
+        if connection is not None:
+            connection.close()
+
+    def create_tables(self):
+        # The service migrates its own database
+        pass
+
+    def _fetchall(self, sql, params=()):
+        raise NotImplementedError("HttpDatabase has no SQL access; reads go through the service")
+
+    def connect(self, timeout=None):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=timeout or self.timeout)
+
+    def _connection(self):
+        connection = getattr(self._local, "conn", None)
+        if connection is None:
+            connection = self._local.conn = self.connect()
+        return connection
+
+    def auth_headers(self):
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    def _request(self, method, path, body=None, headers=None, stream=False):
+        headers = {**self.auth_headers(), **(headers or {})}
+        if body is not None and not hasattr(body, "read"):
+            body = json.dumps(body, default=_encode).encode()
+            headers["Content-Type"] = "application/json"
+        # Each recovery is tried once per request: a restarted service first drops the
+        # kept-alive connection and then no longer knows the session
+        reconnected = signed_in_again = False
+        while True:
+            connection = self._connection()
+            reused = connection.sock is not None
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The service closed an idle keep-alive connection; the request never ran
+                connection.close()
+                if not reused or reconnected or hasattr(body, "read"):
+                    raise
+                reconnected = True
+                continue
+            if response.status == 401 and self._credentials and not signed_in_again:
+                # The service restarted and forgot the session; sign in again once
+                response.read()
+                signed_in_again = True
+                self._sign_in("/session", *self._credentials)
+                headers.update(self.auth_headers())
+                continue
+            if stream and response.status == 200:
+                return response
+            data = response.read()
+            if response.status >= 400:
+                try:
+                    message = json.loads(data)["error"]
+                except (ValueError, KeyError):
+                    message = data.decode(errors="replace")
+                raise ServiceError(response.status, message)
+            return response.status, response.getheader("ETag"), json.loads(data) if data else None
+
+    def _json(self, method, path, body=None):
+        return self._request(method, path, body)[2]
+
+    def _sign_in(self, path, username, password):
+        # Bypasses the retry in _request, which itself signs in again
+        connection = self._connection()
+        connection.request("POST", path, body=json.dumps({"username": username, "password": password}),
+                           headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        data = json.loads(response.read())
+        if response.status >= 400:
+            raise ServiceError(response.status, data.get("error"))
+        if data.get("user_id") is not None:
+            self.token = data["token"]
+            self._credentials = (username, password)
+            self.server_search_threshold = data.get("server_search_threshold")
+        return data.get("user_id")
+
+    def register_user(self, username, password):
+        return self._sign_in("/users", username, password)
+
+    @instrumented("verify_user")
+    def verify_user(self, username, password):
+        return self._sign_in("/session", username, password)
+
+    @instrumented("get_user_tasks")
+    def get_user_tasks(self, user_id):
+        return self._cached_list("/tasks")
+
+    def _cached_list(self, path):
+        cached = self._lists.get(path)
+        headers = {"If-None-Match": cached[0]} if cached else None
+        status, etag, data = self._request("GET", path, headers=headers)
+        if status == 304:
+            return cached[1]
+        rows = [_task(row) for row in data]
+        if etag:
+            self._lists[path] = (etag, rows)
+        return rows
+
+    @instrumented("get_task")
+    def get_task(self, task_id):
+        try:
+            return _task(self._json("GET", f"/tasks/{int(task_id)}"))
+        except ServiceError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def get_task_status(self, task_id):
+        task = self.get_task(task_id)
+        return task is not None and task[5] == "Completed"
+
+    @instrumented("get_tasks_by_ids")
+    def get_tasks_by_ids(self, user_id, task_ids):
+        return [_task(row) for row in self._json("POST", "/tasks/lookup", {"ids": list(task_ids)})]
+
+    @instrumented("query_tasks", rows=lambda result: len(result[0]))
+    def query_tasks(self, user_id, status=None, due_from=None, due_to=None, priority=None,
+                    search=None, sort="due_date", descending=False, cursor=None, limit=100):
+        # Same contract as TaskStorage.query_tasks; the cursor is an opaque string here
+        query = {"sort": sort, "limit": limit, "descending": "1" if descending else ""}
+        for name, value in (("status", status), ("priority", priority)):
+            if value:
+                query[name] = value if isinstance(value, str) else ",".join(value)
+        for name, value in (("due_from", due_from), ("due_to", due_to), ("search", search), ("cursor", cursor)):
+            if value is not None:
+                query[name] = value.isoformat() if isinstance(value, datetime.date) else value
+        data = self._json("GET", f"/tasks/query?{urllib.parse.urlencode(query)}")
+        return [_task(row) for row in data["rows"]], data["cursor"]
+
+    @instrumented("search_tasks")
+    def search_tasks(self, user_id, text, limit=200):
+        query = urllib.parse.urlencode({"text": text, "limit": limit})
+        return [_task(row) for row in self._json("GET", f"/tasks/search?{query}")]
+
+    @instrumented("dashboard_stats", rows=lambda result: len(result["weeks"]))
+    def dashboard_stats(self, user_id, today, weeks=12):
+        stats = self._json("GET", f"/dashboard?today={today.isoformat()}&weeks={int(weeks)}")
+        stats["weeks"] = [datetime.date.fromisoformat(week) for week in stats["weeks"]]
+        return stats
+
+    @instrumented("add_task")
+    def add_task(self, user_id, title, desc, due_date, priority, status, progress=0):
+        return _task(self._json("POST", "/tasks", {"task": [title, desc, due_date, priority, status, progress]}))
+
+    @instrumented("update_task")
+    def update_task(self, task_id, title, desc, due_date, priority, status, progress):
+        values = [title, desc, due_date, priority, status, progress]
+        return _task(self._json("PUT", f"/tasks/{int(task_id)}", {"task": values}))
+
+    @instrumented("delete_task")
+    def delete_task(self, task_id):
+        return self._json("DELETE", f"/tasks/{int(task_id)}")["deleted"]
+
+    @instrumented("add_tasks")
+    def add_tasks(self, user_id, tasks):
+        return [_task(row) for row in self._json("POST", "/tasks/batch", {"tasks": [list(task) for task in tasks]})]
+
+    def _update_rows(self, groups):
+        edits = {task_id: dict(zip(fields, values)) for fields, rows in groups for task_id, *values in rows}
+        return [_task(row) for row in self._json("PATCH", "/tasks", {"edits": edits})]
+
+    @instrumented("delete_tasks")
+    def delete_tasks(self, task_ids):
+        return self._json("POST", "/tasks/delete", {"ids": list(task_ids)})["deleted"]
+
+    @instrumented("archive_completed", rows=len)
+    def archive_completed(self, user_id, older_than_days, batch_size=ARCHIVE_BATCH):
+        # Always the signed-in user's tasks; archiving every account is done on the service's host
+        data = self._json("POST", "/archive", {"older_than_days": older_than_days, "batch_size": batch_size})
+        return data["archived"]
+
+    @instrumented("restore_tasks")
+    def restore_tasks(self, user_id, task_ids):
+        return [_task(row) for row in self._json("POST", "/archive/restore", {"ids": list(task_ids)})]
+
+    @instrumented("archived_tasks", rows=lambda result: len(result[0]))
+    def archived_tasks(self, user_id, cursor=None, limit=100):
+        query = {"limit": limit, **({"cursor": cursor} if cursor is not None else {})}
+        data = self._json("GET", f"/archive?{urllib.parse.urlencode(query)}")
+        return [_task(row) for row in data["rows"]], data["cursor"]
+
+    @instrumented("archived_count")
+    def archived_count(self, user_id):
+        return self._json("GET", "/archive/count")["count"]
+
+    @instrumented("export_tasks")
+    def export_tasks(self, user_id, out, fmt="csv", progress=None):
+        # Streams the service's export into out; returns the number of tasks written
+        response = self._request("GET", f"/export?format={urllib.parse.quote(fmt)}", stream=True)
+        # Chunks can end inside a multi-byte character or a quoted multi-line field
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        counter = bulk.RecordCounter(fmt)
+        while chunk := response.read(TRANSFER_CHUNK_BYTES):
+            text = decoder.decode(chunk)
+            out.write(text)
+            counter.feed(text)
+            if progress:
+                progress((counter.records, None))
+        out.write(decoder.decode(b"", final=True))
+        # CSV starts with a header line
+        records = counter.records
+        return records - 1 if fmt == "csv" and records else records
+
+    @instrumented("import_tasks", rows=lambda result: result[0])
+    def import_tasks(self, user_id, source, fmt="csv", chunk_size=5000, progress=None):
+        # The file is sent whole and imported by the service in one transaction
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as upload:
+            while text := source.read(TRANSFER_CHUNK_BYTES):
+                upload.write(text.encode("utf-8"))
+            size = upload.tell()
+            upload.seek(0)
+            data = self._request("POST", f"/import?format={urllib.parse.quote(fmt)}", body=upload,
+                                 headers={"Content-Length": str(size), "Content-Type": "text/plain"})[2]
+        if progress:
+            progress((data["imported"], None))
+        return data["imported"], [tuple(error) for error in data["errors"]]
+
+    def open_listener(self, user_id):
+        return ChangeFeed(self)
+
+    @staticmethod
+    def read_notifications(conn):
+        return conn.read()
+
+
+class ChangeFeed:
+    # The service's long-poll change feed, shaped like a LISTEN connection for
+    # ChangeListener: fileno() turns readable when the pending poll is answered, and
+    # read() returns its changes as (op, task_id) and sends the next poll.
+    _signed_in_again = False
+
+    def __init__(self, db):
+        self.db = db
+        self.conn = db.connect(timeout=FEED_WAIT + db.timeout)
+        self._open()
+        data = self._response()
+        if data is None:
+            # Signed in again; the feed is opened right away, so wait for the answer
+            self._open()
+            data = self._response()
+        self.cursor = data["cursor"]
+        self._poll()
+
+    def fileno(self):
+        return self.conn.sock.fileno()
+
+    def _open(self):
+        self.conn.request("GET", "/changes", headers=self.db.auth_headers())
+
+    def _poll(self):
+        query = urllib.parse.urlencode({"since": self.cursor, "wait": FEED_WAIT})
+        self.conn.request("GET", f"/changes?{query}", headers=self.db.auth_headers())
+
+    def _response(self):
+        # The answer's JSON, or None when the service restarted and forgot the session and
+        # the feed signed in again; the caller sends its request once more. A second 401
+        # in a row is an error, like in HttpDatabase._request.
+        response = self.conn.getresponse()
+        data = response.read()
+        if response.status == 401 and self.db._credentials and not self._signed_in_again:
+            self._signed_in_again = True
+            self.db._sign_in("/session", *self.db._credentials)
+            return None
+        if response.status != 200:
+            raise ServiceError(response.status, data.decode(errors="replace"))
+        self._signed_in_again = False
+        return json.loads(data)
+
+    def read(self):
+        data = self._response()
+        if data is None:
+            # Called from the event loop, so poll again rather than wait for the answer
+            self._poll()
+            return []
+        self.cursor = data["cursor"]
+        self._poll()
+        return [(op, task_id) for op, task_id in data["changes"]]
+
+    def close(self):
+        self.conn.close()
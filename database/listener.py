@@ -0,0 +1,100 @@
+from PyQt6.QtCore import QObject, QSocketNotifier, QTimer, pyqtSignal
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeListener(QObject):
+    # Watches the LISTEN connection's socket from the Qt event loop and reports
+    # task changes made by any client. Bursts are coalesced into one signal.
+    changes = pyqtSignal(list, list)  # inserted/updated ids, deleted ids
+    reconnected = pyqtSignal()
+    reload_requested = pyqtSignal()  # a bulk change touched too many rows to list
+
+    COALESCE_MS = 50
+    RECONNECT_MS = 5000
+
+    def __init__(self, db, user_id, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.user_id = user_id
+        self.conn = None
+        self.notifier = None
+        self._changed = set()
+        self._deleted = set()
+        self._reload = False
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(self.COALESCE_MS)
+        self._flush_timer.timeout.connect(self._flush)
+
+        self._reconnect_timer = QTimer(self)
+        self._reconnect_timer.setSingleShot(True)
+        self._reconnect_timer.setInterval(self.RECONNECT_MS)
+        self._reconnect_timer.timeout.connect(self._reconnect)
+
+        self._connect()
+
+    def _connect(self):
+        self.conn = self.db.open_listener(self.user_id)
+        self.notifier = QSocketNotifier(self.conn.fileno(), QSocketNotifier.Type.Read, self)
+        self.notifier.activated.connect(self._on_readable)
+
+    def _on_readable(self):
+        try:
+            changes = self.db.read_notifications(self.conn)
+        except Exception as e:
+            logger.warning("Change listener lost its connection: %s", e)
+            self._disconnect()
+            self._reconnect_timer.start()
+            return
+        for op, task_id in changes:
+            if op == "RELOAD":
+                self._reload = True
+            elif op == "DELETE":
+                self._changed.discard(task_id)
+                self._deleted.add(task_id)
+            else:
+                self._deleted.discard(task_id)
+                self._changed.add(task_id)
+        if changes and not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flush(self):
+        changed, deleted = list(self._changed), list(self._deleted)
+        self._changed.clear()
+        self._deleted.clear()
+        if self._reload:
+            # A full refresh covers any individual changes in the same burst
+            self._reload = False
+            self.reload_requested.emit()
+        elif changed or deleted:
+            self.changes.emit(changed, deleted)
+
+    def _reconnect(self):
+        try:
+            self._connect()
+        except Exception as e:
+            logger.warning("Change listener reconnect failed: %s", e)
+            self._reconnect_timer.start()
+            return
+        # Anything committed while we were disconnected was missed
+        self.reconnected.emit()
+
+    def _disconnect(self):
+        if self.notifier is not None:
+            self.notifier.setEnabled(False)
+            self.notifier.deleteLater()
+            self.notifier = None
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def close(self):
+        self._flush_timer.stop()
+        self._reconnect_timer.stop()
+        self._disconnect()
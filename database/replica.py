@@ -0,0 +1,395 @@
+import logging
+import threading
+import psycopg2
+from psycopg2 import pool
+from database.base import TASK_COLUMNS, UPDATABLE_FIELDS, ARCHIVE_BATCH, group_edits, hash_password
+from database.sqlite_db import SQLiteDatabase, MIGRATIONS, MAX_VARIABLES
+from instrumentation.metrics import instrumented, metrics
+
+logger = logging.getLogger(__name__)
+
+PULL_PAGE = 5000
+PUSH_BATCH = 500
+
+# Errors meaning the server could not be reached, as opposed to a rejected change
+OFFLINE_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, pool.PoolError)
+
+FIELDS = ", ".join(UPDATABLE_FIELDS)
+
+
+def _create_sync_tables(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    if "row_version" not in columns:
+        # 0 marks rows the server has not assigned a version yet
+        conn.execute("ALTER TABLE tasks ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+    # One pending entry per task; later local writes merge into it
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_outbox (
+            task_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            base_version INTEGER NOT NULL,
+            seq INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            user_id INTEGER PRIMARY KEY,
+            watermark INTEGER NOT NULL
+        )
+    """)
+
+
+def _reset_watermarks(conn):
+    # Watermarks were row versions and are now server transaction ids; pull everything
+    # once, skipping the rows already held
+    conn.execute("DELETE FROM sync_state")
+
+
+def _connect_remote():
+    from database.db import Database
+    return Database()
+
+
+class ReplicatedDatabase(SQLiteDatabase):
+    # A local SQLite copy of the user's tasks in front of the Postgres database. Reads
+    # never leave the machine; writes apply locally and are queued in sync_outbox, and
+    # sync() pushes the queue and pulls rows changed on the server since the watermark.
+    # Updates and deletes carry the row_version they were based on, and when the server
+    # copy has moved on since, the server copy wins.
+    replicated = True
+    supports_notifications = True
+    MIGRATIONS = MIGRATIONS + [
+        (100, _create_sync_tables),
+        (101, _reset_watermarks),
+    ]
+
+    def __init__(self, path="tasks_replica.db", sync_interval=30, connect_remote=_connect_remote,
+                 archive_after_days=None):
+        # Seconds between syncs when the server's change notifications are unavailable
+        self.sync_interval = sync_interval
+        self._connect_remote = connect_remote
+        self._remote = None
+        self._remote_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._sync_requested = False
+        super().__init__(path, archive_after_days)
+
+    def remote(self):
+        # Connected on first use, so the app starts and reads while the server is unreachable
+        with self._remote_lock:
+            if self._remote is None:
+                self._remote = self._connect_remote()
+            return self._remote
+
+    def close(self):
+        if self._remote is not None:
+            self._remote.close()
+        super().close()
+
+    def open_listener(self, user_id):
+        return self.remote().open_listener(user_id)
+
+    def read_notifications(self, conn):
+        return self.remote().read_notifications(conn)
+
+    def register_user(self, username, password):
+        return self.remote().register_user(username, password)
+
+    def verify_user(self, username, password):
+        # Checked against the server when it is reachable; accounts that signed in on this
+        # machine before are remembered so they can sign in offline
+        try:
+            user_id = self.remote().verify_user(username, password)
+        except OFFLINE_ERRORS as e:
+            logger.warning("Server unreachable, signing in against the local replica: %s", e)
+            rows = self._fetchall("SELECT id FROM users WHERE username = ? AND password = ?",
+                                  (username, hash_password(password)))
+            return rows[0][0] if rows else None
+        if user_id is not None:
+            with self.connection() as conn:
+                conn.execute("""
+                    INSERT INTO users (id, username, password) VALUES (?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET username = excluded.username, password = excluded.password
+                """, (user_id, username, hash_password(password)))
+                conn.commit()
+        return user_id
+
+    def import_tasks(self, user_id, source, fmt="csv", chunk_size=5000, progress=None):
+        # Bulk loads go straight to the server as COPY; the next sync pulls the new rows
+        return self.remote().import_tasks(user_id, source, fmt, chunk_size, progress)
+
+    # The archive lives only on the server: moved tasks come back from the next sync as
+    # deletions and restored ones as new rows
+    def archive_completed(self, user_id, older_than_days, batch_size=ARCHIVE_BATCH):
+        return self.remote().archive_completed(user_id, older_than_days, batch_size)
+
+    def restore_tasks(self, user_id, task_ids):
+        return self.remote().restore_tasks(user_id, task_ids)
+
+    def archived_tasks(self, user_id, cursor=None, limit=100):
+        return self.remote().archived_tasks(user_id, cursor, limit)
+
+    def archived_count(self, user_id):
+        return self.remote().archived_count(user_id)
+
+    # Local writes: applied to the replica and queued for the next push
+    @instrumented("add_task")
+    def add_task(self, user_id, title, desc, due_date, priority, status, progress=0):
+        return self._insert_local(user_id, [(title, desc, due_date, priority, status, progress)])[0]
+
+    @instrumented("add_tasks")
+    def add_tasks(self, user_id, tasks):
+        return self._insert_local(user_id, tasks)
+
+    @instrumented("update_task")
+    def update_task(self, task_id, title, desc, due_date, priority, status, progress):
+        rows = self._update_rows(group_edits({task_id: dict(zip(UPDATABLE_FIELDS, (
+            title, desc, due_date, priority, status, progress)))}))
+        return rows[0] if rows else None
+
+    @instrumented("delete_task")
+    def delete_task(self, task_id):
+        deleted = self._delete_local([task_id])
+        return deleted[0] if deleted else None
+
+    @instrumented("delete_tasks")
+    def delete_tasks(self, task_ids):
+        return self._delete_local(task_ids)
+
+    def _insert_local(self, user_id, tasks):
+        # New tasks get negative ids until a push assigns the server's id. Ids still
+        # queued count as taken, so a task deleted before its push is never reused.
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            next_id = conn.execute("""
+                SELECT min(coalesce((SELECT min(id) FROM tasks), 0),
+                           coalesce((SELECT min(task_id) FROM sync_outbox), 0), 0) - 1
+            """).fetchone()[0]
+            rows = []
+            for offset, task in enumerate(tasks):
+                task_id = next_id - offset
+                rows.append(conn.execute(f"""
+                    INSERT INTO tasks (id, user_id, {FIELDS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    RETURNING {TASK_COLUMNS}
+                """, (task_id, user_id, *task)).fetchone())
+                self._enqueue(conn, task_id, user_id, "insert", 0)
+            conn.commit()
+            return rows
+
+    def _update_rows(self, groups):
+        rows = []
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for fields, values in groups:
+                assignments = ", ".join(f"{field} = ?" for field in fields)
+                sql = f"UPDATE tasks SET {assignments} WHERE id = ? RETURNING {TASK_COLUMNS}, user_id, row_version"
+                for task_id, *field_values in values:
+                    row = conn.execute(sql, (*field_values, task_id)).fetchone()
+                    if row is not None:
+                        rows.append(row[:-2])
+                        self._enqueue(conn, task_id, row[-2], "update", row[-1])
+            conn.commit()
+        return rows
+
+    def _delete_local(self, task_ids):
+        task_ids = list(task_ids)
+        deleted = []
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for start in range(0, len(task_ids), MAX_VARIABLES):
+                clause, params = self._in_clause("id", task_ids[start:start + MAX_VARIABLES])
+                for task_id, user_id, row_version in conn.execute(
+                        f"DELETE FROM tasks WHERE {clause} RETURNING id, user_id, row_version", params).fetchall():
+                    deleted.append(task_id)
+                    self._enqueue(conn, task_id, user_id, "delete", row_version)
+            conn.commit()
+        return deleted
+
+    @staticmethod
+    def _enqueue(conn, task_id, user_id, op, base_version):
+        # An insert stays an insert until pushed and a delete overrides anything queued;
+        # the base version stays that of the first unpushed write. seq changes on every
+        # write so a push can tell whether the entry moved on while it was in flight.
+        # A new local task never reuses a queued id, but should one land on the delete
+        # of a task that never reached the server, it is queued as the insert it is.
+        seq = conn.execute("SELECT coalesce(max(seq), 0) + 1 FROM sync_outbox").fetchone()[0]
+        conn.execute("""
+            INSERT INTO sync_outbox (task_id, user_id, op, base_version, seq) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (task_id) DO UPDATE SET
+                op = CASE WHEN excluded.op = 'delete' THEN 'delete'
+                          WHEN excluded.op = 'insert' AND sync_outbox.task_id <= 0 THEN 'insert'
+                          ELSE sync_outbox.op END,
+                seq = excluded.seq
+        """, (task_id, user_id, op, base_version, seq))
+
+    def pending_changes(self, user_id):
+        return self._fetchall("SELECT count(*) FROM sync_outbox WHERE user_id = ?", (user_id,))[0][0]
+
+    @instrumented("sync", rows=lambda result: len(result[0]) + len(result[1]))
+    def sync(self, user_id):
+        # Pushes queued writes, then pulls what changed on the server. Returns the ids
+        # that changed locally as (changed_ids, deleted_ids); while the server is
+        # unreachable the queue is kept for the next attempt.
+        self._sync_requested = True
+        if not self._sync_lock.acquire(blocking=False):
+            # The sync in progress goes round again and covers this request
+            return [], []
+        changed, deleted = set(), set()
+        try:
+            while self._sync_requested:
+                self._sync_requested = False
+                try:
+                    self._push(user_id, changed, deleted)
+                    self._pull(user_id, changed, deleted)
+                except OFFLINE_ERRORS as e:
+                    logger.warning("Sync postponed, server unreachable: %s", e)
+                    break
+        finally:
+            self._sync_lock.release()
+        return list(changed - deleted), list(deleted)
+
+    def _push(self, user_id, changed, deleted):
+        while True:
+            with self.connection() as conn:
+                entries = conn.execute("""
+                    SELECT task_id, op, base_version, seq FROM sync_outbox
+                    WHERE user_id = ? ORDER BY seq LIMIT ?
+                """, (user_id, PUSH_BATCH)).fetchall()
+                clause, params = self._in_clause("id", [entry[0] for entry in entries])
+                local = {row[0]: row[1:] for row in conn.execute(
+                    f"SELECT id, {FIELDS} FROM tasks WHERE {clause}", params)}
+                conn.rollback()
+            if not entries:
+                return
+
+            inserts, updates, deletes = [], [], []
+            for task_id, op, base_version, seq in entries:
+                if op == "delete":
+                    # Tasks that never reached the server only need their entry dropped
+                    if task_id > 0:
+                        deletes.append((task_id, base_version))
+                elif task_id in local:
+                    if op == "insert":
+                        inserts.append((task_id, *local[task_id]))
+                    else:
+                        updates.append((task_id, base_version, *local[task_id]))
+            results = ({}, {}, {})
+            if inserts or updates or deletes:
+                results = self.remote().push_changes(user_id, inserts, updates, deletes)
+            self._apply_push(user_id, entries, *results, changed, deleted)
+            if len(entries) < PUSH_BATCH:
+                return
+
+    def _apply_push(self, user_id, entries, inserted, applied, conflicts, changed, deleted):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for task_id, op, base_version, seq in entries:
+                current = conn.execute("SELECT op, seq FROM sync_outbox WHERE task_id = ?", (task_id,)).fetchone()
+                settled = current is not None and current[1] == seq
+
+                if task_id in inserted:
+                    row = inserted[task_id]
+                    new_id, version = row[0], row[-1]
+                    if settled:
+                        conn.execute("DELETE FROM sync_outbox WHERE task_id = ?", (task_id,))
+                        conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+                        self._store_row(conn, user_id, row)
+                    elif current[0] == "delete":
+                        # Deleted locally while the insert was in flight; delete it on the server next
+                        conn.execute("UPDATE sync_outbox SET task_id = ?, base_version = ? WHERE task_id = ?",
+                                     (new_id, version, task_id))
+                        continue
+                    else:
+                        # Edited while in flight: keep the local edits, now based on the server row
+                        conn.execute("UPDATE tasks SET id = ?, row_version = ? WHERE id = ?", (new_id, version, task_id))
+                        conn.execute("UPDATE sync_outbox SET task_id = ?, op = 'update', base_version = ? "
+                                     "WHERE task_id = ?", (new_id, version, task_id))
+                    deleted.add(task_id)
+                    changed.add(new_id)
+                elif task_id in applied:
+                    row = applied[task_id]
+                    if settled:
+                        conn.execute("DELETE FROM sync_outbox WHERE task_id = ?", (task_id,))
+                        if row is not None:
+                            self._store_row(conn, user_id, row)
+                    elif row is not None:
+                        # Written again meanwhile; that write builds on the version just pushed
+                        conn.execute("UPDATE sync_outbox SET base_version = ? WHERE task_id = ?", (row[-1], task_id))
+                        conn.execute("UPDATE tasks SET row_version = ? WHERE id = ?", (row[-1], task_id))
+                elif task_id in conflicts:
+                    # Changed or deleted on the server since this replica saw it: the server copy wins
+                    row = conflicts[task_id]
+                    logger.warning("Task %s was changed on the server; local %s discarded", task_id, op)
+                    metrics.increment("sync.conflicts")
+                    conn.execute("DELETE FROM sync_outbox WHERE task_id = ?", (task_id,))
+                    if row is None:
+                        conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+                        deleted.add(task_id)
+                    else:
+                        self._store_row(conn, user_id, row)
+                        changed.add(task_id)
+                elif settled:
+                    conn.execute("DELETE FROM sync_outbox WHERE task_id = ?", (task_id,))
+            conn.commit()
+
+    def _pull(self, user_id, changed, deleted):
+        # The watermark is the server's oldest running transaction at the last pull, so
+        # rows committed late still come through. It only moves once every page is
+        # applied, to the horizon of the first page: later pages may miss a commit that
+        # lands between them, and the next sync picks it up.
+        rows = self._fetchall("SELECT watermark FROM sync_state WHERE user_id = ?", (user_id,))
+        since = rows[0][0] if rows else 0
+        horizon = None
+        after = 0
+        while True:
+            rows, page_horizon = self.remote().pull_changes(user_id, since, after, PULL_PAGE)
+            if horizon is None:
+                horizon = page_horizon
+            if rows:
+                after = rows[-1][-2]
+                self._apply_pulled(user_id, rows, changed, deleted)
+            if len(rows) < PULL_PAGE:
+                break
+        with self.connection() as conn:
+            conn.execute("""
+                INSERT INTO sync_state (user_id, watermark) VALUES (?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET watermark = excluded.watermark
+            """, (user_id, horizon))
+            conn.commit()
+
+    def _apply_pulled(self, user_id, rows, changed, deleted):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Rows with unpushed local writes are settled by the push, not overwritten here
+            pending = {row[0] for row in conn.execute("SELECT task_id FROM sync_outbox WHERE user_id = ?", (user_id,))}
+            for row in rows:
+                task_id, version, is_deleted = row[0], row[-2], row[-1]
+                if task_id in pending:
+                    continue
+                if is_deleted:
+                    # Tombstones of transactions still running at the last pull come
+                    # back again; a task restored since then has a newer version and stays
+                    if conn.execute("DELETE FROM tasks WHERE id = ? AND row_version < ?",
+                                    (task_id, version)).rowcount:
+                        deleted.add(task_id)
+                    continue
+                local = conn.execute("SELECT row_version FROM tasks WHERE id = ?", (task_id,)).fetchone()
+                if local is None or local[0] != version:
+                    self._store_row(conn, user_id, row[:-1])
+                    changed.add(task_id)
+                    deleted.discard(task_id)
+            conn.commit()
+
+    @staticmethod
+    def _store_row(conn, user_id, row):
+        # row is a server row as SYNC_COLUMNS
+        conn.execute(f"""
+            INSERT INTO tasks (id, {FIELDS}, created_date, completed_at, row_version, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                title = excluded.title, description = excluded.description, due_date = excluded.due_date,
+                priority = excluded.priority, status = excluded.status, progress = excluded.progress,
+                created_date = excluded.created_date, completed_at = excluded.completed_at,
+                row_version = excluded.row_version
+        """, (*row, user_id))
@@ -0,0 +1,136 @@
+import re
+
+_WORD = re.compile(r"\w+")
+
+# Score weights for ranking matches
+TITLE_MATCH = 4
+TITLE_PREFIX = 2
+DESCRIPTION_MATCH = 1
+
+
+class SearchIndex:
+    # Trigram index over task titles and descriptions, updated one task at a time.
+    # Queries of three or more characters intersect trigram postings and then confirm
+    # the substring; shorter queries match word prefixes.
+    def __init__(self):
+        self._titles = {}
+        self._descriptions = {}
+        self._grams = {}
+        self._title_prefixes = {}
+        self._description_prefixes = {}
+
+    def __len__(self):
+        return len(self._titles)
+
+    def rebuild(self, tasks):
+        self.__init__()
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task):
+        task_id = task[0]
+        if task_id in self._titles:
+            self.remove(task_id)
+        title = (task[1] or "").lower()
+        description = (task[2] or "").lower()
+        self._titles[task_id] = title
+        self._descriptions[task_id] = description
+        for gram in self._trigrams(title) | self._trigrams(description):
+            self._grams.setdefault(gram, set()).add(task_id)
+        for prefix in self._word_prefixes(title):
+            self._title_prefixes.setdefault(prefix, set()).add(task_id)
+        for prefix in self._word_prefixes(description):
+            self._description_prefixes.setdefault(prefix, set()).add(task_id)
+
+    def remove(self, task_id):
+        title = self._titles.pop(task_id, None)
+        if title is None:
+            return
+        description = self._descriptions.pop(task_id)
+        self._discard(self._grams, self._trigrams(title) | self._trigrams(description), task_id)
+        self._discard(self._title_prefixes, self._word_prefixes(title), task_id)
+        self._discard(self._description_prefixes, self._word_prefixes(description), task_id)
+
+    def search(self, text, limit=None):
+        # Returns matching task ids, best matches first
+        query = text.strip().lower()
+        if not query:
+            return list(self._titles)
+
+        if len(query) < 3:
+            return self._search_prefix(query, limit)
+
+        postings = [self._grams.get(gram) for gram in self._trigrams(query)]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+
+        buckets = {}
+        for task_id in candidates:
+            title = self._titles[task_id]
+            score = 0
+            if query in title:
+                score += TITLE_MATCH
+                if title.startswith(query) or f" {query}" in title:
+                    score += TITLE_PREFIX
+            if query in self._descriptions[task_id]:
+                score += DESCRIPTION_MATCH
+            if score:
+                buckets.setdefault(score, []).append(task_id)
+        return self._ranked(buckets, limit)
+
+    @staticmethod
+    def matches(task, text):
+        # Same matching rules as search, for a single task outside the index
+        query = text.strip().lower()
+        if not query:
+            return True
+        title = (task[1] or "").lower()
+        description = (task[2] or "").lower()
+        if len(query) >= 3:
+            return query in title or query in description
+        return (query in SearchIndex._word_prefixes(title)
+                or query in SearchIndex._word_prefixes(description))
+
+    def _search_prefix(self, query, limit):
+        # Set algebra instead of per-task scoring keeps one- and two-letter queries cheap
+        title_ids = self._title_prefixes.get(query, set())
+        description_ids = self._description_prefixes.get(query, set())
+        buckets = {
+            TITLE_MATCH + TITLE_PREFIX + DESCRIPTION_MATCH: title_ids & description_ids,
+            TITLE_MATCH + TITLE_PREFIX: title_ids - description_ids,
+            DESCRIPTION_MATCH: description_ids - title_ids,
+        }
+        return self._ranked(buckets, limit)
+
+    @staticmethod
+    def _ranked(buckets, limit):
+        # Highest score first; ties keep task id order so results are stable between keystrokes
+        ranked = []
+        for score in sorted(buckets, reverse=True):
+            ranked.extend(sorted(buckets[score]))
+            if limit is not None and len(ranked) >= limit:
+                return ranked[:limit]
+        return ranked
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    @staticmethod
+    def _word_prefixes(text):
+        prefixes = set()
+        for word in _WORD.findall(text):
+            prefixes.add(word[:1])
+            prefixes.add(word[:2])
+        return prefixes
+
+    @staticmethod
+    def _discard(index, keys, task_id):
+        for key in keys:
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del index[key]
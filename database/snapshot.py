@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+import numpy as np
+from database.task_columns import TaskColumns, STATUS_NAMES, PRIORITY_NAMES
+
+logger = logging.getLogger(__name__)
+
+# The last task table a user saw, saved on disk so the next launch can paint it before
+# the database answers. Layout, little-endian:
+#   magic, format version and header length (PREFIX)
+#   a JSON header: owner, save time, task count, code tables and column offsets
+#   each packed column's raw values, starting 8-byte aligned after the header
+#   the UTF-8 text buffer
+# Columns are read straight out of a memory map, so loading costs one copy of the
+# data and no per-task parsing. Files for another user, database or format are ignored.
+MAGIC = b"TASKSNAP"
+VERSION = 1
+PREFIX = struct.Struct("<8sII")
+ALIGN = 8
+
+
+def path_for(db, user_id):
+    # <config.SNAPSHOT_DIR>/<database>-<user id>.snap, or None when snapshots are off or
+    # the database does not outlive the process
+    try:
+        import config
+    except ImportError:
+        config = None
+    directory = getattr(config, "SNAPSHOT_DIR", os.path.join("~", ".cache", "task_note"))
+    if directory is None or db.source is None:
+        return None
+    name = hashlib.sha1(db.source.encode()).hexdigest()[:12]
+    return os.path.join(os.path.expanduser(directory), f"{name}-{user_id}.snap")
+
+
+def _aligned(size):
+    return -(-size // ALIGN) * ALIGN
+
+
+def write(path, packed, user_id, source):
+    # packed is TaskColumns.packed(), taken on the GUI thread so this may run on the worker.
+    # Written to a temporary file of its own beside the old one and renamed over it, so
+    # readers never see half a file and saves on other worker threads cannot mix.
+    packed, blob = packed
+    layout = {}
+    offset = 0
+    for name, values in packed.items():
+        layout[name] = [values.dtype.newbyteorder("<").str, offset]
+        offset += _aligned(values.nbytes)
+    header = json.dumps({
+        "user_id": user_id,
+        "source": source,
+        "saved_at": time.time(),
+        "count": len(packed["ids"]),
+        "statuses": STATUS_NAMES.names,
+        "priorities": PRIORITY_NAMES.names,
+        "columns": layout,
+        "text": [offset, len(blob)],
+    }).encode()
+    data_start = _aligned(PREFIX.size + len(header))
+
+    temp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(handle, "wb") as out:
+            out.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+            out.write(header)
+            out.write(bytes(data_start - PREFIX.size - len(header)))
+            for name, values in packed.items():
+                out.write(values.astype(layout[name][0], copy=False).view(np.uint8))
+                out.write(bytes(_aligned(values.nbytes) - values.nbytes))
+            out.write(blob)
+        os.replace(temp, path)
+    except OSError as e:
+        logger.warning("Could not save task snapshot %s: %s", path, e)
+        if temp is not None:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+        return False
+    logger.debug("Saved %d tasks to %s", len(packed["ids"]), path)
+    return True
+
+
+def read(path, user_id, source):
+    # (TaskColumns, saved_at) from the snapshot, or None when there is no usable one
+    try:
+        with open(path, "rb") as file:
+            # Unmapped once the last view of it is gone, after the table has copied them
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return _read(data, path, user_id, source)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+        logger.warning("Ignoring unreadable task snapshot %s: %s", path, e)
+        return None
+
+
+def _read(data, path, user_id, source):
+    magic, version, header_length = PREFIX.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        logger.info("Ignoring task snapshot %s in another format", path)
+        return None
+    header = json.loads(data[PREFIX.size:PREFIX.size + header_length])
+    if header["user_id"] != user_id or header["source"] != source:
+        return None
+    if set(header["columns"]) != set(TaskColumns.COLUMNS):
+        raise ValueError("unexpected columns")
+
+    data_start = _aligned(PREFIX.size + header_length)
+    count = header["count"]
+    # Views into the map, copied once into the table
+    columns = {name: np.frombuffer(data, np.dtype(dtype), count, data_start + offset)
+               for name, (dtype, offset) in header["columns"].items()}
+    text_offset, text_length = header["text"]
+    blob = np.frombuffer(data, np.uint8, text_length, data_start + text_offset)
+    # Names seen in that session may have had other codes
+    for name, codes, names in (("status", STATUS_NAMES, header["statuses"]),
+                               ("priority", PRIORITY_NAMES, header["priorities"])):
+        if codes.names[:len(names)] != names:
+            columns[name] = codes.encode(names)[columns[name]]
+    return TaskColumns.from_packed(columns, bytearray(blob)), header["saved_at"]
@@ -0,0 +1,391 @@
+import csv
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from database import bulk
+from database.base import (TaskStorage, TASK_COLUMNS, TASK_INDEXES, ARCHIVE_COLUMNS, ARCHIVE_BATCH, RESTORED_STATUS,
+                           hash_password)
+from instrumentation.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# SQLite has no date type; store ISO strings and convert by declared column type
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda raw: datetime.date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.datetime.fromisoformat(raw.decode()))
+
+# SQLite limits bound parameters per statement; id lists are sent in chunks of this size
+MAX_VARIABLES = 900
+
+
+# Schema changes in the order they were introduced; each runs once and is recorded in
+# schema_version. Replica-only steps are numbered from 100 in database/replica.py.
+def _create_base_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password VARCHAR(64) NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER REFERENCES users(id),
+            title VARCHAR(100) NOT NULL,
+            description TEXT,
+            due_date DATE,
+            priority VARCHAR(20),
+            status VARCHAR(20),
+            progress INTEGER DEFAULT 0,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    for name, definition in TASK_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+def _create_completed_at(conn):
+    # When each task was completed, for the dashboard's burndown and completion rate
+    conn.execute("ALTER TABLE tasks ADD COLUMN completed_at TIMESTAMP")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_completed_insert
+        AFTER INSERT ON tasks
+        FOR EACH ROW WHEN NEW.status = 'Completed' AND NEW.completed_at IS NULL
+        BEGIN
+            UPDATE tasks SET completed_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        END
+    """)
+    # Statements that set completed_at themselves, like a replica applying a server row, keep their value
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_completed_update
+        AFTER UPDATE OF status ON tasks
+        FOR EACH ROW WHEN OLD.status IS NOT NEW.status AND NEW.completed_at IS OLD.completed_at
+        BEGIN
+            UPDATE tasks SET completed_at = CASE WHEN NEW.status = 'Completed' THEN CURRENT_TIMESTAMP END
+            WHERE id = NEW.id;
+        END
+    """)
+    conn.execute("UPDATE tasks SET completed_at = created_date WHERE status = 'Completed'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_completed ON tasks (user_id, completed_at)")
+
+
+def _create_archive(conn):
+    # Completed tasks past the archive age live here, out of the way of active queries
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            title VARCHAR(100) NOT NULL,
+            description TEXT,
+            due_date DATE,
+            priority VARCHAR(20),
+            status VARCHAR(20),
+            progress INTEGER DEFAULT 0,
+            created_date TIMESTAMP,
+            completed_at TIMESTAMP NOT NULL,
+            archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_user_completed "
+                 "ON tasks_archive (user_id, completed_at, id)")
+    # Every task ever created, for the dashboard's history
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS task_history AS
+        SELECT user_id, status, priority, due_date, created_date, completed_at FROM tasks
+        UNION ALL
+        SELECT user_id, status, priority, due_date, created_date, completed_at FROM tasks_archive
+    """)
+
+
+MIGRATIONS = [
+    (1, _create_base_tables),
+    (2, _create_completed_at),
+    (3, _create_archive),
+]
+
+
+class SQLiteDatabase(TaskStorage):
+    # Embedded single-file backend for local installs, tests and benchmarks. Each thread
+    # gets its own connection; WAL mode lets worker-thread reads run beside a writer.
+    PLACEHOLDER = "?"
+    LIKE = "LIKE"
+    NULLS_SORT_HIGH = False
+    MIGRATIONS = MIGRATIONS
+
+    def __init__(self, path="tasks.db", archive_after_days=None):
+        self.archive_after_days = archive_after_days
+        if path == ":memory:":
+            # A named shared-cache database so every thread sees the same in-memory data
+            self.path = f"file:tasks-{uuid.uuid4().hex}?mode=memory&cache=shared"
+            self.uri = True
+        else:
+            self.path = path
+            self.uri = False
+            self.source = os.path.abspath(path)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # Keeps a shared in-memory database alive for the lifetime of this object
+        self._keepalive = self._connect()
+        self.create_tables()
+        logger.info("Opened SQLite database %s", path)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, uri=self.uri, detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        # The calling thread's connection; the caller commits, errors roll back
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def _fetchall(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, tuple(params)).fetchall()
+
+    def _week_start(self, column):
+        # Forward to the week's Sunday (staying put on a Sunday), then back to its Monday
+        return f"date({column}, 'weekday 0', '-6 days')"
+
+    def _in_clause(self, column, values):
+        values = list(values)
+        return f"{column} IN ({', '.join('?' * len(values))})" if values else "0", values
+
+    @instrumented("create_tables")
+    def create_tables(self):
+        # Brings the schema up to date; when it already is, this is a single query
+        with self.connection() as conn:
+            if not self.pending_migrations(self._applied_migrations(conn)):
+                return
+            # IMMEDIATE takes the write lock up front, so concurrent starts migrate one at a time
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY)")
+            for version, migrate in self.pending_migrations(self._applied_migrations(conn)):
+                logger.info("Applying schema migration %d (%s)", version, migrate.__name__.strip("_"))
+                migrate(conn)
+                conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+            conn.commit()
+
+    @staticmethod
+    def _applied_migrations(conn):
+        try:
+            return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+        except sqlite3.OperationalError:
+            return set()
+
+    @instrumented("register_user")
+    def register_user(self, username, password):
+        try:
+            with self.connection() as conn:
+                cur = conn.execute("INSERT INTO users (username, password) VALUES (?, ?)",
+                                   (username, hash_password(password)))
+                conn.commit()
+                return cur.lastrowid
+        except sqlite3.IntegrityError:
+            return None
+
+    @instrumented("search_tasks")
+    def search_tasks(self, user_id, text, limit=200):
+        # Title matches rank above description-only matches; LIKE is case-insensitive for ASCII
+        pattern = self._like_pattern(text)
+        return self._fetchall(f"""
+            SELECT {TASK_COLUMNS} FROM tasks
+            WHERE user_id = ? AND (title LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\')
+            ORDER BY (title LIKE ? ESCAPE '\\') DESC, id
+            LIMIT ?
+        """, (user_id, pattern, pattern, pattern, limit))
+
+    # Mutations return the affected row so callers can patch their copy without refetching
+    @instrumented("add_task")
+    def add_task(self, user_id, title, desc, due_date, priority, status, progress=0):
+        with self.connection() as conn:
+            task = conn.execute(f"""
+                INSERT INTO tasks (user_id, title, description, due_date, priority, status, progress)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                RETURNING {TASK_COLUMNS}
+            """, (user_id, title, desc, due_date, priority, status, progress)).fetchone()
+            conn.commit()
+            return task
+
+    @instrumented("update_task")
+    def update_task(self, task_id, title, desc, due_date, priority, status, progress):
+        with self.connection() as conn:
+            task = conn.execute(f"""
+                UPDATE tasks
+                SET title = ?, description = ?, due_date = ?, priority = ?, status = ?, progress = ?
+                WHERE id = ?
+                RETURNING {TASK_COLUMNS}
+            """, (title, desc, due_date, priority, status, progress, task_id)).fetchone()
+            conn.commit()
+            return task
+
+    @instrumented("delete_task")
+    def delete_task(self, task_id):
+        with self.connection() as conn:
+            deleted = conn.execute("DELETE FROM tasks WHERE id = ? RETURNING id", (task_id,)).fetchone()
+            conn.commit()
+            return deleted[0] if deleted else None
+
+    # Batch variants: one transaction however many tasks are involved
+    @instrumented("add_tasks")
+    def add_tasks(self, user_id, tasks):
+        with self.connection() as conn:
+            rows = [conn.execute(f"""
+                INSERT INTO tasks (user_id, title, description, due_date, priority, status, progress)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                RETURNING {TASK_COLUMNS}
+            """, (user_id, *task)).fetchone() for task in tasks]
+            conn.commit()
+            return rows
+
+    def _update_rows(self, groups):
+        rows = []
+        with self.connection() as conn:
+            for fields, values in groups:
+                assignments = ", ".join(f"{field} = ?" for field in fields)
+                sql = f"UPDATE tasks SET {assignments} WHERE id = ? RETURNING {TASK_COLUMNS}"
+                for task_id, *field_values in values:
+                    row = conn.execute(sql, (*field_values, task_id)).fetchone()
+                    if row is not None:
+                        rows.append(row)
+            conn.commit()
+        return rows
+
+    @instrumented("delete_tasks")
+    def delete_tasks(self, task_ids):
+        task_ids = list(task_ids)
+        deleted = []
+        with self.connection() as conn:
+            for start in range(0, len(task_ids), MAX_VARIABLES):
+                clause, params = self._in_clause("id", task_ids[start:start + MAX_VARIABLES])
+                deleted.extend(row[0] for row in conn.execute(f"DELETE FROM tasks WHERE {clause} RETURNING id", params))
+            conn.commit()
+        return deleted
+
+    @instrumented("archive_completed", rows=len)
+    def archive_completed(self, user_id, older_than_days, batch_size=ARCHIVE_BATCH):
+        # Copies a batch into the archive, then deletes the copied ids, in one transaction.
+        # completed_at is stored as UTC text, which compares correctly as a string.
+        user_clause = "" if user_id is None else "AND user_id = ?"
+        params = [f"-{int(older_than_days)} days", *([] if user_id is None else [user_id]), batch_size]
+        moved = []
+        while True:
+            with self.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                batch = [row[0] for row in conn.execute(f"""
+                    INSERT INTO tasks_archive ({ARCHIVE_COLUMNS})
+                    SELECT {ARCHIVE_COLUMNS} FROM tasks
+                    WHERE status = 'Completed' AND completed_at < datetime('now', ?) {user_clause}
+                    ORDER BY completed_at
+                    LIMIT ?
+                    RETURNING id
+                """, params).fetchall()]
+                for start in range(0, len(batch), MAX_VARIABLES):
+                    clause, ids = self._in_clause("id", batch[start:start + MAX_VARIABLES])
+                    conn.execute(f"DELETE FROM tasks WHERE {clause}", ids)
+                conn.commit()
+            moved.extend(batch)
+            if len(batch) < batch_size:
+                return moved
+
+    @instrumented("restore_tasks")
+    def restore_tasks(self, user_id, task_ids):
+        task_ids = list(task_ids)
+        rows = []
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for start in range(0, len(task_ids), MAX_VARIABLES):
+                clause, ids = self._in_clause("id", task_ids[start:start + MAX_VARIABLES])
+                rows.extend(conn.execute(f"""
+                    INSERT INTO tasks (id, user_id, title, description, due_date, priority, status, progress,
+                                       created_date)
+                    SELECT id, user_id, title, description, due_date, priority, ?, progress, created_date
+                    FROM tasks_archive WHERE user_id = ? AND {clause}
+                    RETURNING {TASK_COLUMNS}
+                """, (RESTORED_STATUS, user_id, *ids)).fetchall())
+                conn.execute(f"DELETE FROM tasks_archive WHERE user_id = ? AND {clause}", (user_id, *ids))
+            conn.commit()
+        return rows
+
+    @instrumented("get_tasks_by_ids")
+    def get_tasks_by_ids(self, user_id, task_ids):
+        task_ids = list(task_ids)
+        rows = []
+        for start in range(0, len(task_ids), MAX_VARIABLES):
+            clause, params = self._in_clause("id", task_ids[start:start + MAX_VARIABLES])
+            rows.extend(self._fetchall(f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = ? AND {clause}",
+                                       (user_id, *params)))
+        return rows
+
+    @instrumented("export_tasks", rows=lambda result: result)
+    def export_tasks(self, user_id, out, fmt="csv", progress=None):
+        # Same CSV/JSONL layout as the COPY export, streamed through fetchmany
+        if fmt not in bulk.FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        total = self._fetchall("SELECT count(*) FROM tasks WHERE user_id = ?", (user_id,))[0][0]
+        writer = csv.writer(out, lineterminator="\n") if fmt == "csv" else None
+        if writer:
+            writer.writerow(bulk.EXPORT_FIELDS)
+        exported = 0
+        with self.connection() as conn:
+            cur = conn.execute(f"SELECT {', '.join(bulk.EXPORT_FIELDS)} FROM tasks WHERE user_id = ? ORDER BY id",
+                               (user_id,))
+            while True:
+                rows = cur.fetchmany(bulk.ProgressWriter.REPORT_EVERY)
+                if not rows:
+                    break
+                for row in rows:
+                    if writer:
+                        writer.writerow(["" if value is None else value for value in row])
+                    else:
+                        record = dict(zip(bulk.EXPORT_FIELDS, row))
+                        out.write(json.dumps(record, default=lambda value: value.isoformat()) + "\n")
+                exported += len(rows)
+                if progress:
+                    progress((exported, total))
+            conn.rollback()
+        return exported
+
+    @instrumented("import_tasks", rows=lambda result: result[0])
+    def import_tasks(self, user_id, source, fmt="csv", chunk_size=5000, progress=None):
+        # Validates a chunk at a time; invalid rows are skipped and reported, valid rows commit together
+        errors = []
+        imported = 0
+        with self.connection() as conn:
+            for chunk in bulk.validated_chunks(source, fmt, chunk_size, errors):
+                conn.executemany("""
+                    INSERT INTO tasks (user_id, title, description, due_date, priority, status, progress)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [(user_id, *row) for row in chunk])
+                imported += len(chunk)
+                if progress:
+                    progress((imported, None))
+            conn.commit()
+        return imported, errors
@@ -0,0 +1,326 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from database import snapshot
+from database.search import SearchIndex
+from database.task_columns import TaskColumns
+from database.write_queue import WriteBehindQueue
+from database.base import UPDATABLE_FIELDS
+
+
+class TaskStore(QObject):
+    # One in-memory copy of a user's tasks, shared by every view, held compactly in a
+    # TaskColumns table (see its memory budget); get() returns a Task built on demand.
+    # Inserts and deletes are applied from what the database returns; field edits show
+    # immediately and go through the write-behind queue. Views are told which ids
+    # changed so they can patch just those rows.
+    # With a snapshot_path, the table is saved on disk after refreshes and on exit, and
+    # load_snapshot() paints the saved one while the first refresh is running: the store
+    # is stale until that refresh arrives and is applied as a diff.
+    reset = pyqtSignal()
+    tasks_changed = pyqtSignal(list, list, list)  # inserted ids, updated ids, deleted ids
+    error = pyqtSignal(object)
+    search_index_ready = pyqtSignal()
+    archive_changed = pyqtSignal()  # tasks were archived or restored
+    stale_changed = pyqtSignal(bool)  # showing a saved snapshot, not yet refreshed
+
+    PUSH_DELAY_MS = 1000
+
+    def __init__(self, user_id, db, worker, snapshot_path=None, parent=None):
+        super().__init__(parent)
+        self.user_id = user_id
+        self.db = db
+        self.worker = worker
+        self.loaded = False
+        self.stale = False
+        self.snapshot_path = snapshot_path
+        self.snapshot_saved_at = None  # when the snapshot on screen was saved
+        self._snapshot_dirty = False  # changed since the snapshot was last saved
+        self.columns = TaskColumns()
+        self._load_generation = 0
+        self.search_index = None
+        self._index_backlog = None
+        self.write_queue = WriteBehindQueue(self, self)
+
+        # With a replica, local writes are pushed shortly after in one batch
+        self._push_timer = None
+        if getattr(db, "replicated", False):
+            self._push_timer = QTimer(self)
+            self._push_timer.setSingleShot(True)
+            self._push_timer.setInterval(self.PUSH_DELAY_MS)
+            self._push_timer.timeout.connect(self.sync)
+
+        self.reset.connect(self._mark_snapshot_dirty)
+        self.tasks_changed.connect(self._mark_snapshot_dirty)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def get(self, task_id):
+        return self.columns.get(task_id)
+
+    def task_ids(self):
+        return self.columns.task_ids()
+
+    def refresh(self):
+        # The rows are packed into columns on the worker thread as well
+        self._load_generation += 1
+        generation = self._load_generation
+        self.worker.submit(
+            _load_columns, self.db, self.user_id,
+            on_result=lambda columns: self._on_loaded(generation, columns),
+            on_error=self.error.emit
+        )
+
+    def _on_loaded(self, generation, columns):
+        if generation == self._load_generation:
+            self.load_columns(columns)
+            if self.stale:
+                # Saved again even if nothing changed, to record when it was confirmed
+                self.stale = False
+                self._snapshot_dirty = True
+                self.stale_changed.emit(False)
+            self.save_snapshot()
+
+    def load_snapshot(self):
+        # Read on the worker; dropped if the refresh gets there first
+        if self.snapshot_path is not None:
+            self.worker.submit(
+                snapshot.read, self.snapshot_path, self.user_id, self.db.source,
+                on_result=self._on_snapshot_read
+            )
+
+    def _on_snapshot_read(self, result):
+        if result is None or self.loaded:
+            return
+        columns, self.snapshot_saved_at = result
+        self.stale = True
+        self.load_columns(columns)
+        self._snapshot_dirty = False
+        self.stale_changed.emit(True)
+
+    def save_snapshot(self):
+        # Packs a copy here and writes it on the worker, so edits can go on meanwhile. A
+        # stale table is already on disk, and an unchanged one needs no rewrite.
+        if self.snapshot_path is None or not self.loaded or self.stale or not self._snapshot_dirty:
+            return
+        self._snapshot_dirty = False
+        self.worker.submit(snapshot.write, self.snapshot_path, self.columns.packed(), self.user_id, self.db.source)
+
+    def _mark_snapshot_dirty(self, *changes):
+        self._snapshot_dirty = True
+
+    def load(self, tasks):
+        self.load_columns(TaskColumns(tasks))
+
+    def load_columns(self, columns):
+        # Replace the contents with a full task table; views see a reset the first time
+        # and only the differences afterwards
+        for task_id in list(self.write_queue.confirmed):
+            task = columns.get(task_id)
+            if task is not None:
+                columns.set(self.write_queue.rebase(task))
+        if not self.loaded:
+            self.columns = columns
+            self.loaded = True
+            self._build_search_index()
+            self.reset.emit()
+            return
+
+        # Later refreshes only report what actually differs from the current table
+        inserted, updated, deleted = self.columns.diff(columns)
+        self.columns = columns
+        for task_id in deleted:
+            self._index_remove(task_id)
+        for task_id in inserted + updated:
+            self._index_add(columns.get(task_id))
+        if inserted or updated or deleted:
+            self.tasks_changed.emit(inserted, updated, deleted)
+
+    def apply_rows(self, rows):
+        # rows come from the database; edits still queued for them stay on top
+        self._patch(self.write_queue.rebase(task) for task in rows if task is not None)
+
+    def _patch(self, rows):
+        inserted = []
+        updated = []
+        for task in rows:
+            existed = task[0] in self.columns
+            if not self.columns.set(task):
+                # Already applied, e.g. the notification echo of our own write
+                continue
+            (updated if existed else inserted).append(task[0])
+            self._index_add(task)
+        if inserted or updated:
+            self.tasks_changed.emit(inserted, updated, [])
+
+    def apply_deleted(self, task_ids):
+        self.write_queue.discard(task_ids)
+        deleted = [task_id for task_id in task_ids if task_id in self.columns]
+        for task_id in deleted:
+            self.columns.remove(task_id)
+            self._index_remove(task_id)
+        if deleted:
+            self.tasks_changed.emit([], [], deleted)
+
+    def apply_remote_changes(self, changed_ids, deleted_ids):
+        # Change notifications carry only ids; fetch the changed rows in one query
+        self.apply_deleted(deleted_ids)
+        if changed_ids:
+            self.worker.submit(
+                self.db.get_tasks_by_ids, self.user_id, changed_ids,
+                on_result=self.apply_rows,
+                on_error=self.error.emit
+            )
+
+    def sync(self):
+        # Replicas only: push queued writes, pull changes, then patch the changed rows
+        self.worker.submit(
+            self.db.sync, self.user_id,
+            on_result=lambda changes: self.apply_remote_changes(*changes),
+            on_error=self.error.emit
+        )
+
+    def search(self, text):
+        # Ranked task ids matching text in the title or description
+        if self.search_index is not None:
+            return self.search_index.search(text)
+        # The index is still being built; fall back to a plain scan
+        query = text.strip().lower()
+        return [task_id for task_id, title, description in self.columns.texts()
+                if query in title.lower() or query in (description or "").lower()]
+
+    def search_on_server(self, text, on_result, limit=200):
+        self.worker.submit(
+            self.db.search_tasks, self.user_id, text, limit,
+            on_result=lambda rows: on_result([row[0] for row in rows]),
+            on_error=self.error.emit
+        )
+
+    def _build_search_index(self):
+        # Build off the GUI thread; changes that land meanwhile are replayed afterwards
+        self.search_index = None
+        self._index_backlog = []
+        self.worker.submit(_build_index, self.columns.texts(), on_result=self._on_search_index_built)
+
+    def _on_search_index_built(self, index):
+        for task_id, task in self._index_backlog:
+            if task is None:
+                index.remove(task_id)
+            else:
+                index.add(task)
+        self._index_backlog = None
+        self.search_index = index
+        self.search_index_ready.emit()
+
+    def _index_add(self, task):
+        if self._index_backlog is not None:
+            self._index_backlog.append((task[0], task))
+        elif self.search_index is not None:
+            self.search_index.add(task)
+
+    def _index_remove(self, task_id):
+        if self._index_backlog is not None:
+            self._index_backlog.append((task_id, None))
+        elif self.search_index is not None:
+            self.search_index.remove(task_id)
+
+    def submit_write(self, fn, *args, on_result, on_error=None, **kwargs):
+        self.worker.submit(fn, *args, on_result=on_result, on_error=on_error or self.error.emit, **kwargs)
+        if self._push_timer is not None:
+            self._push_timer.start()
+
+    def flush_writes(self):
+        # Writes queued edits now and waits for them, before logging out or quitting
+        self.write_queue.drain()
+
+    def add_task(self, title, desc, due_date, priority, status, progress=0):
+        self.submit_write(
+            self.db.add_task, self.user_id, title, desc, due_date, priority, status, progress,
+            on_result=lambda task: self.apply_rows([task])
+        )
+
+    def update_task(self, task_id, title, desc, due_date, priority, status, progress):
+        # Only the fields that differ from the current row are written
+        current = self.get(task_id)
+        if current is None:
+            return
+        values = (title, desc, due_date, priority, status, progress)
+        self._edit([task_id], {field: value for field, value, old in zip(UPDATABLE_FIELDS, values, current[1:])
+                               if value != old})
+
+    def delete_task(self, task_id):
+        self.submit_write(
+            self.db.delete_task, task_id,
+            on_result=lambda deleted_id: self.apply_deleted([deleted_id])
+        )
+
+    def add_tasks(self, tasks):
+        self.submit_write(
+            self.db.add_tasks, self.user_id, tasks,
+            on_result=self.apply_rows
+        )
+
+    def update_tasks(self, task_ids, **fields):
+        self._edit(task_ids, fields)
+
+    def set_tasks_status(self, task_ids, status, progress=None):
+        fields = {"status": status}
+        if progress is not None:
+            fields["progress"] = progress
+        self._edit(task_ids, fields)
+
+    def _edit(self, task_ids, fields):
+        if fields:
+            self._patch([self.write_queue.edit(self.get(task_id), fields)
+                         for task_id in task_ids if task_id in self.columns])
+
+    def delete_tasks(self, task_ids):
+        self.submit_write(
+            self.db.delete_tasks, task_ids,
+            on_result=self.apply_deleted
+        )
+
+    # Archive: completed tasks moved out of the active list, read back a page at a time
+    def archive_completed(self, older_than_days):
+        self.submit_write(
+            self.db.archive_completed, self.user_id, older_than_days,
+            on_result=self._on_archived
+        )
+
+    def _on_archived(self, task_ids):
+        if task_ids:
+            self.apply_deleted(task_ids)
+            self.archive_changed.emit()
+
+    def restore_tasks(self, task_ids):
+        self.submit_write(
+            self.db.restore_tasks, self.user_id, task_ids,
+            on_result=self._on_restored
+        )
+
+    def _on_restored(self, rows):
+        self.apply_rows(rows)
+        self.archive_changed.emit()
+
+    def load_archived(self, cursor, limit, on_result):
+        # on_result gets (rows, next_cursor, total); total is the archived count, read with the first page only
+        self.worker.submit(
+            _archived_page, self.db, self.user_id, cursor, limit,
+            on_result=on_result,
+            on_error=self.error.emit
+        )
+
+
+def _archived_page(db, user_id, cursor, limit):
+    rows, next_cursor = db.archived_tasks(user_id, cursor, limit)
+    total = db.archived_count(user_id) if cursor is None else None
+    return rows, next_cursor, total
+
+
+def _load_columns(db, user_id):
+    return TaskColumns(db.get_user_tasks(user_id))
+
+
+def _build_index(tasks):
+    index = SearchIndex()
+    index.rebuild(tasks)
+    return index
@@ -0,0 +1,65 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+import logging
+from instrumentation.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+
+class _JobSignals(QObject):
+    result = pyqtSignal(object)
+    error = pyqtSignal(object)
+    progress = pyqtSignal(object)
+    finished = pyqtSignal()
+
+
+class _Job(QRunnable):
+    def __init__(self, fn, args, kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = _JobSignals()
+
+    def run(self):
+        try:
+            with profiled():
+                result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.error.emit(e)
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class DbWorker(QObject):
+    # Runs Database calls on a thread pool and delivers results back on the GUI thread
+    def __init__(self, max_threads=4, parent=None):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max_threads)
+        self._pending = set()
+
+    def submit(self, fn, *args, on_result=None, on_error=None, on_progress=None, **kwargs):
+        job = _Job(fn, args, kwargs)
+        if on_progress is not None:
+            # Long-running jobs report progress through a callback the signal marshals to the GUI thread
+            job.kwargs["progress"] = job.signals.progress.emit
+            job.signals.progress.connect(on_progress)
+        if on_result is not None:
+            job.signals.result.connect(on_result)
+        job.signals.error.connect(on_error or self._report_error)
+
+        # Keep the signal object alive until the queued emissions have been delivered
+        signals = job.signals
+        self._pending.add(signals)
+        signals.finished.connect(lambda: self._pending.discard(signals))
+
+        self.thread_pool.start(job)
+        return signals
+
+    def wait_for_done(self, msecs=-1):
+        return self.thread_pool.waitForDone(msecs)
+
+    def _report_error(self, error):
+        logger.error("Database error: %s", error)
@@ -0,0 +1,129 @@
+from PyQt6.QtCore import QCoreApplication, QObject, QTimer
+import logging
+from database.base import UPDATABLE_FIELDS, check_fields
+from instrumentation.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Position of each updatable field in a task row
+FIELD_INDEX = {field: index for index, field in enumerate(UPDATABLE_FIELDS, start=1)}
+
+
+class WriteFailed(Exception):
+    def __init__(self, task_ids, error):
+        super().__init__(f"Could not save changes to {len(task_ids)} task(s): {error}")
+        self.task_ids = task_ids
+        self.error = error
+
+
+def apply_fields(task, fields):
+    row = list(task)
+    for field, value in fields.items():
+        row[FIELD_INDEX[field]] = value
+    return tuple(row)
+
+
+class WriteBehindQueue(QObject):
+    # Field edits shown right away and written to the database shortly after. Edits to
+    # the same task merge into one pending change, and everything pending is written in
+    # one transaction once edits pause for IDLE_MS, or MAX_DELAY_MS after the first one
+    # at the latest. Only one batch is in flight, so writes land in the order made.
+    IDLE_MS = 250
+    MAX_DELAY_MS = 1000
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.pending = {}    # task_id -> {field: value} not sent yet
+        self.in_flight = {}  # task_id -> {field: value} being written
+        self.confirmed = {}  # task_id -> latest database row, restored if a write fails
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(self.IDLE_MS)
+        self._idle_timer.timeout.connect(self.flush)
+
+        self._deadline_timer = QTimer(self)
+        self._deadline_timer.setSingleShot(True)
+        self._deadline_timer.setInterval(self.MAX_DELAY_MS)
+        self._deadline_timer.timeout.connect(self.flush)
+
+    def has_pending(self):
+        return bool(self.pending or self.in_flight)
+
+    def edit(self, task, fields):
+        # Queues fields for the task and returns the row to show until the write lands
+        check_fields(fields)
+        task_id = task[0]
+        self.confirmed.setdefault(task_id, task)
+        pending = self.pending.get(task_id)
+        if pending is None:
+            self.pending[task_id] = dict(fields)
+        else:
+            pending.update(fields)
+            metrics.increment("store.write_queue.coalesced")
+        self._idle_timer.start()
+        if not self._deadline_timer.isActive():
+            self._deadline_timer.start()
+        return apply_fields(task, fields)
+
+    def rebase(self, task):
+        # A row read from the database, with the edits it has not seen yet put back on top
+        task_id = task[0]
+        if task_id not in self.confirmed:
+            return task
+        self.confirmed[task_id] = task
+        for edits in (self.in_flight, self.pending):
+            if task_id in edits:
+                task = apply_fields(task, edits[task_id])
+        return task
+
+    def discard(self, task_ids):
+        # Deleted tasks: nothing left to write
+        for task_id in task_ids:
+            self.pending.pop(task_id, None)
+            self.confirmed.pop(task_id, None)
+
+    def flush(self):
+        self._idle_timer.stop()
+        self._deadline_timer.stop()
+        if not self.pending or self.in_flight:
+            # An in-flight batch flushes whatever queued up behind it when it completes
+            return
+        self.in_flight, self.pending = self.pending, {}
+        metrics.observe("store.write_queue.batch", len(self.in_flight))
+        self.store.submit_write(self.store.db.apply_edits, dict(self.in_flight),
+                                on_result=self._on_written, on_error=self._on_failed)
+
+    def drain(self, attempts=3):
+        # Writes everything queued before returning, for logout and shutdown. Each round
+        # waits for the batch and delivers its result so edits queued behind it go next.
+        for _ in range(attempts):
+            if not self.has_pending():
+                return
+            self.flush()
+            self.store.worker.wait_for_done()
+            QCoreApplication.sendPostedEvents()
+
+    def _on_written(self, rows):
+        batch, self.in_flight = self.in_flight, {}
+        for task_id in batch:
+            if task_id not in self.pending:
+                self.confirmed.pop(task_id, None)
+        self.store.apply_rows(rows)
+        if self.pending:
+            self._idle_timer.start()
+
+    def _on_failed(self, error):
+        # Put back the last confirmed rows; edits made since stay queued on top of them
+        batch, self.in_flight = self.in_flight, {}
+        logger.error("Writing %d edited task(s) failed: %s", len(batch), error)
+        metrics.increment("store.write_queue.failures")
+        rows = [self.confirmed[task_id] for task_id in batch if task_id in self.confirmed]
+        for task_id in batch:
+            if task_id not in self.pending:
+                self.confirmed.pop(task_id, None)
+        self.store.apply_rows(rows)
+        self.store.error.emit(WriteFailed(list(batch), error))
+        if self.pending:
+            self._idle_timer.start()
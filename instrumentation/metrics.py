@@ -0,0 +1,152 @@
+import bisect
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Startup milestones are measured from when this module is first imported; main.py imports it first
+PROCESS_START = time.perf_counter()
+
+# Histogram bucket upper bounds; latencies are in milliseconds, row counts use the same scale
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank, capped at the observed max
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(BUCKETS, self.counts) if count},
+        }
+
+
+class Metrics:
+    # Process-wide counters and histograms, safe to update from worker threads
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._milestones = set()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def mark_startup(self, name):
+        # Records startup.<name>_ms, the time from process start to a milestone, once per process
+        with self._lock:
+            if name in self._milestones:
+                return
+            self._milestones.add(name)
+        elapsed = (time.perf_counter() - PROCESS_START) * 1000
+        self.observe(f"startup.{name}_ms", elapsed)
+        logger.info("Startup: %s after %.0f ms", name.replace("_", " "), elapsed)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {name: h.snapshot() for name, h in self._histograms.items()},
+            }
+
+    def report(self):
+        snapshot = self.snapshot()
+        lines = [f"{name}: {value}" for name, value in sorted(snapshot["counters"].items())]
+        for name, h in sorted(snapshot["histograms"].items()):
+            lines.append(f"{name}: n={h['count']} mean={h['mean']:.2f} p50={h['p50']:.2f} "
+                         f"p90={h['p90']:.2f} p99={h['p99']:.2f} max={h['max']:.2f}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as out:
+            json.dump(self.snapshot(), out, indent=2)
+        logger.info("Wrote metrics to %s", path)
+
+
+metrics = Metrics()
+
+
+def _row_count(result):
+    # Lists are row sets, None is no row, anything else is a single row or value
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def instrumented(name, rows=_row_count):
+    # Records latency, row count and errors for a database call under db.<name>.*;
+    # rows maps the call's result to the number of rows it touched
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                metrics.increment(f"db.{name}.errors")
+                raise
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                metrics.observe(f"db.{name}.latency_ms", elapsed)
+            metrics.observe(f"db.{name}.rows", rows(result))
+            logger.debug("%s took %.1f ms", name, elapsed)
+            return result
+        return wrapper
+    return decorator
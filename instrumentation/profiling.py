@@ -0,0 +1,113 @@
+import contextlib
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# Rows per table in the text reports
+REPORT_ROWS = 40
+# Frames kept per allocation; deeper tracebacks cost more memory while profiling
+TRACE_FRAMES = 10
+# From Python 3.12 cProfile hooks sys.monitoring, which is interpreter-wide: only one
+# profiler can be enabled at a time, and it already sees every thread
+SHARED_PROFILER = sys.version_info >= (3, 12)
+
+_session = None
+
+
+class ProfileSession:
+    # cProfile and tracemalloc around a whole session, for main.py --profile. Before
+    # Python 3.12 cProfile only sees the thread that enabled it, so worker jobs run under
+    # a profiler of their own thread (see profiled()) and all of them are merged into one
+    # report on stop(); from 3.12 the session's profiler covers the workers itself.
+    def __init__(self, directory):
+        self.directory = directory
+        self._profile = cProfile.Profile()
+        self._thread_profiles = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        global _session
+        os.makedirs(self.directory, exist_ok=True)
+        tracemalloc.start(TRACE_FRAMES)
+        _session = self
+        self._profile.enable()
+        logger.info("Profiling; reports go to %s", self.directory)
+
+    def stop(self):
+        global _session
+        self._profile.disable()
+        _session = None
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats = pstats.Stats(self._profile)
+        with self._lock:
+            for profile in self._thread_profiles.values():
+                stats.add(profile)
+        stats.dump_stats(os.path.join(self.directory, "profile.pstats"))
+        self._write("profile.txt", self._cpu_report(stats))
+        self._write("memory.txt", self._memory_report(snapshot, current, peak))
+        logger.info("Wrote profile reports to %s", self.directory)
+
+    def thread_profile(self):
+        # The calling thread's profiler, created on its first job
+        ident = threading.get_ident()
+        with self._lock:
+            profile = self._thread_profiles.get(ident)
+            if profile is None:
+                profile = self._thread_profiles[ident] = cProfile.Profile()
+        return profile
+
+    def _write(self, name, text):
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as out:
+            out.write(text)
+
+    @staticmethod
+    def _cpu_report(stats):
+        out = io.StringIO()
+        stats.stream = out
+        stats.strip_dirs()
+        for order, title in (("cumulative", "Cumulative time"), ("tottime", "Own time")):
+            out.write(f"=== {title} (GUI thread and worker jobs) ===\n")
+            stats.sort_stats(order).print_stats(REPORT_ROWS)
+        return out.getvalue()
+
+    @staticmethod
+    def _memory_report(snapshot, current, peak):
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ])
+        lines = [f"Traced Python memory at exit: {current / 2 ** 20:.1f} MB, peak {peak / 2 ** 20:.1f} MB", "",
+                 f"=== Top {REPORT_ROWS} lines by memory still allocated ==="]
+        lines.extend(str(stat) for stat in snapshot.statistics("lineno")[:REPORT_ROWS])
+        lines.extend(["", "=== Largest allocation sites with their callers ==="])
+        for stat in snapshot.statistics("traceback")[:5]:
+            lines.append(f"{stat.count} blocks, {stat.size / 1024:.1f} KiB")
+            lines.extend(f"    {line}" for line in stat.traceback.format(most_recent_first=True))
+        return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def profiled():
+    # Profiles the block on the current thread while a session is running; worker
+    # threads wrap each job in this
+    session = _session
+    if session is None or SHARED_PROFILER:
+        yield
+        return
+    profile = session.thread_profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
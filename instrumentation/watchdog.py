@@ -0,0 +1,98 @@
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+from PyQt6.QtCore import QObject, QTimer
+from instrumentation.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StallWatchdog(QObject):
+    # Detects event-loop stalls. A timer on the GUI thread beats every INTERVAL_MS and
+    # records how late each beat was (ui.loop_latency_ms). A watchdog thread checks the
+    # last beat; once it is threshold_ms old, the GUI thread's stack is sampled every
+    # threshold_ms until the loop runs again, and the stall is logged with the stacks.
+    # Modal dialogs run a nested event loop, which keeps the heartbeat going.
+    # Code that holds the GIL in a single C call delays the samples until it returns.
+    INTERVAL_MS = 100
+    # Samples kept per stall; a long stall keeps the first ones
+    MAX_SAMPLES = 20
+
+    def __init__(self, threshold_ms=500, report_path=None, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.report_path = report_path  # stall reports are also appended here
+        self._report = None
+        self._main_ident = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.INTERVAL_MS)
+        self._timer.timeout.connect(self._heartbeat)
+
+    def start(self):
+        if self.report_path:
+            self._report = open(self.report_path, "a", encoding="utf-8")
+        self._beat = time.monotonic()
+        self._timer.start()
+        self._thread.start()
+
+    def stop(self):
+        self._timer.stop()
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self._report is not None:
+            self._report.close()
+            self._report = None
+
+    def _heartbeat(self):
+        now = time.monotonic()
+        late = (now - self._beat) * 1000 - self.INTERVAL_MS
+        metrics.observe("ui.loop_latency_ms", max(late, 0))
+        self._beat = now
+
+    def _watch(self):
+        stalled_beat = None  # the last beat before the current stall
+        samples = []
+        next_sample = 0
+        while not self._stop.wait(self.INTERVAL_MS / 1000):
+            beat = self._beat
+            now = time.monotonic()
+            if stalled_beat is not None and beat != stalled_beat:
+                # The loop is running again
+                self._report_stall(beat - stalled_beat, samples)
+                stalled_beat = None
+            if stalled_beat is None and now - beat >= self.threshold:
+                stalled_beat = beat
+                samples = []
+                next_sample = now
+            if stalled_beat is not None and now >= next_sample:
+                if len(samples) < self.MAX_SAMPLES:
+                    samples.append(self._main_stack())
+                next_sample = now + self.threshold
+
+    def _main_stack(self):
+        frame = sys._current_frames().get(self._main_ident)
+        return "".join(traceback.format_stack(frame)) if frame is not None else "(no frame)\n"
+
+    def _report_stall(self, seconds, samples):
+        duration = seconds * 1000
+        metrics.increment("ui.stalls")
+        metrics.observe("ui.stall_ms", duration)
+        # Identical samples are the same blocked call; show each stack once, most seen first
+        counts = collections.Counter(samples)
+        lines = [f"Event loop stalled for {duration:.0f} ms ({len(samples)} stack samples)"]
+        for stack, count in counts.most_common():
+            lines.append(f"--- seen in {count} of {len(samples)} samples, most recent call last:")
+            lines.append(stack.rstrip())
+        text = "\n".join(lines)
+        logger.warning("%s", text)
+        if self._report is not None:
+            self._report.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {text}\n\n")
+            self._report.flush()
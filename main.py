@@ -1,8 +1,51 @@
+from instrumentation.metrics import metrics
+import os
 import sys
+import argparse
+import logging
 from PyQt6.QtWidgets import QApplication
 from ui.main_window import TaskManager
 
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Task Note Manager")
+    parser.add_argument("--log-level", default="INFO", help="logging level (DEBUG, INFO, WARNING, ...)")
+    parser.add_argument("--metrics-file", help="write query and render metrics to this JSON file on exit")
+    parser.add_argument("--stall-ms", type=int, default=500,
+                        help="log the GUI thread's stack when the event loop is blocked this long (0 disables)")
+    parser.add_argument("--profile", nargs="?", const="profile", metavar="DIR",
+                        help="run under cProfile and tracemalloc and write reports to DIR on exit (default: profile)")
+    # Anything we do not recognize is left for Qt
+    return parser.parse_known_args(argv[1:])
+
+
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    window = TaskManager()
-    sys.exit(app.exec())
\ No newline at end of file
+    args, qt_args = parse_args(sys.argv)
+    logging.basicConfig(
+        level=args.log_level.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    session = None
+    if args.profile:
+        from instrumentation.profiling import ProfileSession
+        session = ProfileSession(args.profile)
+        session.start()
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    watchdog = None
+    if args.stall_ms > 0:
+        from instrumentation.watchdog import StallWatchdog
+        # While profiling, stalls are also written next to the profile reports
+        watchdog = StallWatchdog(args.stall_ms, os.path.join(args.profile, "stalls.txt") if session else None)
+        watchdog.start()
+    window = TaskManager(metrics_file=args.metrics_file)
+    app.aboutToQuit.connect(window.shutdown)
+    if args.metrics_file:
+        app.aboutToQuit.connect(lambda: metrics.dump(args.metrics_file))
+    status = app.exec()
+    if watchdog is not None:
+        watchdog.stop()
+    if session is not None:
+        session.stop()
+    sys.exit(status)
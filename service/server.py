@@ -0,0 +1,687 @@
+"""HTTP/JSON task service shared by many desktop clients.
+
+One process owns a small set of database connections and serves every client
+over HTTP, instead of each app holding its own connections:
+
+    python -m service.server --port 8765
+    python -m service.server --backend sqlite --port 8765
+
+Clients use it with DB_BACKEND = "http" and SERVICE_URL in config.py. Task
+lists carry ETags and are cached until a write touches the user's tasks, and
+identical reads that arrive together share one query. GET /changes is a
+long-poll change feed used in place of LISTEN/NOTIFY.
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import logging
+import re
+import secrets
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from database.base import UPDATABLE_FIELDS, ARCHIVE_BATCH, check_fields
+from database.factory import open_database, BACKENDS
+from instrumentation.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 32 * 1024 * 1024
+MAX_IMPORT_BYTES = 1024 * 1024 * 1024
+# Imports are spooled to disk past this size
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+# Idle keep-alive connections are closed after this many seconds
+IDLE_TIMEOUT = 75
+# Cached list responses are dropped on writes through the service, and after this many
+# seconds to pick up writes that bypass it when the backend cannot notify
+CACHE_TTL = 30
+# Change feed entries kept per user; clients further behind are told to reload
+FEED_RETENTION = 10000
+MAX_FEED_WAIT = 60
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+REASONS = {200: "OK", 201: "Created", 304: "Not Modified", 400: "Bad Request", 401: "Unauthorized",
+           404: "Not Found", 405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method, path, query, headers):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = b""
+        self.upload = None  # spooled request body of an import
+        self.body_read = False  # whether the body has been taken off the connection
+        self.user_id = None
+        self.params = ()
+
+    def json(self):
+        try:
+            return json.loads(self.body or b"{}")
+        except ValueError as e:
+            raise HttpError(400, f"Invalid JSON body: {e}")
+
+    def arg(self, name, default=None, convert=str):
+        value = self.query.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            return convert(value)
+        except ValueError:
+            raise HttpError(400, f"Invalid value for {name}: {value!r}")
+
+
+def encode_json(value):
+    return json.dumps(value, separators=(",", ":"), default=_encode_value).encode()
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def _parse_date(value):
+    return None if value in (None, "") else datetime.date.fromisoformat(str(value)[:10])
+
+
+def _parse_fields(fields):
+    # {field: value} from JSON, with due dates back as dates
+    check_fields(fields)
+    if "due_date" in fields:
+        fields["due_date"] = _parse_date(fields["due_date"])
+    return fields
+
+
+def _parse_task(values):
+    # [title, description, due_date, priority, status, progress] from JSON
+    title, description, due_date, priority, status, progress = values
+    return title, description, _parse_date(due_date), priority, status, int(progress)
+
+
+def _encode_cursor(cursor):
+    # query_tasks cursors travel as an opaque string that keeps the sort value's type
+    if cursor is None:
+        return None
+    value, last_id = cursor
+    kind = type(value).__name__ if isinstance(value, (datetime.date, datetime.datetime)) else "value"
+    return json.dumps([kind, value, last_id], default=_encode_value)
+
+
+def _parse_cursor(token):
+    kind, value, last_id = json.loads(token)
+    if kind == "datetime":
+        value = datetime.datetime.fromisoformat(value)
+    elif kind == "date":
+        value = datetime.date.fromisoformat(value)
+    return value, last_id
+
+
+class UserFeed:
+    # Recent changes to one user's tasks as (seq, op, task_id); waiters are woken on append
+    def __init__(self):
+        self.entries = deque(maxlen=FEED_RETENTION)
+        self.evicted = 0  # highest seq no longer retained
+        self.changed = asyncio.Event()
+        self.listener = None  # database notification connection, when the backend has them
+
+    def append(self, seq, changes):
+        for op, task_id in changes:
+            if len(self.entries) == self.entries.maxlen:
+                self.evicted = self.entries[0][0]
+            self.entries.append((seq, op, task_id))
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class TaskService:
+    def __init__(self, db, workers=None):
+        self.db = db
+        # Blocking database calls run here; no more at once than the pool has connections
+        self.executor = ThreadPoolExecutor(max_workers=workers or getattr(db, "pool_max", 4),
+                                           thread_name_prefix="task-service")
+        self.epoch = secrets.token_hex(4)  # feed cursors from before a restart are rejected
+        self.seq = 0
+        self.sessions = {}   # token -> user_id
+        self.feeds = {}      # user_id -> UserFeed
+        self.cache = {}      # user_id -> {key: (expires, etag, body)}
+        self.inflight = {}   # user_id -> {key: future} of reads being answered
+        self.generation = {}  # user_id -> write count, so reads racing a write are not cached
+        routes = [
+            ("POST", r"/session", self.login, False),
+            ("POST", r"/users", self.register, False),
+            ("GET", r"/tasks", self.list_tasks, True),
+            ("POST", r"/tasks", self.add_task, True),
+            ("PATCH", r"/tasks", self.apply_edits, True),
+            ("GET", r"/tasks/query", self.query_tasks, True),
+            ("GET", r"/tasks/search", self.search_tasks, True),
+            ("POST", r"/tasks/lookup", self.lookup_tasks, True),
+            ("POST", r"/tasks/batch", self.add_tasks, True),
+            ("POST", r"/tasks/delete", self.delete_tasks, True),
+            ("GET", r"/tasks/(\d+)", self.get_task, True),
+            ("PUT", r"/tasks/(\d+)", self.update_task, True),
+            ("DELETE", r"/tasks/(\d+)", self.delete_task, True),
+            ("GET", r"/changes", self.changes, True),
+            ("GET", r"/dashboard", self.dashboard, True),
+            ("GET", r"/archive", self.archived_tasks, True),
+            ("GET", r"/archive/count", self.archived_count, True),
+            ("POST", r"/archive", self.archive_completed, True),
+            ("POST", r"/archive/restore", self.restore_tasks, True),
+            ("GET", r"/export", self.export_tasks, True),
+            ("POST", r"/import", self.import_tasks, True),
+        ]
+        # (method, path pattern, handler, whether it needs a session)
+        self.routes = [(method, re.compile(pattern + "$"), handler, auth)
+                       for method, pattern, handler, auth in routes]
+
+    async def run(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        logger.info("Task service listening on %s", ", ".join(str(s.getsockname()) for s in server.sockets))
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        for feed in self.feeds.values():
+            if feed.listener is not None:
+                feed.listener.close()
+        self.executor.shutdown(wait=True)
+        self.db.close()
+
+    def _call(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, lambda: fn(*args))
+
+    # HTTP/1.1 with keep-alive; one request at a time per connection
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 431, {"error": "Request headers too large"}, {}, False)
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                try:
+                    request = self._parse_head(head)
+                except HttpError as e:
+                    await self._send(writer, e.status, {"error": e.message}, {}, False)
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                with metrics.timer("service.request_ms"):
+                    status, body, headers = await self._respond(request, reader)
+                # An unread body would be parsed as the next request
+                keep_alive = keep_alive and request.body_read
+                await self._send(writer, status, body, headers, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_head(head):
+        try:
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        url = urllib.parse.urlsplit(target)
+        query = {name: values[-1] for name, values in urllib.parse.parse_qs(url.query).items()}
+        return Request(method, url.path, query, headers)
+
+    async def _respond(self, request, reader):
+        try:
+            try:
+                handler = self._route(request)
+            except HttpError:
+                # Rejected before the body was read; read it anyway so the connection
+                # can be kept, and close it when that fails
+                with contextlib.suppress(HttpError, ValueError):
+                    await self._read_body(request, reader, False)
+                raise
+            await self._read_body(request, reader, handler == self.import_tasks)
+            return await handler(request)
+        except HttpError as e:
+            return e.status, {"error": e.message}, {}
+        except (ValueError, TypeError, KeyError) as e:
+            return 400, {"error": str(e)}, {}
+        except Exception as e:
+            logger.exception("%s %s failed", request.method, request.path)
+            metrics.increment("service.errors")
+            return 500, {"error": str(e)}, {}
+
+    def _route(self, request):
+        allowed = False
+        for method, pattern, handler, auth in self.routes:
+            match = pattern.match(request.path)
+            if not match:
+                continue
+            if method != request.method:
+                allowed = True
+                continue
+            if auth:
+                token = request.headers.get("authorization", "").removeprefix("Bearer ")
+                request.user_id = self.sessions.get(token)
+                if request.user_id is None:
+                    raise HttpError(401, "Not signed in")
+            request.params = match.groups()
+            return handler
+        raise HttpError(405 if allowed else 404, f"No route for {request.method} {request.path}")
+
+    async def _read_body(self, request, reader, spool):
+        length = int(request.headers.get("content-length") or 0)
+        if length > (MAX_IMPORT_BYTES if spool else MAX_BODY_BYTES):
+            raise HttpError(413, "Request body too large")
+        if not spool:
+            request.body = await reader.readexactly(length)
+            request.body_read = True
+            return
+        # Imports can be large; keep them off the heap past a few megabytes
+        upload = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+        while length:
+            chunk = await reader.read(min(length, EXPORT_CHUNK_BYTES))
+            if not chunk:
+                raise HttpError(400, "Request body ended early")
+            upload.write(chunk)
+            length -= len(chunk)
+        upload.seek(0)
+        request.upload = upload
+        request.body_read = True
+
+    async def _send(self, writer, status, body, headers, keep_alive):
+        headers = dict(headers)
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        stream = None
+        if hasattr(body, "__aiter__"):
+            stream = body
+            headers["Transfer-Encoding"] = "chunked"
+            payload = b""
+        else:
+            payload = body if isinstance(body, bytes) else (b"" if body is None else encode_json(body))
+            headers.setdefault("Content-Type", "application/json")
+            headers["Content-Length"] = str(len(payload))
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+        if stream is not None:
+            try:
+                async for chunk in stream:
+                    writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    await writer.drain()
+            finally:
+                await stream.aclose()
+            writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    # Caching, coalescing and the change feed
+
+    async def _cached(self, request, key, fn, *args):
+        # Serves a read from the cache when possible; 304 when the client's copy is current
+        user_id = request.user_id
+        entry = self.cache.get(user_id, {}).get(key)
+        if entry is None or entry[0] < time.monotonic():
+            generation = self.generation.get(user_id, 0)
+            body = encode_json(await self._coalesced(user_id, key, fn, *args))
+            entry = (time.monotonic() + CACHE_TTL, f'"{hashlib.sha1(body).hexdigest()}"', body)
+            if self.generation.get(user_id, 0) == generation:
+                self.cache.setdefault(user_id, {})[key] = entry
+        else:
+            metrics.increment("service.cache_hits")
+        _, etag, body = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            metrics.increment("service.not_modified")
+            return 304, None, headers
+        return 200, body, headers
+
+    async def _coalesced(self, user_id, key, fn, *args):
+        # Identical reads that arrive while one is running share its result
+        inflight = self.inflight.setdefault(user_id, {})
+        future = inflight.get(key)
+        if future is not None:
+            metrics.increment("service.coalesced")
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(self._call(fn, *args))
+        inflight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if inflight.get(key) is future:
+                del inflight[key]
+
+    def _written(self, user_id, changes):
+        # After a write: later reads must query again, and feed readers hear about it
+        self.generation[user_id] = self.generation.get(user_id, 0) + 1
+        self.cache.pop(user_id, None)
+        self.inflight.pop(user_id, None)
+        feed = self.feeds.get(user_id)
+        if changes and feed is not None and feed.listener is None:
+            # With a listener the database trigger reports the change instead
+            self._record(user_id, changes)
+
+    def _record(self, user_id, changes):
+        self.seq += 1
+        self._feed(user_id).append(self.seq, changes)
+
+    def _feed(self, user_id):
+        feed = self.feeds.get(user_id)
+        if feed is None:
+            feed = self.feeds[user_id] = UserFeed()
+        return feed
+
+    async def _start_listener(self, user_id):
+        # Writes that bypass the service (other tools, direct database clients) still reach
+        # the feed and invalidate the cache when the backend publishes notifications
+        feed = self._feed(user_id)
+        if feed.listener is not None or not self.db.supports_notifications:
+            return
+        try:
+            feed.listener = await self._call(self.db.open_listener, user_id)
+        except Exception as e:
+            logger.warning("Change notifications unavailable for user %s: %s", user_id, e)
+            return
+        asyncio.get_running_loop().add_reader(feed.listener.fileno(), self._on_notification, user_id)
+
+    def _on_notification(self, user_id):
+        feed = self.feeds[user_id]
+        try:
+            changes = self.db.read_notifications(feed.listener)
+        except Exception as e:
+            logger.warning("Change listener for user %s lost its connection: %s", user_id, e)
+            asyncio.get_running_loop().remove_reader(feed.listener.fileno())
+            try:
+                feed.listener.close()
+            except Exception:
+                pass
+            # Opened again on the user's next sign-in
+            feed.listener = None
+            changes = [("RELOAD", 0)]
+        if changes:
+            self.generation[user_id] = self.generation.get(user_id, 0) + 1
+            self.cache.pop(user_id, None)
+            self.inflight.pop(user_id, None)
+            self._record(user_id, changes)
+
+    async def _check_owned(self, user_id, task_ids):
+        # Task ids come from clients, so writes by id are limited to the caller's tasks
+        task_ids = list(task_ids)
+        rows = await self._call(self.db.get_tasks_by_ids, user_id, task_ids)
+        missing = set(task_ids) - {row[0] for row in rows}
+        if missing:
+            raise HttpError(404, f"No such task: {', '.join(map(str, sorted(missing)))}")
+
+    # Routes
+
+    async def login(self, request):
+        data = request.json()
+        user_id = await self._call(self.db.verify_user, data["username"], data["password"])
+        return 200, await self._session(user_id), {}
+
+    async def register(self, request):
+        data = request.json()
+        user_id = await self._call(self.db.register_user, data["username"], data["password"])
+        return 200, await self._session(user_id), {}
+
+    async def _session(self, user_id):
+        if user_id is None:
+            return {"user_id": None}
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = user_id
+        await self._start_listener(user_id)
+        return {"user_id": user_id, "token": token,
+                "server_search_threshold": self.db.server_search_threshold}
+
+    async def list_tasks(self, request):
+        return await self._cached(request, "tasks", self.db.get_user_tasks, request.user_id)
+
+    async def query_tasks(self, request):
+        status = request.query.get("status")
+        priority = request.query.get("priority")
+        options = {
+            "status": status.split(",") if status else None,
+            "priority": priority.split(",") if priority else None,
+            "due_from": request.arg("due_from", convert=_parse_date),
+            "due_to": request.arg("due_to", convert=_parse_date),
+            "search": request.arg("search"),
+            "sort": request.arg("sort", "due_date"),
+            "descending": request.arg("descending", False, lambda value: value == "1"),
+            "cursor": request.arg("cursor", convert=_parse_cursor),
+            "limit": request.arg("limit", 100, int),
+        }
+        key = "query?" + urllib.parse.urlencode(sorted(request.query.items()))
+
+        def query():
+            rows, cursor = self.db.query_tasks(request.user_id, **options)
+            return {"rows": rows, "cursor": _encode_cursor(cursor)}
+        return await self._cached(request, key, query)
+
+    async def search_tasks(self, request):
+        text = request.arg("text", "")
+        limit = request.arg("limit", 200, int)
+        key = f"search?{limit}&{text}"
+        return 200, await self._coalesced(request.user_id, key, self.db.search_tasks, request.user_id, text, limit), {}
+
+    async def lookup_tasks(self, request):
+        ids = [int(task_id) for task_id in request.json()["ids"]]
+        return 200, await self._call(self.db.get_tasks_by_ids, request.user_id, ids), {}
+
+    async def get_task(self, request):
+        rows = await self._call(self.db.get_tasks_by_ids, request.user_id, [int(request.params[0])])
+        if not rows:
+            raise HttpError(404, "No such task")
+        return 200, rows[0], {}
+
+    async def add_task(self, request):
+        task = await self._call(self.db.add_task, request.user_id, *_parse_task(request.json()["task"]))
+        self._written(request.user_id, [("INSERT", task[0])])
+        return 201, task, {}
+
+    async def add_tasks(self, request):
+        tasks = [_parse_task(values) for values in request.json()["tasks"]]
+        rows = await self._call(self.db.add_tasks, request.user_id, tasks)
+        self._written(request.user_id, [("INSERT", row[0]) for row in rows])
+        return 201, rows, {}
+
+    async def update_task(self, request):
+        task_id = int(request.params[0])
+        fields = _parse_fields(dict(zip(UPDATABLE_FIELDS, request.json()["task"])))
+        await self._check_owned(request.user_id, [task_id])
+        task = await self._call(self.db.update_task, task_id, *(fields[field] for field in UPDATABLE_FIELDS))
+        self._written(request.user_id, [("UPDATE", task_id)])
+        return 200, task, {}
+
+    async def apply_edits(self, request):
+        edits = {int(task_id): _parse_fields(fields) for task_id, fields in request.json()["edits"].items()}
+        await self._check_owned(request.user_id, edits)
+        rows = await self._call(self.db.apply_edits, edits)
+        self._written(request.user_id, [("UPDATE", row[0]) for row in rows])
+        return 200, rows, {}
+
+    async def delete_task(self, request):
+        task_id = int(request.params[0])
+        await self._check_owned(request.user_id, [task_id])
+        deleted = await self._call(self.db.delete_task, task_id)
+        self._written(request.user_id, [("DELETE", task_id)])
+        return 200, {"deleted": deleted}, {}
+
+    async def delete_tasks(self, request):
+        ids = [int(task_id) for task_id in request.json()["ids"]]
+        await self._check_owned(request.user_id, ids)
+        deleted = await self._call(self.db.delete_tasks, ids)
+        self._written(request.user_id, [("DELETE", task_id) for task_id in deleted])
+        return 200, {"deleted": deleted}, {}
+
+    async def changes(self, request):
+        # Long poll: answers as soon as there is something after `since`, or with nothing
+        # after `wait` seconds. Without `since` it returns the current cursor.
+        feed = self._feed(request.user_id)
+        since = request.arg("since")
+        wait = min(request.arg("wait", 0, float), MAX_FEED_WAIT)
+        if since is None:
+            return 200, {"cursor": f"{self.epoch}:{self.seq}", "changes": []}, {}
+        epoch, _, seq = since.partition(":")
+        seq = int(seq)
+        if epoch != self.epoch or seq < feed.evicted:
+            # Restarted, or the client fell further behind than the retained entries
+            return 200, {"cursor": f"{self.epoch}:{self.seq}", "changes": [["RELOAD", 0]]}, {}
+        if not any(entry[0] > seq for entry in reversed(feed.entries)) and wait > 0:
+            try:
+                await asyncio.wait_for(feed.changed.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        changes = [[op, task_id] for entry_seq, op, task_id in feed.entries if entry_seq > seq]
+        return 200, {"cursor": f"{self.epoch}:{self.seq}", "changes": changes}, {}
+
+    async def dashboard(self, request):
+        today = request.arg("today", datetime.date.today(), _parse_date)
+        weeks = request.arg("weeks", 12, int)
+        key = f"dashboard?{today}&{weeks}"
+        return await self._cached(request, key, self.db.dashboard_stats, request.user_id, today, weeks)
+
+    async def archived_tasks(self, request):
+        cursor = request.arg("cursor", convert=_parse_cursor)
+        limit = request.arg("limit", 100, int)
+        rows, cursor = await self._call(self.db.archived_tasks, request.user_id, cursor, limit)
+        return 200, {"rows": rows, "cursor": _encode_cursor(cursor)}, {}
+
+    async def archived_count(self, request):
+        return 200, {"count": await self._call(self.db.archived_count, request.user_id)}, {}
+
+    async def archive_completed(self, request):
+        data = request.json()
+        moved = await self._call(self.db.archive_completed, request.user_id, int(data["older_than_days"]),
+                                 int(data.get("batch_size", ARCHIVE_BATCH)))
+        self._written(request.user_id, [("DELETE", task_id) for task_id in moved])
+        return 200, {"archived": moved}, {}
+
+    async def restore_tasks(self, request):
+        ids = [int(task_id) for task_id in request.json()["ids"]]
+        rows = await self._call(self.db.restore_tasks, request.user_id, ids)
+        self._written(request.user_id, [("INSERT", row[0]) for row in rows])
+        return 200, rows, {}
+
+    async def export_tasks(self, request):
+        # Streams the export as it is produced, in chunks written from the worker thread
+        fmt = request.arg("format", "csv")
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=16)
+        abandoned = threading.Event()
+
+        def send(chunk):
+            if abandoned.is_set():
+                raise ConnectionError("Export client disconnected")
+            asyncio.run_coroutine_threadsafe(queue.put(chunk), loop).result()
+
+        def export():
+            try:
+                out = _ChunkWriter(send)
+                self.db.export_tasks(request.user_id, out, fmt)
+                out.flush()
+            finally:
+                asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
+
+        job = self._call(export)
+
+        async def chunks():
+            finished = False
+            try:
+                while (chunk := await queue.get()) is not None:
+                    yield chunk
+                finished = True
+            finally:
+                if not finished:
+                    # Stop the export and unblock its pending write
+                    abandoned.set()
+                    while not queue.empty():
+                        queue.get_nowait()
+                try:
+                    await job
+                except ConnectionError:
+                    pass
+
+        content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+        return 200, chunks(), {"Content-Type": f"{content_type}; charset=utf-8"}
+
+    async def import_tasks(self, request):
+        fmt = request.arg("format", "csv")
+        source = io.TextIOWrapper(request.upload, encoding="utf-8-sig", newline="")
+        try:
+            imported, errors = await self._call(self.db.import_tasks, request.user_id, source, fmt)
+        finally:
+            source.close()
+        self._written(request.user_id, [("RELOAD", 0)])
+        return 200, {"imported": imported, "errors": errors}, {}
+
+
+class _ChunkWriter(io.TextIOBase):
+    # Text stream for export_tasks that hands its output on as encoded chunks worth sending
+    def __init__(self, send):
+        super().__init__()
+        self.send = send
+        self.parts = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(data)
+        self.size += len(data)
+        if self.size >= EXPORT_CHUNK_BYTES:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.parts:
+            self.send("".join(self.parts).encode())
+            self.parts = []
+            self.size = 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Task Note HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--backend", choices=[backend for backend in BACKENDS if backend != "http"],
+                        help="storage behind the service (default: config.DB_BACKEND)")
+    parser.add_argument("--workers", type=int, help="concurrent database calls (default: the pool size)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    db = open_database(args.backend)
+    db.create_tables()
+    service = TaskService(db, args.workers)
+    try:
+        asyncio.run(service.run(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
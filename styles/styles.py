@@ -32,7 +32,7 @@ STYLESHEET = """
         background-color: #dc2626;
     }
     /* Task List Form */
-    QTableWidget {
+    QTableView {
         background-color: #ffffff;
         border: 1px solid #d1d5db;
         border-radius: 8px;
@@ -42,11 +42,11 @@ STYLESHEET = """
         margin: 5px;
         box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
     }
-    QTableWidget::item {
+    QTableView::item {
         padding: 8px;
         border-bottom: 1px solid #f3f4f6;
     }
-    QTableWidget::item:selected {
+    QTableView::item:selected {
         background-color: #e0e7ff;
         color: #1f2937;
     }
@@ -81,6 +81,12 @@ STYLESHEET = """
         border-radius: 8px;
         margin: 10px 0 5px 0;
     }
+    QLabel#stale_label {
+        color: #92400e;
+        background-color: #fef3c7;
+        padding: 6px 10px;
+        border-radius: 6px;
+    }
     /* Scroll Area */
     QScrollArea {
         background-color: #e0e7ff;
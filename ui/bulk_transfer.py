@@ -0,0 +1,108 @@
+from PyQt6.QtWidgets import QProgressDialog, QFileDialog, QMessageBox
+from PyQt6.QtCore import Qt, pyqtSignal
+from database import bulk
+import os
+import threading
+
+FILE_FILTER = "CSV files (*.csv);;JSON Lines files (*.jsonl *.ndjson)"
+
+
+class TransferCancelled(Exception):
+    pass
+
+
+class BulkTransferDialog(QProgressDialog):
+    # Runs an import or export on the database worker and shows its progress
+    imported = pyqtSignal(int)  # tasks added by a finished import
+
+    def __init__(self, db, worker, user_id, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.user_id = user_id
+        self._cancel = threading.Event()
+        self.setWindowModality(Qt.WindowModality.WindowModal)
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+        self.setMinimumDuration(0)
+        self.canceled.connect(self._cancel.set)
+
+    def start_import(self):
+        path, _ = QFileDialog.getOpenFileName(self.parent(), "Import Tasks", "", FILE_FILTER)
+        if not path:
+            return False
+        self.setWindowTitle("Import Tasks")
+        self.setLabelText("Importing tasks...")
+        self.setRange(0, 0)
+        self.show()
+        self.worker.submit(
+            self._run, _import_file, path,
+            on_result=self._on_import_done, on_error=self._on_error, on_progress=self._on_progress
+        )
+        return True
+
+    def start_export(self):
+        path, _ = QFileDialog.getSaveFileName(self.parent(), "Export Tasks", "tasks.csv", FILE_FILTER)
+        if not path:
+            return False
+        self.setWindowTitle("Export Tasks")
+        self.setLabelText("Exporting tasks...")
+        self.setRange(0, 0)
+        self.show()
+        self.worker.submit(
+            self._run, _export_file, path,
+            on_result=self._on_export_done, on_error=self._on_error, on_progress=self._on_progress
+        )
+        return True
+
+    def _run(self, transfer, path, progress):
+        # Runs on the worker thread; raising from the callback aborts the COPY transaction
+        def report(value):
+            if self._cancel.is_set():
+                raise TransferCancelled()
+            progress(value)
+        return transfer(self.db, self.user_id, path, report)
+
+    def _on_progress(self, value):
+        done, total = value
+        if total:
+            self.setRange(0, total)
+            self.setValue(done)
+        self.setLabelText(f"{done:,} tasks processed...")
+
+    def _on_import_done(self, result):
+        imported, errors = result
+        self.close()
+        if imported:
+            self.imported.emit(imported)
+        message = f"Imported {imported:,} tasks."
+        if errors:
+            shown = "\n".join(f"Line {line}: {error}" for line, error in errors[:10])
+            more = f"\n...and {len(errors) - 10} more" if len(errors) > 10 else ""
+            message += f"\n\nSkipped {len(errors):,} invalid rows:\n{shown}{more}"
+        QMessageBox.information(self.parent(), "Import Tasks", message)
+
+    def _on_export_done(self, exported):
+        self.close()
+        QMessageBox.information(self.parent(), "Export Tasks", f"Exported {exported:,} tasks.")
+
+    def _on_error(self, error):
+        self.close()
+        if isinstance(error, TransferCancelled):
+            return
+        QMessageBox.warning(self.parent(), "Error", f"Transfer failed: {error}")
+
+
+def _import_file(db, user_id, path, progress):
+    with open(path, newline="", encoding="utf-8") as source:
+        return db.import_tasks(user_id, source, bulk.format_for_path(path), progress=progress)
+
+
+def _export_file(db, user_id, path, progress):
+    try:
+        with open(path, "w", newline="", encoding="utf-8") as out:
+            return db.export_tasks(user_id, out, bulk.format_for_path(path), progress=progress)
+    except Exception:
+        # Do not leave a truncated export behind
+        os.remove(path)
+        raise
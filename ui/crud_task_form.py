@@ -1,21 +1,28 @@
-from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListView,
                              QPushButton, QLineEdit, QTextEdit, QMessageBox,
-                             QLabel, QDateEdit, QComboBox, QSpinBox, QListWidgetItem)
-from PyQt6.QtCore import Qt, QDate, pyqtSignal
-from PyQt6.QtGui import QColor, QBrush
-import datetime
+                             QLabel, QDateEdit, QComboBox, QSpinBox)
+from PyQt6.QtCore import Qt, QDate, QTimer
+from database.search import SearchIndex
+from instrumentation.metrics import metrics
+from ui.task_model import TaskListModel
 
 
 class CrudTaskForm(QWidget):
-    task_updated = pyqtSignal()
+    SEARCH_DEBOUNCE_MS = 150
 
-    def __init__(self, user_id, db):
+    def __init__(self, store):
         super().__init__()
-        self.user_id = user_id
-        self.db = db
-        self.all_tasks = []
+        self.store = store
+        self.model = TaskListModel(store, self)
+        self._search_generation = 0
         self.initUI()
-        self.load_tasks()
+
+        self.store.reset.connect(self.load_tasks)
+        self.store.tasks_changed.connect(self.apply_changes)
+        self.store.error.connect(self._on_task_error)
+        self.store.search_index_ready.connect(self._on_search_index_ready)
+        if self.store.loaded:
+            self.load_tasks()
 
     def initUI(self):
         layout = QHBoxLayout(self)
@@ -25,12 +32,21 @@ class CrudTaskForm(QWidget):
         left_layout = QVBoxLayout(left_panel)
 
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Filter tasks by title...")
-        self.search_input.textChanged.connect(self.filter_tasks)
+        self.search_input.setPlaceholderText("Search tasks by title or description...")
         left_layout.addWidget(self.search_input)
 
-        self.task_list = QListWidget()
-        self.task_list.itemClicked.connect(self.task_selected)
+        # Run the search once typing pauses rather than on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.filter_tasks)
+        self.search_input.textChanged.connect(self.search_timer.start)
+
+        self.task_list = QListView()
+        self.task_list.setModel(self.model)
+        self.task_list.setUniformItemSizes(True)
+        self.task_list.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        self.task_list.clicked.connect(self.task_selected)
         left_layout.addWidget(self.task_list)
 
         # Right panel
@@ -53,6 +69,9 @@ class CrudTaskForm(QWidget):
         self.due_date_input = QDateEdit()
         self.due_date_input.setCalendarPopup(True)
         self.due_date_input.setDate(QDate.currentDate())
+        # Imports and the command line can leave a task without a due date; the earliest
+        # date stands for none
+        self.due_date_input.setSpecialValueText("No due date")
         right_layout.addWidget(due_date_label)
         right_layout.addWidget(self.due_date_input)
 
@@ -93,56 +112,98 @@ class CrudTaskForm(QWidget):
         self.complete_btn.clicked.connect(self.toggle_complete)
         button_layout.addWidget(self.complete_btn)
 
+        self.priority_btn = QPushButton("Set Priority")
+        self.priority_btn.setToolTip("Apply the selected priority to every selected task")
+        self.priority_btn.clicked.connect(self.set_priority)
+        button_layout.addWidget(self.priority_btn)
+
         right_layout.addLayout(button_layout)
 
         layout.addWidget(left_panel, 1)
         layout.addWidget(right_panel, 2)
 
     def load_tasks(self):
-        self.all_tasks = self.db.get_user_tasks(self.user_id)
         self.filter_tasks()
 
+    def _on_task_error(self, error):
+        QMessageBox.warning(self, "Error", f"Database error: {error}")
+
+    def _matches_filter(self, task):
+        return SearchIndex.matches(task, self.search_input.text())
+
     def filter_tasks(self):
-        search_text = self.search_input.text().strip().lower()
-        self.task_list.clear()
-
-        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
-        filtered_tasks = [
-            task for task in self.all_tasks
-            if search_text in task[1].lower()
-        ]
-
-        for task in filtered_tasks:
-            task_id, title, desc, due_date, priority, status, progress = task
-            if isinstance(due_date, datetime.datetime):
-                due_date = due_date.date()
-
-            item_text = f"[{'✓' if status == 'Completed' else ' '}] {title} (Due: {due_date}, P: {priority}, S: {status}, Progress: {progress}%)"
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.ItemDataRole.UserRole, task_id)
-
-            if due_date == tomorrow and status != "Completed":
-                item.setBackground(QBrush(QColor("yellow")))
-
-            self.task_list.addItem(item)
-
-    def task_selected(self, item):
-        task_id = item.data(Qt.ItemDataRole.UserRole)
-        with self.db.conn.cursor() as cur:
-            cur.execute("SELECT title, description, due_date, priority, status, progress FROM tasks WHERE id = %s", (task_id,))
-            title, desc, due_date, priority, status, progress = cur.fetchone()
-            self.title_input.setText(title)
-            self.desc_input.setPlainText(desc)
-            self.due_date_input.setDate(due_date)
-            self.priority_input.setCurrentText(priority)
-            self.status_input.setCurrentText(status)
-            self.progress_input.setValue(progress or 0)
-            self.complete_btn.setText("Mark Incomplete" if status == "Completed" else "Mark Complete")
+        with metrics.timer("ui.crud.filter_ms"):
+            self._filter_tasks()
+
+    def _filter_tasks(self):
+        self._search_generation += 1
+        search_text = self.search_input.text().strip()
+        threshold = getattr(self.store.db, "server_search_threshold", None)
+        if search_text and threshold is not None and len(self.store) > threshold:
+            # Large accounts search on the server; only the latest query is shown
+            generation = self._search_generation
+            self.store.search_on_server(
+                search_text, lambda task_ids: self._show_results(generation, task_ids)
+            )
+            return
+        self.model.set_ids(self.store.search(search_text))
+
+    def _on_search_index_ready(self):
+        # Re-rank an active query that was answered by the fallback scan
+        if self.search_input.text().strip():
+            self.filter_tasks()
+
+    def _show_results(self, generation, task_ids):
+        if generation == self._search_generation:
+            self.model.set_ids(task_ids)
+
+    def apply_changes(self, inserted, updated, deleted):
+        with metrics.timer("ui.crud.patch_ms"):
+            self._apply_changes(inserted, updated, deleted)
+
+    def _apply_changes(self, inserted, updated, deleted):
+        # Patch the list in place instead of rebuilding it
+        for task_id in deleted:
+            self.model.remove_id(task_id)
+        for task_id in updated + inserted:
+            task = self.store.get(task_id)
+            if not self._matches_filter(task):
+                self.model.remove_id(task_id)
+            elif self.model.contains(task_id):
+                self.model.refresh_id(task_id)
+            else:
+                self.model.append_id(task_id)
+
+    def _selected_task_id(self):
+        index = self.task_list.currentIndex()
+        return index.data(Qt.ItemDataRole.UserRole) if index.isValid() else None
+
+    def _selected_task_ids(self):
+        return [index.data(Qt.ItemDataRole.UserRole) for index in self.task_list.selectionModel().selectedIndexes()]
+
+    def _due_date(self):
+        date = self.due_date_input.date()
+        return None if date == self.due_date_input.minimumDate() else date.toPyDate()
+
+    def task_selected(self, index):
+        task_id = index.data(Qt.ItemDataRole.UserRole)
+        # The list was built from the task store, so the row is already in memory
+        task = self.store.get(task_id)
+        if not task:
+            return
+        _, title, desc, due_date, priority, status, progress = task
+        self.title_input.setText(title)
+        self.desc_input.setPlainText(desc or "")
+        self.due_date_input.setDate(self.due_date_input.minimumDate() if due_date is None else due_date)
+        self.priority_input.setCurrentText(priority)
+        self.status_input.setCurrentText(status)
+        self.progress_input.setValue(progress or 0)
+        self.complete_btn.setText("Mark Incomplete" if status == "Completed" else "Mark Complete")
 
     def add_task(self):
         title = self.title_input.text().strip()
         desc = self.desc_input.toPlainText().strip()
-        due_date = self.due_date_input.date().toPyDate()
+        due_date = self._due_date()
         priority = self.priority_input.currentText()
         status = self.status_input.currentText()
         progress = self.progress_input.value()
@@ -151,20 +212,17 @@ class CrudTaskForm(QWidget):
             QMessageBox.warning(self, "Error", "Title cannot be empty")
             return
 
-        self.db.add_task(self.user_id, title, desc, due_date, priority, status, progress)
+        self.store.add_task(title, desc, due_date, priority, status, progress)
         self.clear_inputs()
-        self.load_tasks()
-        self.task_updated.emit()
 
     def update_task(self):
-        current_item = self.task_list.currentItem()
-        if not current_item:
+        task_id = self._selected_task_id()
+        if task_id is None:
             QMessageBox.warning(self, "Error", "Select a task to update")
             return
-        task_id = current_item.data(Qt.ItemDataRole.UserRole)
         title = self.title_input.text().strip()
         desc = self.desc_input.toPlainText().strip()
-        due_date = self.due_date_input.date().toPyDate()
+        due_date = self._due_date()
         priority = self.priority_input.currentText()
         status = self.status_input.currentText()
         progress = self.progress_input.value()
@@ -173,51 +231,53 @@ class CrudTaskForm(QWidget):
             QMessageBox.warning(self, "Error", "Title cannot be empty")
             return
 
-        self.db.update_task(task_id, title, desc, due_date, priority, status, progress)
-        self.load_tasks()
-        self.task_updated.emit()
+        self.store.update_task(task_id, title, desc, due_date, priority, status, progress)
 
     def delete_task(self):
-        current_item = self.task_list.currentItem()
-        if not current_item:
+        task_ids = self._selected_task_ids()
+        if not task_ids:
             QMessageBox.warning(self, "Error", "Select a task to delete")
             return
-        task_id = current_item.data(Qt.ItemDataRole.UserRole)
-        self.db.delete_task(task_id)
+        if len(task_ids) > 1 and QMessageBox.question(
+                self, "Delete Tasks", f"Delete {len(task_ids)} tasks?"
+        ) != QMessageBox.StandardButton.Yes:
+            return
+        self.store.delete_tasks(task_ids)
         self.clear_inputs()
-        self.load_tasks()
-        self.task_updated.emit()
 
     def toggle_complete(self):
-        current_item = self.task_list.currentItem()
-        if not current_item:
+        task_ids = self._selected_task_ids()
+        if not task_ids:
             QMessageBox.warning(self, "Error", "Select a task to mark")
             return
-        task_id = current_item.data(Qt.ItemDataRole.UserRole)
 
-        # Fetch current task data
-        with self.db.conn.cursor() as cur:
-            cur.execute("SELECT title, description, due_date, priority, status, progress FROM tasks WHERE id = %s", (task_id,))
-            title, desc, due_date, priority, current_status, _ = cur.fetchone()
+        # Current task data is already loaded
+        tasks = [self.store.get(task_id) for task_id in task_ids]
+        if not all(tasks):
+            return
 
-        # Toggle status and adjust progress
-        if current_status == "Completed":
+        # Toggle status and adjust progress; a mixed selection is marked complete
+        if all(task[5] == "Completed" for task in tasks):
             new_status = "In Progress"  # Revert to "In Progress"
             progress = 0  # Set progress to 0% when marking incomplete
         else:
             new_status = "Completed"
             progress = 100  # Set progress to 100% when marking complete
 
-        # Update task in database
-        self.db.update_task(task_id, title, desc, due_date, priority, new_status, progress)
+        # Only status and progress change, for all selected tasks in one statement
+        self.store.set_tasks_status(task_ids, new_status, progress)
 
         # Update UI
         self.status_input.setCurrentText(new_status)
         self.progress_input.setValue(progress)
         self.complete_btn.setText("Mark Incomplete" if new_status == "Completed" else "Mark Complete")
 
-        self.load_tasks()
-        self.task_updated.emit()
+    def set_priority(self):
+        task_ids = self._selected_task_ids()
+        if not task_ids:
+            QMessageBox.warning(self, "Error", "Select a task to reprioritize")
+            return
+        self.store.update_tasks(task_ids, priority=self.priority_input.currentText())
 
     def clear_inputs(self):
         self.title_input.clear()
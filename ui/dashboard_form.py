@@ -0,0 +1,147 @@
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QLabel, QSizePolicy
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QPixmap
+from instrumentation.metrics import metrics
+import datetime
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("Not Started", "In Progress", "Completed")
+PRIORITIES = ("High", "Medium", "Low")
+
+
+def render_charts(stats, width, height, dpi=100):
+    # Burndown and weekly completion rate as PNG bytes. Runs on a worker thread: a bare
+    # Figure on the Agg canvas keeps no GUI or pyplot state, and matplotlib is only
+    # imported once the dashboard is first opened.
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(figure)
+    burndown, rate = figure.subplots(1, 2)
+    labels = [week.strftime("%d %b") for week in stats["weeks"]]
+
+    burndown.bar(labels, stats["completed"], color="#a5b4fc", label="Completed")
+    burndown.plot(labels, stats["open"], color="#4f46e5", marker="o", label="Open")
+    burndown.set_title("Burndown (per week)", fontsize=10)
+    burndown.legend(fontsize=8)
+
+    rate.plot(labels, [value * 100 for value in stats["completion_rate"]], color="#059669", marker="o")
+    rate.set_ylim(0, 100)
+    rate.set_title("Completion rate (%)", fontsize=10)
+
+    for axes in (burndown, rate):
+        axes.tick_params(axis="x", labelrotation=45, labelsize=7)
+        axes.tick_params(axis="y", labelsize=8)
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def load_dashboard(db, user_id, today, size, cached):
+    # Aggregates from the database; the charts are only redrawn when they changed
+    stats = db.dashboard_stats(user_id, today)
+    if cached is not None and cached[0] == stats and cached[1] == size:
+        return cached
+    with metrics.timer("ui.dashboard.render_ms"):
+        return stats, size, render_charts(stats, *size)
+
+
+class DashboardForm(QWidget):
+    # Coalesces bursts of task changes into one reload while the page is visible
+    REFRESH_DELAY_MS = 1500
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.cached = None    # (stats, chart size, png) of the last load
+        self.stale = True
+        self.loading = False
+        self.initUI()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(self.REFRESH_DELAY_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+        self.store.reset.connect(self.invalidate)
+        self.store.tasks_changed.connect(self.invalidate)
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+
+        self.summary_label = QLabel("Loading statistics...")
+        self.summary_label.setObjectName("status_label")
+        layout.addWidget(self.summary_label)
+
+        # One row per status and priority with its task count
+        grid = QGridLayout()
+        self.count_labels = {}
+        for column, (title, names) in enumerate((("By status", STATUSES), ("By priority", PRIORITIES))):
+            grid.addWidget(QLabel(title), 0, column * 2, 1, 2)
+            for row, name in enumerate(names, start=1):
+                grid.addWidget(QLabel(name), row, column * 2)
+                self.count_labels[name] = QLabel("0")
+                grid.addWidget(self.count_labels[name], row, column * 2 + 1)
+        layout.addLayout(grid)
+
+        self.chart_label = QLabel()
+        self.chart_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.chart_label.setMinimumSize(400, 200)
+        self.chart_label.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        layout.addWidget(self.chart_label, 1)
+
+    def invalidate(self, *args):
+        # Hidden dashboards only note that they are out of date and reload when shown
+        self.stale = True
+        if self.isVisible():
+            self.refresh_timer.start()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.stale:
+            self.refresh()
+
+    def refresh(self):
+        self.refresh_timer.stop()
+        if self.loading:
+            # Picked up again when the running load finishes
+            return
+        self.stale = False
+        self.loading = True
+        ratio = self.devicePixelRatioF()
+        size = (int(max(self.chart_label.width(), 400) * ratio), int(max(self.chart_label.height(), 200) * ratio))
+        self.store.worker.submit(load_dashboard, self.store.db, self.store.user_id, datetime.date.today(),
+                                 size, self.cached, on_result=self._on_loaded, on_error=self._on_failed)
+
+    def _on_loaded(self, result):
+        self.loading = False
+        if result is not self.cached:
+            self.cached = result
+            stats, size, png = result
+            self._show_stats(stats)
+            pixmap = QPixmap()
+            pixmap.loadFromData(png, "PNG")
+            pixmap.setDevicePixelRatio(self.devicePixelRatioF())
+            self.chart_label.setPixmap(pixmap)
+        if self.stale and self.isVisible():
+            self.refresh_timer.start()
+
+    def _on_failed(self, error):
+        self.loading = False
+        logger.error("Loading dashboard statistics failed: %s", error)
+        self.summary_label.setText("Statistics unavailable")
+
+    def _show_stats(self, stats):
+        total = stats["total"]
+        completed = stats["by_status"].get("Completed", 0)
+        share = f" ({completed * 100 // total}% completed)" if total else ""
+        self.summary_label.setText(f"{total} tasks{share}, {stats['overdue']} overdue")
+        for name, label in self.count_labels.items():
+            counts = stats["by_status"] if name in STATUSES else stats["by_priority"]
+            label.setText(str(counts.get(name, 0)))
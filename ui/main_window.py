@@ -1,23 +1,39 @@
-from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QMessageBox, QStackedWidget, QSystemTrayIcon)
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QIcon
+from PyQt6.QtCore import Qt, QTimer, QEventLoop, pyqtSignal
+from PyQt6.QtGui import QIcon, QKeySequence, QShortcut
 from ui.login_dialog import LoginDialog
-from ui.task_list_form import TaskListForm
-from ui.crud_task_form import CrudTaskForm
-from database.db import Database
-from styles.styles import STYLESHEET
-import datetime
+from database.factory import open_database
+from database.worker import DbWorker
+from instrumentation.metrics import metrics
+import logging
+
+# The forms, task store and database driver are imported where first used, so the
+# login dialog is not held up by modules it does not need
+
+logger = logging.getLogger(__name__)
 
 
 class TaskManager(QMainWindow):
-    def __init__(self):
+    database_ready = pyqtSignal()
+
+    def __init__(self, metrics_file=None):
         super().__init__()
-        self.db = Database()
+        self.metrics_file = metrics_file or "metrics.json"
+        self.worker = DbWorker(parent=self)
         self.user_id = None
+
+        # Connect (and migrate if needed) while the user is typing their credentials
+        self.db = None
+        self.db_error = None
+        self.worker.submit(open_database, on_result=self._on_database_opened, on_error=self._on_database_failed)
         self.init_system_tray()
-        print(f"Tray available: {QSystemTrayIcon.isSystemTrayAvailable()}")
-        print(f"Tray supports messages: {QSystemTrayIcon.supportsMessages()}")
+
+        # Dump query and render metrics on demand
+        self.metrics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+M"), self)
+        self.metrics_shortcut.activated.connect(self.dump_metrics)
+        logger.debug("Tray available: %s", QSystemTrayIcon.isSystemTrayAvailable())
+        logger.debug("Tray supports messages: %s", QSystemTrayIcon.supportsMessages())
         self.show_login()
 
     def init_system_tray(self):
@@ -26,33 +42,93 @@ class TaskManager(QMainWindow):
         try:
             self.tray_icon.setIcon(QIcon("icon.png"))  # Ensure icon.png exists
         except Exception as e:
-            print(f"Icon load failed: {e}")
+            logger.warning("Icon load failed: %s", e)
             self.tray_icon.setIcon(QIcon())  # Fallback to blank icon
         # Test tray immediately
         self.tray_icon.showMessage("Tray Init", "System tray active", QSystemTrayIcon.MessageIcon.Information, 2000)
 
+    def _on_database_opened(self, db):
+        self.db = db
+        self.database_ready.emit()
+
+    def _on_database_failed(self, error):
+        logger.error("Database connection failed: %s", error)
+        self.db_error = error
+        self.database_ready.emit()
+
+    def wait_for_database(self):
+        # Usually connected by the time the login dialog is accepted; otherwise keep the
+        # event loop running until it is
+        if self.db is None and self.db_error is None:
+            loop = QEventLoop()
+            self.database_ready.connect(loop.quit)
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            loop.exec()
+            QApplication.restoreOverrideCursor()
+            self.database_ready.disconnect(loop.quit)
+        return self.db is not None
+
+    def _wait_for_worker(self, fn, *args):
+        # Runs fn on the worker and keeps the event loop running until it is done, for
+        # the steps of the sign-in sequence; raises whatever fn raised
+        outcome = []
+        loop = QEventLoop()
+
+        def finish(failed, value):
+            outcome.append((failed, value))
+            loop.quit()
+
+        self.worker.submit(fn, *args, on_result=lambda value: finish(False, value),
+                           on_error=lambda error: finish(True, error))
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        loop.exec()
+        QApplication.restoreOverrideCursor()
+        failed, value = outcome[0]
+        if failed:
+            raise value
+        return value
+
     def show_login(self):
         login_dialog = LoginDialog()
+        # Runs once the dialog's event loop has started, i.e. it is on screen
+        QTimer.singleShot(0, lambda: metrics.mark_startup("login_dialog"))
         if login_dialog.exec():
             username = login_dialog.username.text()
             password = login_dialog.password.text()
 
-            self.user_id = self.db.verify_user(username, password)
+            if not self.wait_for_database():
+                QMessageBox.critical(self, "Error", f"Could not connect to the database: {self.db_error}")
+                self.close()
+                return
+
+            try:
+                self.user_id, registered = self._wait_for_worker(_sign_in, self.db, username, password)
+            except Exception as e:
+                logger.error("Sign-in failed: %s", e)
+                QMessageBox.critical(self, "Error", f"Could not sign in: {e}")
+                self.close()
+                return
             if not self.user_id:
-                self.user_id = self.db.register_user(username, password)
-                if not self.user_id:
-                    QMessageBox.warning(self, "Error", "Username taken or login failed")
-                    self.close()
-                    return
+                QMessageBox.warning(self, "Error", "Username taken or login failed")
+                self.close()
+                return
+            if registered:
                 QMessageBox.information(self, "Success", "User registered successfully")
 
             self.initUI()
-            self.start_notification_timer()
+            self.start_notifications()
             self.show()
         else:
             self.close()
 
     def initUI(self):
+        from database import snapshot
+        from database.task_store import TaskStore
+        from ui.task_list_form import TaskListForm
+        from ui.crud_task_form import CrudTaskForm
+        from ui.dashboard_form import DashboardForm
+        from styles.styles import STYLESHEET
+
         self.setWindowTitle('Task Note Manager')
         self.setGeometry(100, 100, 800, 600)
 
@@ -71,6 +147,18 @@ class TaskManager(QMainWindow):
         self.crud_task_btn.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(1))
         nav_layout.addWidget(self.crud_task_btn)
 
+        self.dashboard_btn = QPushButton("Dashboard")
+        self.dashboard_btn.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(2))
+        nav_layout.addWidget(self.dashboard_btn)
+
+        self.import_btn = QPushButton("Import")
+        self.import_btn.clicked.connect(lambda: self.start_transfer(import_tasks=True))
+        nav_layout.addWidget(self.import_btn)
+
+        self.export_btn = QPushButton("Export")
+        self.export_btn.clicked.connect(lambda: self.start_transfer(import_tasks=False))
+        nav_layout.addWidget(self.export_btn)
+
         self.logout_btn = QPushButton(" ⟳ Logout")
         self.logout_btn.clicked.connect(self.logout)
         self.logout_btn.setObjectName("logout_btn")
@@ -82,16 +170,29 @@ class TaskManager(QMainWindow):
         self.stacked_widget = QStackedWidget()
         layout.addWidget(self.stacked_widget)
 
+        # Both forms and the due-task check read from one shared task store, which shows
+        # the tasks saved last session until the first refresh arrives
+        self.task_store = TaskStore(self.user_id, self.db, self.worker,
+                                    snapshot.path_for(self.db, self.user_id), self)
+
         # Initialize forms
-        self.task_list_form = TaskListForm(self.user_id, self.db)
-        self.crud_task_form = CrudTaskForm(self.user_id, self.db)
+        self.task_list_form = TaskListForm(self.task_store)
+        self.crud_task_form = CrudTaskForm(self.task_store)
+        # Queries and draws its charts only once it is opened
+        self.dashboard_form = DashboardForm(self.task_store)
+        # Connected after the forms, so this runs once the task list has been filled,
+        # from the snapshot when there is one
+        self.task_store.reset.connect(lambda: metrics.mark_startup("first_task_list"))
+        self.task_store.stale_changed.connect(self._on_task_list_stale)
+        # Old completed tasks are archived after the first load, so it is never held up
+        # by the move and the moved rows leave the list as ordinary deletions
+        if self.db.archive_after_days:
+            self.task_store.reset.connect(self._archive_completed)
 
         # Add forms to stacked widget
         self.stacked_widget.addWidget(self.task_list_form)
         self.stacked_widget.addWidget(self.crud_task_form)
-
-        # Connect signals between forms
-        self.crud_task_form.task_updated.connect(self.task_list_form.load_tasks)
+        self.stacked_widget.addWidget(self.dashboard_form)
 
         self.setStyleSheet(STYLESHEET)
 
@@ -102,40 +203,117 @@ class TaskManager(QMainWindow):
         )
         layout.addWidget(test_btn)  # Add to main layout
 
-    def start_notification_timer(self):
-        self.notification_timer = QTimer(self)
-        self.notification_timer.timeout.connect(self.check_due_tasks)
-        self.notification_timer.start(10000)  # 10 seconds for testing; revert to 3600000 for production
-        self.check_due_tasks()  # Immediate check
+    def _on_task_list_stale(self, stale):
+        # Without a snapshot the first task list is already the fresh one
+        if not stale:
+            metrics.mark_startup("fresh_task_list")
 
-    def check_due_tasks(self):
+    def _archive_completed(self):
+        self.task_store.reset.disconnect(self._archive_completed)
+        self.task_store.archive_completed(self.db.archive_after_days)
+
+    def start_notifications(self):
+        from database.listener import ChangeListener
+        from ui.reminder_scheduler import ReminderScheduler
+
+        # Reminders are scheduled from due dates instead of rescanning on a timer
+        self.reminder_scheduler = ReminderScheduler(self.task_store, self)
+        self.reminder_scheduler.reminders_due.connect(self.show_due_reminders)
+
+        # Changes from other clients arrive as NOTIFY events; a full refresh is only a
+        # rare consistency check, or the fallback when the listener cannot start.
+        # A replica already reads locally, so every trigger becomes a delta sync instead.
+        replicated = self.db.replicated
+        reload = self.task_store.sync if replicated else self.task_store.refresh
+        self.change_listener = None
         try:
-            tasks = self.db.get_user_tasks(self.user_id)
-            tomorrow = datetime.date.today() + datetime.timedelta(days=1)
-
-            for task in tasks:
-                task_id, title, desc, due_date, priority, status, progress = task
-                task_due_date = due_date.date() if isinstance(due_date, datetime.datetime) else due_date
-
-                if task_due_date == tomorrow and status != "Completed":
-                    print(f"Notification for: {title}")
-                    if not self.tray_icon.showMessage(
-                            "Task Due Tomorrow",
-                            f"Task '{title}' is due tomorrow!",
-                            QSystemTrayIcon.MessageIcon.Information,
-                            500000
-                    ):
-                        # Fallback if tray notification fails
-                        QMessageBox.information(
-                            self,
-                            "Task Due Tomorrow",
-                            f"Task '{title}' is due tomorrow!"
-                        )
+            self.change_listener = ChangeListener(self.db, self.user_id, self)
+            if replicated:
+                self.change_listener.changes.connect(lambda changed, deleted: self.task_store.sync())
+            else:
+                self.change_listener.changes.connect(self.task_store.apply_remote_changes)
+            self.change_listener.reconnected.connect(reload)
+            self.change_listener.reload_requested.connect(reload)
         except Exception as e:
-            print(f"Error: {e}")
+            logger.warning("Change notifications unavailable, falling back to polling: %s", e)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(reload)
+        if replicated and not self.change_listener:
+            self.refresh_timer.start(self.db.sync_interval * 1000)
+        else:
+            self.refresh_timer.start(1800000 if self.change_listener else 60000)
+        self.task_store.load_snapshot()
+        self.task_store.refresh()  # Initial load; reminders are scheduled once it arrives
+        if replicated:
+            self.task_store.sync()
+
+    def start_transfer(self, import_tasks):
+        from ui.bulk_transfer import BulkTransferDialog
+
+        dialog = BulkTransferDialog(self.db, self.worker, self.user_id, self)
+        if self.change_listener is None:
+            # Nothing announces the imported rows (SQLite, or no listener), so reload now
+            # instead of at the next poll
+            reload = self.task_store.sync if self.db.replicated else self.task_store.refresh
+            dialog.imported.connect(lambda count: reload())
+        started = dialog.start_import() if import_tasks else dialog.start_export()
+        if started:
+            self.transfer_dialog = dialog
+        else:
+            dialog.deleteLater()
+
+    def show_due_reminders(self, tasks):
+        # One message per batch of reminders that came due together
+        titles = [task[1] for task in tasks]
+        if len(titles) == 1:
+            title, message = "Task Due Tomorrow", f"Task '{titles[0]}' is due tomorrow!"
+        else:
+            shown = ", ".join(f"'{t}'" for t in titles[:5])
+            more = f" and {len(titles) - 5} more" if len(titles) > 5 else ""
+            title, message = "Tasks Due Tomorrow", f"{len(titles)} tasks are due tomorrow: {shown}{more}"
+        logger.info("Notification for: %s", ", ".join(titles))
+
+        if QSystemTrayIcon.supportsMessages():
+            self.tray_icon.showMessage(title, message, QSystemTrayIcon.MessageIcon.Information, 10000)
+        else:
+            # Non-modal fallback so the event loop keeps running
+            box = QMessageBox(QMessageBox.Icon.Information, title, message, QMessageBox.StandardButton.Ok, self)
+            box.setModal(False)
+            box.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+            box.show()
+
+    def dump_metrics(self):
+        logger.info("Metrics:\n%s", metrics.report())
+        try:
+            metrics.dump(self.metrics_file)
+        except OSError as e:
+            logger.error("Could not write metrics to %s: %s", self.metrics_file, e)
+
+    def shutdown(self):
+        # Write queued edits and let in-flight queries finish before the pool's connections are closed
+        if self.user_id is not None:
+            self.task_store.flush_writes()
+            self.task_store.save_snapshot()
+        self.worker.wait_for_done()
+        if self.db is not None:
+            self.db.close()
 
     def logout(self):
-        self.notification_timer.stop()
+        self.task_store.flush_writes()
+        self.task_store.save_snapshot()
+        self.reminder_scheduler.stop()
+        self.refresh_timer.stop()
+        if self.change_listener:
+            self.change_listener.close()
         self.user_id = None
         self.close()
-        self.show_login()
\ No newline at end of file
+        self.show_login()
+
+
+def _sign_in(db, username, password):
+    # (user_id, registered): signs in, or registers the username when it is unknown
+    user_id = db.verify_user(username, password)
+    if user_id:
+        return user_id, False
+    return db.register_user(username, password), True
@@ -0,0 +1,107 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+import datetime
+import heapq
+
+
+class ReminderScheduler(QObject):
+    # Keeps a min-heap of upcoming reminder instants and arms a single timer for the
+    # earliest one. A task is reminded once per due date, at the start of the day
+    # before it is due; reminders that come due together are emitted as one batch.
+    reminders_due = pyqtSignal(list)  # task rows
+
+    LEAD_TIME = datetime.timedelta(days=1)
+    # Re-check at least this often so sleep or clock changes cannot strand the timer
+    MAX_WAIT_MS = 3600000
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._heap = []
+        self._entries = {}
+        self._fired = set()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._fire_due)
+
+        self.store.reset.connect(self.rebuild)
+        self.store.tasks_changed.connect(self.update_tasks)
+        if self.store.loaded:
+            self.rebuild()
+
+    def rebuild(self):
+        # Candidates come from one vectorized pass over the store's columns
+        self._entries = {}
+        for task_id, due_date in zip(*self.store.columns.upcoming(datetime.date.today())):
+            if (task_id, due_date) not in self._fired:
+                self._entries[task_id] = (self._instant_for(due_date), due_date)
+        self._heap = [(instant, task_id, due_date) for task_id, (instant, due_date) in self._entries.items()]
+        heapq.heapify(self._heap)
+        self._arm()
+
+    def update_tasks(self, inserted, updated, deleted):
+        # Replaced heap entries are left in place and skipped when popped
+        for task_id in deleted:
+            self._entries.pop(task_id, None)
+        for task_id in inserted + updated:
+            entry = self._entry_for(self.store.get(task_id))
+            if entry is None:
+                self._entries.pop(task_id, None)
+            elif self._entries.get(task_id) != entry:
+                self._entries[task_id] = entry
+                heapq.heappush(self._heap, (entry[0], task_id, entry[1]))
+        self._arm()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _entry_for(self, task):
+        if task is None:
+            return None
+        task_id, _, _, due_date, _, status, _ = task
+        if isinstance(due_date, datetime.datetime):
+            due_date = due_date.date()
+        if due_date is None or status == "Completed" or (task_id, due_date) in self._fired:
+            return None
+        if due_date <= datetime.date.today():
+            # The reminder window has already passed
+            return None
+        return self._instant_for(due_date), due_date
+
+    def _instant_for(self, due_date):
+        return datetime.datetime.combine(due_date - self.LEAD_TIME, datetime.time.min)
+
+    def _is_current(self, task_id, instant, due_date):
+        return self._entries.get(task_id) == (instant, due_date)
+
+    def _arm(self):
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            # Too many superseded entries; rebuild from the live ones
+            self._heap = [(instant, task_id, due_date) for task_id, (instant, due_date) in self._entries.items()]
+            heapq.heapify(self._heap)
+        while self._heap:
+            instant, task_id, due_date = self._heap[0]
+            if self._is_current(task_id, instant, due_date):
+                break
+            heapq.heappop(self._heap)
+        if not self._heap:
+            self._timer.stop()
+            return
+        wait = (self._heap[0][0] - datetime.datetime.now()).total_seconds() * 1000
+        self._timer.start(int(min(max(wait, 0), self.MAX_WAIT_MS)))
+
+    def _fire_due(self):
+        now = datetime.datetime.now()
+        tomorrow = datetime.date.today() + self.LEAD_TIME
+        batch = []
+        while self._heap and self._heap[0][0] <= now:
+            instant, task_id, due_date = heapq.heappop(self._heap)
+            if not self._is_current(task_id, instant, due_date):
+                continue
+            del self._entries[task_id]
+            self._fired.add((task_id, due_date))
+            if due_date == tomorrow:
+                batch.append(self.store.get(task_id))
+        if batch:
+            self.reminders_due.emit(batch)
+        self._arm()
@@ -0,0 +1,65 @@
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+from PyQt6.QtCore import Qt, QSize
+from PyQt6.QtGui import QColor, QBrush, QPen
+from ui.task_model import PROGRESS_COLUMN, PROGRESS_ROLE
+
+# Paint resources created once and shared by every cell; colors follow styles.py
+TEXT_PEN = QPen(QColor("#1f2937"))
+GRID_PEN = QPen(QColor("#f3f4f6"))
+SELECTED_BRUSH = QBrush(QColor("#e0e7ff"))
+BAR_BRUSH = QBrush(QColor("#e5e7eb"))
+BAR_FILL_BRUSH = QBrush(QColor("#6366f1"))
+TEXT_ALIGNMENT = Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+
+
+class TaskItemDelegate(QStyledItemDelegate):
+    # Paints task cells directly: background highlight, one line of elided text, and
+    # progress as an inline bar. Row heights are fixed, so views never measure content.
+    PADDING = 8
+    BAR_HEIGHT = 8
+
+    def paint(self, painter, option, index):
+        rect = option.rect
+        painter.save()
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(rect, SELECTED_BRUSH)
+        else:
+            background = index.data(Qt.ItemDataRole.BackgroundRole)
+            if background is not None:
+                painter.fillRect(rect, background)
+        painter.setPen(GRID_PEN)
+        painter.drawLine(rect.bottomLeft(), rect.bottomRight())
+
+        content = rect.adjusted(self.PADDING, 0, -self.PADDING, 0)
+        painter.setPen(TEXT_PEN)
+        if index.column() == PROGRESS_COLUMN:
+            self._paint_progress(painter, option, content, index.data(PROGRESS_ROLE) or 0)
+        else:
+            text = index.data(Qt.ItemDataRole.DisplayRole) or ""
+            elided = option.fontMetrics.elidedText(text, Qt.TextElideMode.ElideRight, content.width())
+            painter.drawText(content, TEXT_ALIGNMENT, elided)
+        painter.restore()
+
+    def _paint_progress(self, painter, option, rect, progress):
+        # Bar on the left, percentage on the right
+        label = f"{progress}%"
+        label_width = option.fontMetrics.horizontalAdvance("100%")
+        bar_width = rect.width() - label_width - self.PADDING
+        if bar_width > 0:
+            top = rect.center().y() - self.BAR_HEIGHT // 2
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(BAR_BRUSH)
+            painter.drawRoundedRect(rect.left(), top, bar_width, self.BAR_HEIGHT, 3, 3)
+            filled = bar_width * max(0, min(progress, 100)) // 100
+            if filled:
+                painter.setBrush(BAR_FILL_BRUSH)
+                painter.drawRoundedRect(rect.left(), top, filled, self.BAR_HEIGHT, 3, 3)
+            painter.setPen(TEXT_PEN)
+        painter.drawText(rect, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, label)
+
+    def sizeHint(self, option, index):
+        return QSize(0, self.row_height(option.fontMetrics))
+
+    @classmethod
+    def row_height(cls, font_metrics):
+        return font_metrics.height() + cls.PADDING * 2
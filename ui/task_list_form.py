@@ -1,49 +1,83 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QTableWidget, QScrollArea, QTableWidgetItem, QHeaderView
-from PyQt6.QtCore import Qt, QDate
-from PyQt6.QtGui import QColor, QBrush
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableView, QScrollArea, QHeaderView,
+                             QMenu, QMessageBox, QPushButton)
+from PyQt6.QtCore import Qt, QEvent
+from instrumentation.metrics import metrics
+from ui.task_model import TaskTableModel, ArchiveTableModel, HEADERS, PROGRESS_COLUMN
+from database.base import RESTORED_STATUS
+from database.task_columns import STATUS_CODES
+from ui.task_delegate import TaskItemDelegate
 import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class TaskListForm(QWidget):
-    def __init__(self, user_id, db):
+    # Column widths come from the header and this many rows, measured once per load
+    WIDTH_SAMPLE = 200
+    MAX_COLUMN_WIDTH = 320
+    PROGRESS_WIDTH = 150
+    # Takes the space left over by the other columns
+    STRETCH_COLUMN = 2
+
+    def __init__(self, store):
         super().__init__()
-        self.user_id = user_id
-        self.db = db
+        self.store = store
+        # One model per status group, so each view pages through its own rows only
+        self.models = []
+        self.archive_model = ArchiveTableModel(store, self)
+        self._archive_stale = True
+        self.delegate = TaskItemDelegate(self)
+        self.tables = []
+        self._columns_fitted = False
         self.initUI()
-        self.load_tasks()
+
+        self.store.reset.connect(self.load_tasks)
+        self.store.tasks_changed.connect(self.apply_changes)
+        self.store.archive_changed.connect(self._on_archive_changed)
+        self.store.stale_changed.connect(self._show_stale)
+        self.archive_model.total_changed.connect(self._show_archive_total)
+        if self.store.loaded:
+            self.load_tasks()
 
     def initUI(self):
         layout = QVBoxLayout(self)
 
+        # Shown while the list is the snapshot saved last session
+        self.stale_label = QLabel()
+        self.stale_label.setObjectName("stale_label")
+        self.stale_label.hide()
+        layout.addWidget(self.stale_label)
+
         # Scroll area for grouped tasks
         scroll = QScrollArea()
         scroll.setWidgetResizable(True)
         scroll_content = QWidget()
         scroll_layout = QVBoxLayout(scroll_content)
 
-        # Group tasks by status using tables
+        # Group tasks by status: each table has a TaskTableModel of its own over that group's rows
         self.not_started_label = QLabel("Not Started")
         self.not_started_label.setObjectName("status_label")
-        self.not_started_table = QTableWidget()
+        self.not_started_table = self._create_table("Not Started")
         self.in_progress_label = QLabel("In Progress")
         self.in_progress_label.setObjectName("status_label")
-        self.in_progress_table = QTableWidget()
+        self.in_progress_table = self._create_table("In Progress")
         self.completed_label = QLabel("Completed")
         self.completed_label.setObjectName("status_label")
-        self.completed_table = QTableWidget()
-
-        # Set up table headers and responsive sizing
-        headers = ["ID", "Title", "Description", "Due Date", "Priority", "Status", "Progress"]
-        for table in [self.not_started_table, self.in_progress_table, self.completed_table]:
-            table.setColumnCount(len(headers))
-            table.setHorizontalHeaderLabels(headers)
-            table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-            table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-            table.setWordWrap(True)
-            for i in range(len(headers) - 1):
-                table.horizontalHeader().setSectionResizeMode(i, QHeaderView.ResizeMode.ResizeToContents)
-            table.horizontalHeader().setSectionResizeMode(len(headers) - 1, QHeaderView.ResizeMode.Stretch)
-            table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.completed_table = self._create_table("Completed")
+
+        # Archived history is only queried once the user opens it
+        self.archive_label = QLabel("Archived")
+        self.archive_label.setObjectName("status_label")
+        self.archive_button = QPushButton("Show Archived")
+        self.archive_button.setCheckable(True)
+        self.archive_button.toggled.connect(self._toggle_archive)
+        archive_header = QHBoxLayout()
+        archive_header.addWidget(self.archive_label)
+        archive_header.addStretch()
+        archive_header.addWidget(self.archive_button)
+        self.archive_table = self._create_view(self.archive_model, self._show_archive_menu)
+        self.archive_table.hide()
 
         # Add widgets to layout
         scroll_layout.addWidget(self.not_started_label)
@@ -52,86 +86,137 @@ class TaskListForm(QWidget):
         scroll_layout.addWidget(self.in_progress_table)
         scroll_layout.addWidget(self.completed_label)
         scroll_layout.addWidget(self.completed_table)
+        scroll_layout.addLayout(archive_header)
+        scroll_layout.addWidget(self.archive_table)
 
         scroll.setWidget(scroll_content)
         layout.addWidget(scroll)
 
+    def _create_table(self, status):
+        model = TaskTableModel(self.store, STATUS_CODES[status], self)
+        self.models.append(model)
+        return self._create_view(model, self._show_bulk_menu)
+
+    def _create_view(self, model, show_menu):
+        table = QTableView()
+        table.setModel(model)
+        table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        table.setSelectionMode(QTableView.SelectionMode.ExtendedSelection)
+        table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        table.customContextMenuRequested.connect(lambda pos, t=table: show_menu(t, pos))
+        table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        # Cells are painted by the delegate on one line, so nothing is measured per row
+        table.setItemDelegate(self.delegate)
+        table.setWordWrap(False)
+        header = table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setSectionResizeMode(self.STRETCH_COLUMN, QHeaderView.ResizeMode.Stretch)
+        table.setColumnWidth(PROGRESS_COLUMN, self.PROGRESS_WIDTH)
+        table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.tables.append(table)
+        return table
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._columns_fitted:
+            self._fit_columns()
+
+    def changeEvent(self, event):
+        # The stylesheet sets the table font, so sizes are measured once it applies
+        super().changeEvent(event)
+        if event.type() in (QEvent.Type.StyleChange, QEvent.Type.FontChange):
+            self._columns_fitted = False
+            if self.isVisible():
+                self._fit_columns()
+
+    def _fit_columns(self):
+        # Sized from a sample instead of ResizeToContents, which re-measures every row
+        # on each layout pass; users can still drag the widths afterwards
+        self._columns_fitted = True
+        # The first rows of the groups in turn
+        sample = [(model, row) for model in self.models for row in range(min(model.rowCount(), self.WIDTH_SAMPLE))]
+        sample = sample[:self.WIDTH_SAMPLE]
+        # Both sides of the delegate's padding, plus the grid line
+        padding = 2 * TaskItemDelegate.PADDING + 2
+        cell_metrics = self.tables[0].fontMetrics()
+        header_metrics = self.tables[0].horizontalHeader().fontMetrics()
+        for column, title in enumerate(HEADERS):
+            if column in (self.STRETCH_COLUMN, PROGRESS_COLUMN):
+                continue
+            width = header_metrics.horizontalAdvance(title)
+            for model, row in sample:
+                width = max(width, cell_metrics.horizontalAdvance(model.index(row, column).data()))
+            width = min(width + padding, self.MAX_COLUMN_WIDTH)
+            for table in self.tables:
+                table.setColumnWidth(column, width)
+        for table in self.tables:
+            table.verticalHeader().setDefaultSectionSize(TaskItemDelegate.row_height(cell_metrics))
+
     def load_tasks(self):
-        # Clear tables
-        self.not_started_table.setRowCount(0)
-        self.in_progress_table.setRowCount(0)
-        self.completed_table.setRowCount(0)
-
-        # Fetch tasks from the database
-        tasks = self.db.get_user_tasks(self.user_id)
-        print(f"Loaded tasks: {tasks}")  # Debug: Check raw task data
-
-        # Calculate today and tomorrow
-        today = QDate.currentDate()
-        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
-        print(f"Today: {today.toString('yyyy-MM-dd')}, Tomorrow: {tomorrow}")  # Debug: Verify dates
-
-        for task in tasks:
-            try:
-                task_id, title, description, due_date, priority, status, progress = task
-                print(f"Processing task: {title}, Due: {due_date}, Status: {status}")  # Debug: Task details
-
-                # Normalize due_date to datetime.date if needed
-                if isinstance(due_date, datetime.datetime):
-                    due_date = due_date.date()
-                    print(f"Converted due_date to date: {due_date}")
-
-                # Convert to QDate for overdue check
-                due_date_qdate = QDate(due_date.year, due_date.month, due_date.day)
-                is_overdue = due_date_qdate < today and status != "Completed"
-                is_due_tomorrow = due_date == tomorrow and status != "Completed"
-
-                # Debug: Check conditions
-                print(f"  Is overdue: {is_overdue}, Is due tomorrow: {is_due_tomorrow}")
-
-                # Determine which table to add the task to
-                if status == "Not Started":
-                    table = self.not_started_table
-                elif status == "In Progress":
-                    table = self.in_progress_table
-                else:  # status == "Completed"
-                    table = self.completed_table
-
-                # Add a new row to the table
-                row_position = table.rowCount()
-                table.insertRow(row_position)
-
-                # Populate the row with task details
-                items = [
-                    QTableWidgetItem(str(task_id)),
-                    QTableWidgetItem(title),
-                    QTableWidgetItem(description or "N/A"),
-                    QTableWidgetItem(str(due_date)),
-                    QTableWidgetItem(priority),
-                    QTableWidgetItem(status),
-                    QTableWidgetItem(f"{progress}%")
-                ]
-                for col, item in enumerate(items):
-                    table.setItem(row_position, col, item)
-                    item.setTextAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
-
-                # Apply styling: overdue (red) takes priority over due tomorrow (yellow)
-                if is_overdue:
-                    print(f"  Applying red background for overdue task: {title}")
-                    for col in range(table.columnCount()):
-                        item = table.item(row_position, col)
-                        if item:
-                            item.setBackground(QBrush(QColor("red")))
-                elif is_due_tomorrow:
-                    print(f"  Applying yellow background for task due tomorrow: {title}")
-                    for col in range(table.columnCount()):
-                        item = table.item(row_position, col)
-                        if item:
-                            item.setBackground(QBrush(QColor("yellow")))
-
-            except Exception as e:
-                print(f"Error processing task: {task}, Error: {e}")
-
-        # Resize rows for visibility
-        for table in [self.not_started_table, self.in_progress_table, self.completed_table]:
-            table.resizeRowsToContents()
\ No newline at end of file
+        # The model exposes rows a page at a time; views pull more with fetchMore as they scroll
+        logger.debug("Loaded %d tasks", len(self.store))
+        with metrics.timer("ui.task_list.load_ms"):
+            for model in self.models:
+                model.set_ids(self.store.columns.ids_in_group(model.group))
+            if self.isVisible():
+                self._fit_columns()
+            else:
+                self._columns_fitted = False
+
+    def apply_changes(self, inserted, updated, deleted):
+        with metrics.timer("ui.task_list.patch_ms"):
+            for model in self.models:
+                model.apply_changes(self.store, inserted, updated, deleted)
+
+    def _show_stale(self, stale):
+        if stale:
+            saved = datetime.datetime.fromtimestamp(self.store.snapshot_saved_at)
+            self.stale_label.setText(f"Showing tasks saved {saved:%Y-%m-%d %H:%M}; updating…")
+        self.stale_label.setVisible(stale)
+
+    def _toggle_archive(self, shown):
+        self.archive_table.setVisible(shown)
+        self.archive_button.setText("Hide Archived" if shown else "Show Archived")
+        if shown and self._archive_stale:
+            self._archive_stale = False
+            self.archive_model.reload()
+
+    def _on_archive_changed(self):
+        # Reloaded now if open, otherwise the next time it is opened
+        if self.archive_table.isVisible():
+            self.archive_model.reload()
+        else:
+            self._archive_stale = True
+
+    def _show_archive_total(self, total):
+        self.archive_label.setText(f"Archived ({total})")
+
+    def _show_archive_menu(self, table, pos):
+        task_ids = [index.data(Qt.ItemDataRole.UserRole) for index in table.selectionModel().selectedRows()]
+        if not task_ids:
+            return
+        count = f"{len(task_ids)} task{'s' if len(task_ids) > 1 else ''}"
+        menu = QMenu(self)
+        menu.addAction(f"Restore {count} as {RESTORED_STATUS}", lambda: self.store.restore_tasks(task_ids))
+        menu.exec(table.viewport().mapToGlobal(pos))
+
+    def _show_bulk_menu(self, table, pos):
+        task_ids = [index.data(Qt.ItemDataRole.UserRole) for index in table.selectionModel().selectedRows()]
+        if not task_ids:
+            return
+        count = f"{len(task_ids)} task{'s' if len(task_ids) > 1 else ''}"
+        menu = QMenu(self)
+        menu.addAction(f"Mark {count} Complete",
+                       lambda: self.store.set_tasks_status(task_ids, "Completed", 100))
+        menu.addAction(f"Mark {count} In Progress",
+                       lambda: self.store.set_tasks_status(task_ids, "In Progress"))
+        priority_menu = menu.addMenu(f"Set Priority of {count}")
+        for priority in ("Low", "Medium", "High"):
+            priority_menu.addAction(priority, lambda p=priority: self.store.update_tasks(task_ids, priority=p))
+        menu.addSeparator()
+        menu.addAction(f"Delete {count}", lambda: self._delete_tasks(task_ids))
+        menu.exec(table.viewport().mapToGlobal(pos))
+
+    def _delete_tasks(self, task_ids):
+        if QMessageBox.question(self, "Delete Tasks", f"Delete {len(task_ids)} task(s)?") == QMessageBox.StandardButton.Yes:
+            self.store.delete_tasks(task_ids)
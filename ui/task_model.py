@@ -0,0 +1,340 @@
+from PyQt6.QtCore import Qt, QAbstractTableModel, QAbstractListModel, QModelIndex, pyqtSignal
+from PyQt6.QtGui import QColor, QBrush
+from database.task_columns import DUE_SOON
+import datetime
+import numpy as np
+
+HEADERS = ["ID", "Title", "Description", "Due Date", "Priority", "Status", "Progress"]
+STATUS_COLUMN = 5
+PROGRESS_COLUMN = 6
+# The progress percentage as an int, for painting it as a bar
+PROGRESS_ROLE = Qt.ItemDataRole.UserRole + 1
+
+# Shared brushes so highlighting does not allocate per cell
+OVERDUE_BRUSH = QBrush(QColor("red"))
+DUE_TOMORROW_BRUSH = QBrush(QColor("yellow"))
+# Background per due class of TaskColumns: none, overdue (red), due tomorrow (yellow)
+DUE_BRUSHES = (None, OVERDUE_BRUSH, DUE_TOMORROW_BRUSH)
+ALIGNMENT = Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop
+
+
+def as_date(due_date):
+    # Normalize datetime values from the driver to plain dates
+    if isinstance(due_date, datetime.datetime):
+        return due_date.date()
+    return due_date
+
+
+def cell_text(task, column):
+    task_id, title, description, due_date, priority, status, progress = task
+    if column == 0:
+        return str(task_id)
+    if column == 1:
+        return title
+    if column == 2:
+        return description or "N/A"
+    if column == 3:
+        return "N/A" if due_date is None else str(as_date(due_date))
+    if column == 4:
+        return priority
+    if column == 5:
+        return status
+    return f"{progress}%"
+
+
+class TaskTableModel(QAbstractTableModel):
+    # Rows are task ids in a NumPy array; cell text is formatted from the store's row only
+    # when a view asks for it, and highlighting comes from its classified columns.
+    # With a status group (a STATUS_CODES value) it lists only that group's tasks, so each
+    # group's view pages through its own rows; statuses other than the active ones fall
+    # in the Completed group. Tasks move between groups as their status changes.
+    PAGE_SIZE = 200
+
+    def __init__(self, store, group=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.group = group
+        self._ids = np.zeros(0, np.int64)
+        self._loaded = 0
+        self._today = datetime.date.today()
+        # The last row built, as views ask for every cell and role of a row in turn
+        self._last = None
+
+    def set_ids(self, task_ids):
+        # With a group, task_ids are that group's, e.g. from TaskColumns.ids_in_group()
+        self.beginResetModel()
+        self._ids = np.array(task_ids, np.int64)
+        self._loaded = min(self.PAGE_SIZE, len(self._ids))
+        self._today = datetime.date.today()
+        self._last = None
+        self.endResetModel()
+
+    def task_at(self, row):
+        task_id = int(self._ids[row])
+        if self._last is None or self._last[0] != task_id:
+            self._last = self.store.get(task_id)
+        return self._last
+
+    def _listable(self, task_ids):
+        # The ids that belong in this model: in the store, and in the group if it has one
+        columns = self.store.columns
+        return [task_id for task_id in task_ids if task_id in columns
+                and (self.group is None or columns.group(task_id) == self.group)]
+
+    def apply_changes(self, store, inserted, updated, deleted):
+        # Patch only the affected rows; rows past the loaded page are updated silently
+        self._last = None
+        if self.group is not None and updated:
+            # Tasks whose new status belongs to another group leave this one
+            staying = set(self._listable(updated))
+            deleted = list(deleted) + [task_id for task_id in updated if task_id not in staying]
+            updated = [task_id for task_id in updated if task_id in staying]
+        if deleted:
+            rows = np.flatnonzero(np.isin(self._ids, deleted))
+            for row in rows[::-1].tolist():
+                if row < self._loaded:
+                    self.beginRemoveRows(QModelIndex(), row, row)
+                    self._ids = np.delete(self._ids, row)
+                    self._loaded -= 1
+                    self.endRemoveRows()
+            self._ids = self._ids[~np.isin(self._ids, deleted)]
+
+        last_column = len(HEADERS) - 1
+        if updated:
+            updated = np.array(updated, np.int64)
+            listed = np.isin(updated, self._ids)
+            for row in np.flatnonzero(np.isin(self._ids[:self._loaded], updated)).tolist():
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+            inserted = list(inserted) + updated[~listed].tolist()
+
+        task_ids = self._listable(inserted)
+        if task_ids:
+            task_ids = np.array(task_ids, np.int64)
+            task_ids = task_ids[~np.isin(task_ids, self._ids)]
+        if len(task_ids):
+            first = len(self._ids)
+            fully_loaded = self._loaded == first
+            if fully_loaded:
+                self.beginInsertRows(QModelIndex(), first, first + len(task_ids) - 1)
+            self._ids = np.concatenate([self._ids, task_ids])
+            if fully_loaded:
+                self._loaded = len(self._ids)
+                self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._ids)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.PAGE_SIZE, len(self._ids) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self.task_at(index.row())
+        if role == Qt.ItemDataRole.DisplayRole:
+            return cell_text(task, index.column())
+        if role == Qt.ItemDataRole.BackgroundRole:
+            return self._highlight(task)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return ALIGNMENT
+        if role == Qt.ItemDataRole.UserRole:
+            return task[0]
+        if role == PROGRESS_ROLE:
+            return task[6]
+        return None
+
+    def _highlight(self, task):
+        return DUE_BRUSHES[self.store.columns.due_class(task[0], self._today)]
+
+
+class ArchiveTableModel(QAbstractTableModel):
+    # Archived tasks, most recently completed first. Nothing is read until reload() is
+    # called; after that each fetchMore queries the next page off the GUI thread.
+    total_changed = pyqtSignal(int)
+
+    PAGE_SIZE = 100
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._rows = []
+        self._cursor = None
+        self._exhausted = True
+        self._loading = False
+        self._generation = 0
+
+    def reload(self):
+        self._generation += 1
+        self.beginResetModel()
+        self._rows = []
+        self._cursor = None
+        self._exhausted = False
+        self._loading = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def task_at(self, row):
+        return self._rows[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._loading = True
+        generation = self._generation
+        self.store.load_archived(self._cursor, self.PAGE_SIZE, lambda page: self._on_page(generation, page))
+
+    def _on_page(self, generation, page):
+        if generation != self._generation:
+            # A reload started while this page was in flight
+            return
+        rows, self._cursor, total = page
+        self._loading = False
+        self._exhausted = self._cursor is None
+        if total is not None:
+            self.total_changed.emit(total)
+        if rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return cell_text(task, index.column())
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return ALIGNMENT
+        if role == Qt.ItemDataRole.UserRole:
+            return task[0]
+        if role == PROGRESS_ROLE:
+            return task[6]
+        return None
+
+
+class TaskListModel(QAbstractListModel):
+    # Ordered task ids from the store's search results, shown a page at a time
+    PAGE_SIZE = 200
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._ids = []
+        self._rows = {}
+        self._loaded = 0
+        self._today = datetime.date.today()
+
+    def set_ids(self, task_ids):
+        self.beginResetModel()
+        self._ids = list(task_ids)
+        self._rows = {task_id: row for row, task_id in enumerate(self._ids)}
+        self._loaded = min(self.PAGE_SIZE, len(self._ids))
+        self._today = datetime.date.today()
+        self.endResetModel()
+
+    def task_id_at(self, row):
+        return self._ids[row]
+
+    def contains(self, task_id):
+        return task_id in self._rows
+
+    def append_id(self, task_id):
+        if task_id in self._rows:
+            return
+        row = len(self._ids)
+        fully_loaded = self._loaded == row
+        if fully_loaded:
+            self.beginInsertRows(QModelIndex(), row, row)
+        self._ids.append(task_id)
+        self._rows[task_id] = row
+        if fully_loaded:
+            self._loaded += 1
+            self.endInsertRows()
+
+    def remove_id(self, task_id):
+        row = self._rows.pop(task_id, None)
+        if row is None:
+            return
+        visible = row < self._loaded
+        if visible:
+            self.beginRemoveRows(QModelIndex(), row, row)
+        del self._ids[row]
+        if visible:
+            self._loaded -= 1
+        for later_id in self._ids[row:]:
+            self._rows[later_id] -= 1
+        if visible:
+            self.endRemoveRows()
+
+    def refresh_id(self, task_id):
+        row = self._rows.get(task_id)
+        if row is not None and row < self._loaded:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._ids)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.PAGE_SIZE, len(self._ids) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        task_id = self._ids[index.row()]
+        if role == Qt.ItemDataRole.UserRole:
+            return task_id
+        task = self.store.get(task_id)
+        if task is None:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            _, title, _, due_date, priority, status, progress = task
+            due_date = as_date(due_date)
+            return f"[{'✓' if status == 'Completed' else ' '}] {title} (Due: {due_date}, P: {priority}, S: {status}, Progress: {progress}%)"
+        if role == Qt.ItemDataRole.BackgroundRole:
+            if self.store.columns.due_class(task_id, self._today) == DUE_SOON:
+                return DUE_TOMORROW_BRUSH
+        return None